@@ -0,0 +1,272 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+import sys
+import time
+from typing import Dict
+
+from duniterpy.documents.block import Block
+from duniterpy.documents.transaction import Transaction, _parse_condition
+
+from block_parse import generate_block, same
+
+# Benchmark of the documents built from BMA json data
+#
+# Compare the formatting of the json data into a signed raw document parsed back
+# (as Transaction.from_bma_history did) with the from_bma_json constructors, on the
+# blocks and on their transactions as in a transaction history, and check that both
+# build the same documents (the raw parsers keep the numbers of some header fields
+# as strings, the json constructors keep the json integers).
+#
+# Both approaches parse the inputs, unlocks and outputs inline strings, and the
+# output conditions cache, cleared before each measure, serves both of them.
+#
+# The block is read from a json file of a bma.blockchain.block response when a path
+# is given, the large block of block_parse.py is converted to json otherwise.
+#
+# Run from the parent folder:
+#
+#   poetry run python benchmarks/block_bma_json.py [block.json]
+
+# CONFIG #######################################
+
+ROUNDS = 20
+
+################################################
+
+
+def bma_json(block: Block) -> Dict:
+    """
+    Return the json data of the block, as served by BMA
+    """
+    return {
+        "version": block.version,
+        "currency": block.currency,
+        "nonce": block.nonce,
+        "number": block.number,
+        "powMin": block.powmin,
+        "time": block.time,
+        "medianTime": block.mediantime,
+        "dividend": block.ud,
+        "unitbase": block.unit_base,
+        "issuer": block.issuer,
+        "issuersFrame": block.issuers_frame,
+        "issuersFrameVar": block.issuers_frame_var,
+        "issuersCount": block.different_issuers_count,
+        "previousHash": block.prev_hash,
+        "previousIssuer": block.prev_issuer,
+        "parameters": ":".join(block.parameters) if block.parameters else "",
+        "membersCount": block.members_count,
+        "hash": block.proof_of_work(),
+        "inner_hash": block.inner_hash,
+        "identities": [identity.inline() for identity in block.identities],
+        "joiners": [joiner.inline() for joiner in block.joiners],
+        "actives": [active.inline() for active in block.actives],
+        "leavers": [leaver.inline() for leaver in block.leavers],
+        "revoked": [revocation.inline() for revocation in block.revoked],
+        "excluded": block.excluded,
+        "certifications": [cert.inline() for cert in block.certifications],
+        "transactions": [
+            {
+                "version": tx.version,
+                "currency": tx.currency,
+                "blockstamp": str(tx.blockstamp),
+                "locktime": tx.locktime,
+                "issuers": tx.issuers,
+                "inputs": [source.inline() for source in tx.inputs],
+                "unlocks": [unlock.inline() for unlock in tx.unlocks],
+                "outputs": [output.inline() for output in tx.outputs],
+                "comment": tx.comment,
+                "signatures": tx.signatures,
+                "time": None,
+            }
+            for tx in block.transactions
+        ],
+        "signature": block.signatures[0],
+    }
+
+
+def legacy_block_from_bma_json(data: Dict) -> Block:
+    """
+    Return a Block instance from the json data formatted into a signed raw document
+    """
+    doc = """Version: {version}
+Type: Block
+Currency: {currency}
+Number: {number}
+PoWMin: {powMin}
+Time: {time}
+MedianTime: {medianTime}
+""".format(
+        **data
+    )
+    if data["dividend"]:
+        doc += "UniversalDividend: {0}\n".format(data["dividend"])
+    doc += """UnitBase: {unitbase}
+Issuer: {issuer}
+IssuersFrame: {issuersFrame}
+IssuersFrameVar: {issuersFrameVar}
+DifferentIssuersCount: {issuersCount}
+""".format(
+        **data
+    )
+    if data["number"] == 0:
+        doc += "Parameters: {0}\n".format(data["parameters"])
+    else:
+        doc += (
+            "PreviousHash: {previousHash}\nPreviousIssuer: {previousIssuer}\n".format(
+                **data
+            )
+        )
+    doc += "MembersCount: {0}\n".format(data["membersCount"])
+    for header, key in (
+        ("Identities", "identities"),
+        ("Joiners", "joiners"),
+        ("Actives", "actives"),
+        ("Leavers", "leavers"),
+        ("Revoked", "revoked"),
+        ("Excluded", "excluded"),
+        ("Certifications", "certifications"),
+    ):
+        doc += "{0}:\n".format(header)
+        doc += "".join("{0}\n".format(inline) for inline in data[key])
+    doc += "Transactions:\n"
+    for tx_data in data["transactions"]:
+        doc += "TX:{0}:{1}:{2}:{3}:{4}:{5}:{6}\n".format(
+            tx_data["version"],
+            len(tx_data["issuers"]),
+            len(tx_data["inputs"]),
+            len(tx_data["unlocks"]),
+            len(tx_data["outputs"]),
+            1 if tx_data["comment"] != "" else 0,
+            tx_data["locktime"],
+        )
+        doc += "{0}\n".format(tx_data["blockstamp"])
+        for key in ("issuers", "inputs", "unlocks", "outputs"):
+            doc += "".join("{0}\n".format(inline) for inline in tx_data[key])
+        if tx_data["comment"] != "":
+            doc += "{0}\n".format(tx_data["comment"])
+        doc += "".join("{0}\n".format(signature) for signature in tx_data["signatures"])
+    doc += "InnerHash: {inner_hash}\nNonce: {nonce}\n{signature}\n".format(**data)
+    return Block.from_signed_raw(doc)
+
+
+def legacy_from_bma_history(currency: str, tx_data: Dict) -> Transaction:
+    """
+    Previous Transaction.from_bma_history implementation
+    """
+    tx_data = tx_data.copy()
+    tx_data["currency"] = currency
+    for data_list in ("issuers", "outputs", "inputs", "unlocks", "signatures"):
+        tx_data["multiline_{0}".format(data_list)] = "\n".join(tx_data[data_list])
+    return Transaction.from_signed_raw(
+        """Version: {version}
+Type: Transaction
+Currency: {currency}
+Blockstamp: {blockstamp}
+Locktime: {locktime}
+Issuers:
+{multiline_issuers}
+Inputs:
+{multiline_inputs}
+Unlocks:
+{multiline_unlocks}
+Outputs:
+{multiline_outputs}
+Comment: {comment}
+{multiline_signatures}
+""".format(
+            **tx_data
+        ),
+        tx_data["time"],
+    )
+
+
+def measure(function, *args) -> float:
+    """
+    Return mean duration of a call in milliseconds
+
+    The output conditions cache is cleared before each call.
+    """
+    duration = 0.0
+    for _ in range(ROUNDS):
+        _parse_condition.cache_clear()
+        start = time.perf_counter()
+        function(*args)
+        duration += time.perf_counter() - start
+    return duration / ROUNDS * 1000
+
+
+def build_history(function, currency: str, history: list):
+    """
+    Build all the history transactions with function
+    """
+    for tx_data in history:
+        function(currency, tx_data)
+
+
+def report(label: str, reference: float, duration: float):
+    print("{0:<30}{1:>10.2f} ms".format(label + ", raw format", reference))
+    print(
+        "{0:<30}{1:>10.2f} ms  ({2:+.0%})".format(
+            label + ", from_bma_json", duration, duration / reference - 1
+        )
+    )
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as file:
+            data = json.load(file)
+    else:
+        data = bma_json(Block.from_signed_raw(generate_block()))
+    print(
+        "{0} certifications, {1} transactions".format(
+            len(data["certifications"]), len(data["transactions"])
+        )
+    )
+    block = Block.from_bma_json(data)
+    legacy_block = legacy_block_from_bma_json(data)
+    if block.signed_raw() != legacy_block.signed_raw() or not same(
+        block.certifications, legacy_block.certifications
+    ):
+        raise ValueError("Constructors built different blocks")
+    report(
+        "block",
+        measure(legacy_block_from_bma_json, data),
+        measure(Block.from_bma_json, data),
+    )
+
+    currency = data["currency"]
+    history = data["transactions"]
+    if not all(
+        same(
+            legacy_from_bma_history(currency, tx_data),
+            Transaction.from_bma_history(currency, tx_data),
+        )
+        for tx_data in history
+    ):
+        raise ValueError("Constructors built different transactions")
+    report(
+        "history",
+        measure(build_history, legacy_from_bma_history, currency, history),
+        measure(build_history, Transaction.from_bma_history, currency, history),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import time
+
+import pypeg2
+
+from duniterpy.documents.block import Block
+from duniterpy.documents.document import MalformedDocumentError
+from duniterpy.documents.certification import Certification
+from duniterpy.documents.identity import Identity
+from duniterpy.documents.membership import Membership
+from duniterpy.documents.revocation import Revocation
+from duniterpy.documents.transaction import (
+    OutputSource,
+    Transaction,
+    _parse_condition,
+)
+from duniterpy.grammars import output
+
+# Benchmark of Block.from_signed_raw on large blocks
+#
+# Compare the previous parser (regex match of the next section header on each line,
+# compact transactions concatenated then split again, every output condition parsed
+# with the PEG grammar) with the single pass parser, which caches parsed output
+# conditions by text, and check that both build identical Block objects.
+#
+# The cache is cleared before each parse, hits only come from conditions repeated
+# in the block. The generated block repeats the same transactions, real blocks
+# get less hits.
+#
+# The block is read from a signed raw block file when a path is given, a large block
+# is built from the lines of a real test network block otherwise.
+#
+# Run from the parent folder:
+#
+#   poetry run python benchmarks/block_parse.py [block.txt]
+
+# CONFIG #######################################
+
+ACTIVES_COUNT = 100
+CERTIFICATIONS_COUNT = 500
+TRANSACTIONS_COUNT = 500
+ROUNDS = 20
+
+HEADER = """Version: 11
+Type: Block
+Currency: meta_brouzouf
+Number: 34436
+PoWMin: 5
+Time: 1443896211
+MedianTime: 1443881811
+UnitBase: 0
+Issuer: HnFcSms8jzwngtVomTTnzudZx7SHUQY8sVE1y8yBmULk
+IssuersFrame: 1
+IssuersFrameVar: 0
+DifferentIssuersCount: 0
+PreviousHash: 000002B06C990DEBD5C1D947289C2CF4F4396FB2
+PreviousIssuer: HnFcSms8jzwngtVomTTnzudZx7SHUQY8sVE1y8yBmULk
+MembersCount: 19
+"""
+ACTIVE = """ATkjQPa4sn4LBF69jqEPzFtRdHYJs6MJQjvP8JdN7MtN:QTowsupV+uXrcomL44WCxbu3LQoJM2C2VPMet5Xg6gXGAHEtGRp47FfQLb2ok1+/588JiIHskCyazj3UOsmKDw==:34434-00000D21F80687248A8C02F16BB19A975B4F983D:34432-00000D21F80687248A8C02F16BB19A975B4F983D:urodelus
+"""
+CERTIFICATIONS = """5ocqzyDMMWf1V8bsoNhWb1iNwax1e9M7VTUN6navs8of:ATkjQPa4sn4LBF69jqEPzFtRdHYJs6MJQjvP8JdN7MtN:0:6TuxRcARnpo13l3cXtgPTkjJlv8DZOUvsAzmZJMbjHZbbZfDQ6MJpH9DIuH0eyG3WGc0EX/046mbMGBrKKg9DQ==
+ATkjQPa4sn4LBF69jqEPzFtRdHYJs6MJQjvP8JdN7MtN:2qwGeLWoPG7db72bKXPfJpAtj67FYDnPaJn2JB7tyXxJ:0:LusTbb7CgwrqqacDKjtldw60swwvDBH8wVUIJN4SWRb2pZPJSpDxgqaGyjC5P9i/DendfyQWc7cfzPDqSZmZAg==
+"""
+TRANSACTIONS = """TX:10:1:3:3:1:0:0
+33363-000021C4B5BE2DA996F953DC09482F4FA2FA68774B1A38FAB03B2AAB4A08EBE0
+HsLShAtzXTVxeUtQd7yi5Z5Zh4zNvbu8sTEZ53nfKcqY
+5200:0:T:6991C993631BED4733972ED7538E41CCC33660F554E3C51963E2A0AC4D6453D3:0
+500:0:T:3A09A20E9014110FD224889F13357BAB4EC78A72F95CA03394D8CCA2936A7435:10
+20:0:D:HsLShAtzXTVxeUtQd7yi5Z5Zh4zNvbu8sTEZ53nfKcqY:88
+0:SIG(0)
+1:SIG(0)
+2:SIG(0)
+30:2:SIG(BYfWYFrsyjpvpFysgu19rGK3VHBkz4MqmQbNyEuVU64g)
+42yQm4hGTJYWkPg39hQAUgP6S6EQ4vTfXdJuxKEHL1ih6YHiDL2hcwrFgBHjXLRgxRhj2VNVqqc6b4JayKqTE14r
+TX:10:3:6:6:3:1:0
+33363-000021C4B5BE2DA996F953DC09482F4FA2FA68774B1A38FAB03B2AAB4A08EBE0
+HsLShAtzXTVxeUtQd7yi5Z5Zh4zNvbu8sTEZ53nfKcqY
+CYYjHsNyg3HMRMpTHqCJAN9McjH5BwFLmDKGV3PmCuKp
+9WYHTavL1pmhunFCzUwiiq4pXwvgGG5ysjZnjz9H8yB
+78900:0:T:6991C993631BED4733972ED7538E41CCC33660F554E3C51963E2A0AC4D6453D3:2
+700:0:T:3A09A20E9014110FD224889F13357BAB4EC78A72F95CA03394D8CCA2936A7435:8
+8900:0:D:HsLShAtzXTVxeUtQd7yi5Z5Zh4zNvbu8sTEZ53nfKcqY:46
+780:0:T:A0D9B4CDC113ECE1145C5525873821398890AE842F4B318BD076095A23E70956:3
+780:0:T:67F2045B5318777CC52CD38B424F3E40DDA823FA0364625F124BABE0030E7B5B:5
+8900:0:D:9WYHTavL1pmhunFCzUwiiq4pXwvgGG5ysjZnjz9H8yB:46
+0:SIG(0)
+1:XHX(7665798292)
+2:SIG(0)
+3:SIG(0) SIG(2)
+4:SIG(0) SIG(1) SIG(2)
+5:SIG(2)
+120:2:SIG(BYfWYFrsyjpvpFysgu19rGK3VHBkz4MqmQbNyEuVU64g)
+146:2:SIG(DSz4rgncXCytsUMW2JU2yhLquZECD2XpEkpP9gG5HyAx)
+49:2:(SIG(6DyGr5LFtFmbaJYRvcs9WmBsr4cbJbJ1EV9zBbqG7A6i) OR XHX(12CCC75A48B1502E4A4E5E9EC2C5153AE2DDF760D5B70262103309D4C7FA86EE))
+-----@@@----- (why not this comment?)
+42yQm4hGTJYWkPg39hQAUgP6S6EQ4vTfXdJuxKEHL1ih6YHiDL2hcwrFgBHjXLRgxRhj2VNVqqc6b4JayKqTE14r
+2D96KZwNUvVtcapQPq2mm7J9isFcDCfykwJpVEZwBc7tCgL4qPyu17BT5ePozAE9HS6Yvj51f62Mp4n9d9dkzJoX
+2XiBDpuUdu6zCPWGzHXXy8c4ATSscfFQG9DjmqMZUxDZVt1Dp4m2N5oHYVUfoPdrU9SLk4qxi65RNrfCVnvQtQJk
+"""
+FOOTER = """InnerHash: DB30D958EE5CB75186972286ED3F4686B8A1C2CD
+Nonce: 581
+nY/MsFU2luiohLmSiOOimL1RIqbriOBgc22ua03Z2dhxtSJxKZeGNGDvl1jaXgmEBRnXU87yXbZ7ioOS/AAVCA==
+"""
+
+################################################
+
+
+def generate_block() -> str:
+    """
+    Return a signed raw block with many memberships, certifications and transactions
+    """
+    return (
+        HEADER
+        + "Identities:\nJoiners:\nActives:\n"
+        + ACTIVE * ACTIVES_COUNT
+        + "Leavers:\nRevoked:\nExcluded:\nCertifications:\n"
+        + CERTIFICATIONS * (CERTIFICATIONS_COUNT // 2)
+        + "Transactions:\n"
+        + TRANSACTIONS * (TRANSACTIONS_COUNT // 2)
+        + FOOTER
+    )
+
+
+def legacy_from_signed_raw(signed_raw: str) -> Block:
+    """
+    Previous Block.from_signed_raw implementation
+    """
+    lines = signed_raw.splitlines(True)
+    n = 0
+
+    version = int(Block.parse_field("Version", lines[n]))
+    n += 1
+
+    Block.parse_field("Type", lines[n])
+    n += 1
+
+    currency = Block.parse_field("Currency", lines[n])
+    n += 1
+
+    number = int(Block.parse_field("Number", lines[n]))
+    n += 1
+
+    powmin = int(Block.parse_field("PoWMin", lines[n]))
+    n += 1
+
+    time = int(Block.parse_field("Time", lines[n]))
+    n += 1
+
+    mediantime = int(Block.parse_field("MedianTime", lines[n]))
+    n += 1
+
+    ud_match = Block.re_universaldividend.match(lines[n])
+    ud = None
+    unit_base = 0
+    if ud_match is not None:
+        ud = int(Block.parse_field("UD", lines[n]))
+        n += 1
+
+    unit_base = int(Block.parse_field("UnitBase", lines[n]))
+    n += 1
+
+    issuer = Block.parse_field("Issuer", lines[n])
+    n += 1
+
+    issuers_frame = Block.parse_field("IssuersFrame", lines[n])
+    n += 1
+    issuers_frame_var = Block.parse_field("IssuersFrameVar", lines[n])
+    n += 1
+    different_issuers_count = Block.parse_field("DifferentIssuersCount", lines[n])
+    n += 1
+
+    prev_hash = None
+    prev_issuer = None
+    if number > 0:
+        prev_hash = str(Block.parse_field("PreviousHash", lines[n]))
+        n += 1
+
+        prev_issuer = str(Block.parse_field("PreviousIssuer", lines[n]))
+        n += 1
+
+    parameters = None
+    if number == 0:
+        try:
+            params_match = Block.re_parameters.match(lines[n])
+            if params_match is None:
+                raise MalformedDocumentError("Parameters")
+            parameters = params_match.groups()
+            n += 1
+        except AttributeError:
+            raise MalformedDocumentError("Parameters") from AttributeError
+
+    members_count = int(Block.parse_field("MembersCount", lines[n]))
+    n += 1
+
+    identities = []
+    joiners = []
+    actives = []
+    leavers = []
+    revoked = []
+    excluded = []
+    certifications = []
+    transactions = []
+
+    if Block.re_identities.match(lines[n]) is not None:
+        n += 1
+        while Block.re_joiners.match(lines[n]) is None:
+            selfcert = Identity.from_inline(version, currency, lines[n])
+            identities.append(selfcert)
+            n += 1
+
+    if Block.re_joiners.match(lines[n]):
+        n += 1
+        while Block.re_actives.match(lines[n]) is None:
+            membership = Membership.from_inline(version, currency, "IN", lines[n])
+            joiners.append(membership)
+            n += 1
+
+    if Block.re_actives.match(lines[n]):
+        n += 1
+        while Block.re_leavers.match(lines[n]) is None:
+            membership = Membership.from_inline(version, currency, "IN", lines[n])
+            actives.append(membership)
+            n += 1
+
+    if Block.re_leavers.match(lines[n]):
+        n += 1
+        while Block.re_revoked.match(lines[n]) is None:
+            membership = Membership.from_inline(version, currency, "OUT", lines[n])
+            leavers.append(membership)
+            n += 1
+
+    if Block.re_revoked.match(lines[n]):
+        n += 1
+        while Block.re_excluded.match(lines[n]) is None:
+            revokation = Revocation.from_inline(version, currency, lines[n])
+            revoked.append(revokation)
+            n += 1
+
+    if Block.re_excluded.match(lines[n]):
+        n += 1
+        while Block.re_certifications.match(lines[n]) is None:
+            exclusion_match = Block.re_exclusion.match(lines[n])
+            if exclusion_match is not None:
+                exclusion = exclusion_match.group(1)
+                excluded.append(exclusion)
+            n += 1
+
+    if Block.re_certifications.match(lines[n]):
+        n += 1
+        while Block.re_transactions.match(lines[n]) is None:
+            certification = Certification.from_inline(
+                version, currency, prev_hash, lines[n]
+            )
+            certifications.append(certification)
+            n += 1
+
+    if Block.re_transactions.match(lines[n]):
+        n += 1
+        while not Block.re_hash.match(lines[n]):
+            tx_lines = ""
+            header_data = Transaction.re_header.match(lines[n])
+            if header_data is None:
+                raise MalformedDocumentError(
+                    "Compact transaction ({0})".format(lines[n])
+                )
+            issuers_num = int(header_data.group(2))
+            inputs_num = int(header_data.group(3))
+            unlocks_num = int(header_data.group(4))
+            outputs_num = int(header_data.group(5))
+            has_comment = int(header_data.group(6))
+            sup_lines = 2
+            tx_max = (
+                n
+                + sup_lines
+                + issuers_num * 2
+                + inputs_num
+                + unlocks_num
+                + outputs_num
+                + has_comment
+            )
+            for index in range(n, tx_max):
+                tx_lines += lines[index]
+            n += tx_max - n
+            transaction = Transaction.from_compact(currency, tx_lines)
+            transactions.append(transaction)
+
+    inner_hash = Block.parse_field("InnerHash", lines[n])
+    n += 1
+
+    nonce = int(Block.parse_field("Nonce", lines[n]))
+    n += 1
+
+    signature = Block.parse_field("Signature", lines[n])
+
+    return Block(
+        version,
+        currency,
+        number,
+        powmin,
+        time,
+        mediantime,
+        ud,
+        unit_base,
+        issuer,
+        issuers_frame,
+        issuers_frame_var,
+        different_issuers_count,
+        prev_hash,
+        prev_issuer,
+        parameters,
+        members_count,
+        identities,
+        joiners,
+        actives,
+        leavers,
+        revoked,
+        excluded,
+        certifications,
+        transactions,
+        inner_hash,
+        nonce,
+        signature,
+    )
+
+
+def same(first, second) -> bool:
+    """
+    Return True if the objects have the same type and attributes, recursively
+    """
+    if type(first) is not type(second):
+        return False
+    if isinstance(first, (list, tuple)):
+        return len(first) == len(second) and all(
+            same(item, other) for item, other in zip(first, second)
+        )
+    if hasattr(first, "__dict__"):
+        return first.__dict__.keys() == second.__dict__.keys() and all(
+            same(value, second.__dict__[key]) for key, value in first.__dict__.items()
+        )
+    return first == second
+
+
+def legacy_condition_from_text(text: str) -> output.Condition:
+    """
+    Previous OutputSource.condition_from_text implementation, without cache
+    """
+    try:
+        condition = pypeg2.parse(text, output.Condition)
+    except SyntaxError:
+        condition = output.Condition(text)
+    return condition
+
+
+def measure(function, raw: str) -> float:
+    """
+    Return mean duration of a parse in milliseconds
+
+    The output conditions cache is cleared before each parse.
+    """
+    duration = 0.0
+    for _ in range(ROUNDS):
+        _parse_condition.cache_clear()
+        start = time.perf_counter()
+        function(raw)
+        duration += time.perf_counter() - start
+    return duration / ROUNDS * 1000
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as file:
+            raw = file.read()
+    else:
+        raw = generate_block()
+    block = Block.from_signed_raw(raw)
+    print(
+        "{0} lines, {1} certifications, {2} transactions".format(
+            len(raw.splitlines()), len(block.certifications), len(block.transactions)
+        )
+    )
+    condition_from_text = OutputSource.condition_from_text
+    # previous output conditions parsing, always with the PEG grammar
+    OutputSource.condition_from_text = staticmethod(legacy_condition_from_text)
+    if not same(block, legacy_from_signed_raw(raw)):
+        raise ValueError("Parsers built different blocks")
+    reference = measure(legacy_from_signed_raw, raw)
+    OutputSource.condition_from_text = staticmethod(condition_from_text)
+
+    print("{0:<30}{1:>10.2f} ms".format("previous parser", reference))
+    for label, function in (
+        ("previous parser, cached", legacy_from_signed_raw),
+        ("single pass parser", Block.from_signed_raw),
+    ):
+        duration = measure(function, raw)
+        print(
+            "{0:<30}{1:>10.2f} ms  ({2:+.0%})".format(
+                label, duration, duration / reference - 1
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
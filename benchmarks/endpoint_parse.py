@@ -0,0 +1,167 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import json
+import random
+import sys
+import time
+from typing import List
+
+from duniterpy.api.endpoint import (
+    MANAGED_API,
+    UnknownEndpoint,
+    _parse_endpoint,
+    endpoint,
+)
+import duniterpy.documents.peer
+from duniterpy.documents.peer import Peer
+
+# Benchmark of endpoint strings parsing on a peer list
+#
+# Compare the previous endpoint() (every managed API tried after an unknown endpoint
+# parse) with the prefix dispatching parser, with a cold and a warm cache, then the
+# parsing of the peer documents.
+#
+# The peer list is read from a json dump of peering documents when a path is given,
+# a list similar to the g1 network one is generated otherwise.
+#
+# Run from the parent folder:
+#
+#   poetry run python benchmarks/endpoint_parse.py [peers.json]
+
+# CONFIG #######################################
+
+PEERS_COUNT = 200
+ROUNDS = 20
+
+################################################
+
+
+def generate_peers(count: int) -> List[dict]:
+    """
+    Return peering documents json data with the usual endpoints of g1 nodes
+    """
+    rand = random.Random(0)
+    peers = []
+    for n in range(count):
+        host = "node{0}.duniter.example.org".format(n)
+        ipv4 = "192.168.{0}.{1}".format(n // 256, n % 256)
+        ipv6 = "2001:db8:0:85a3::ac1f:{0:x}".format(n)
+        endpoints = [
+            "BMAS {0} 443".format(host),
+            "BASIC_MERKLED_API {0} {1} {2} 10901".format(host, ipv4, ipv6),
+            "WS2P {0:08x} {1} 443 /ws2p".format(rand.getrandbits(32), host),
+        ]
+        if n % 3 == 0:
+            endpoints.append("GVA S {0} 443 gva".format(host))
+        if n % 5 == 0:
+            endpoints.append("WS2PTOR {0:08x} {1}.onion 20901".format(n, "x" * 56))
+        peers.append(
+            {
+                "version": 10,
+                "currency": "g1",
+                "pubkey": "8Fi1VSTbjkXguwThF4v2ZxC5whK7pwG2vcGTkPUPjPGU",
+                "block": "12345-0000016F2BFD9B4E2B2E6AC2AB8FA24D01E9D0A3C72A50A2D71A4EBDFD2B3E8",
+                "endpoints": endpoints,
+                "signature": "42yQm4hGTJYWkPg39hQAUgP6S6EQ4vTfXdJuxKEHL1ih6YHiDL2hcwrFgBHjXLRgxRhj2VNVqqc6b4JayKqTE14r",
+            }
+        )
+    return peers
+
+
+def load_peers(path: str) -> List[dict]:
+    """
+    Return peering documents json data from a dump file
+
+    The file contains a list of peering documents or a network/peers response.
+    """
+    with open(path) as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        data = data["peers"]
+    return data
+
+
+def legacy_endpoint(value):
+    """
+    Previous endpoint() implementation
+    """
+    result = UnknownEndpoint.from_inline(value)
+    for api, cls in MANAGED_API.items():
+        if value.startswith(api + " "):
+            result = cls.from_inline(value)
+    return result
+
+
+def measure(function, items) -> float:
+    """
+    Return mean duration of a parse of all items in milliseconds
+    """
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for item in items:
+            function(item)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def measure_cold(items) -> float:
+    """
+    Return mean duration of a parse of all items with an empty cache, in milliseconds
+    """
+    duration = 0.0
+    for _ in range(ROUNDS):
+        _parse_endpoint.cache_clear()
+        start = time.perf_counter()
+        for item in items:
+            endpoint(item)
+        duration += time.perf_counter() - start
+    return duration / ROUNDS * 1000
+
+
+def main():
+    peers = (
+        load_peers(sys.argv[1]) if len(sys.argv) > 1 else generate_peers(PEERS_COUNT)
+    )
+    inlines = [inline for peer in peers for inline in peer["endpoints"]]
+    print("{0} peers, {1} endpoints".format(len(peers), len(inlines)))
+
+    reference = measure(legacy_endpoint, inlines)
+    print("{0:<30}{1:>10.2f} ms".format("previous endpoint()", reference))
+    for label, duration in (
+        ("dispatch, cold cache", measure_cold(inlines)),
+        ("dispatch, warm cache", measure(endpoint, inlines)),
+    ):
+        print(
+            "{0:<30}{1:>10.2f} ms  ({2:+.0%})".format(
+                label, duration, duration / reference - 1
+            )
+        )
+
+    duniterpy.documents.peer.endpoint = legacy_endpoint
+    reference = measure(Peer.from_bma_json, peers)
+    duniterpy.documents.peer.endpoint = endpoint
+    print("{0:<30}{1:>10.2f} ms".format("peers, previous endpoint()", reference))
+    duration = measure(Peer.from_bma_json, peers)
+    print(
+        "{0:<30}{1:>10.2f} ms  ({2:+.0%})".format(
+            "peers, warm cache", duration, duration / reference - 1
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
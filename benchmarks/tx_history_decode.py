@@ -0,0 +1,150 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import json
+import time
+
+import jsonschema
+from aiohttp import web
+
+from duniterpy.api import bma
+from duniterpy.api.client import Client
+from duniterpy.api.endpoint import BMAEndpoint
+from duniterpy.tools import set_json_backend, JSON_BACKENDS
+
+# Benchmark of bma.tx.history response decoding on a multi-megabyte payload
+#
+# Compare the previous path (json decoded once to validate, then once again
+# to build the result) with the single decode path, for each JSON backend installed.
+#
+# Run from the parent folder:
+#
+#   poetry run python benchmarks/tx_history_decode.py
+
+# CONFIG #######################################
+
+TRANSACTIONS_COUNT = 4000
+ROUNDS = 10
+PORT = 18765
+PUBKEY = "8Fi1VSTbjkXguwThF4v2ZxC5whK7pwG2vcGTkPUPjPGU"
+
+################################################
+
+
+def generate_history(count: int) -> dict:
+    """
+    Return a tx history payload with count sent and received transactions
+    """
+    transaction = {
+        "version": 10,
+        "locktime": 0,
+        "blockstamp": "12345-0000016F2BFD9B4E2B2E6AC2AB8FA24D01E9D0A3C72A50A2D71A4EBDFD2B3E8",
+        "blockstampTime": 1500000000,
+        "issuers": [PUBKEY],
+        "inputs": ["1000:0:D:{0}:{1}".format(PUBKEY, n) for n in range(10)],
+        "outputs": [
+            "9000:0:SIG(HsLShAtzXTVxeUtQd7yi5Z5Zh4zNvbu8sTEZ53nfKcqY)",
+            "1000:0:SIG({0})".format(PUBKEY),
+        ],
+        "unlocks": ["{0}:SIG(0)".format(n) for n in range(10)],
+        "signatures": [
+            "42yQm4hGTJYWkPg39hQAUgP6S6EQ4vTfXdJuxKEHL1ih6YHiDL2hcwrFgBHjXLRgxRhj2VNVqqc6b4JayKqTE14r"
+        ],
+        "comment": "benchmark transaction",
+        "hash": "A0B1C2D3E4F5A6B7C8D9E0F1A2B3C4D5E6F7A8B9C0D1E2F3A4B5C6D7E8F9A0B1",
+        "time": 1500000000,
+        "block_number": 12345,
+        "received": None,
+    }
+    return {
+        "currency": "g1",
+        "pubkey": PUBKEY,
+        "history": {
+            "sent": [transaction] * (count // 2),
+            "received": [transaction] * (count // 2),
+            "sending": [],
+            "receiving": [],
+            "pending": [],
+        },
+    }
+
+
+async def double_decode(client: Client) -> dict:
+    """
+    Previous Client.get path: decode to validate, then decode again
+    """
+    response = await client.api.requests_get("tx/history/" + PUBKEY)
+    data = await response.json()
+    jsonschema.validate(data, bma.tx.HISTORY_SCHEMA)
+    return await response.json()
+
+
+async def single_decode(client: Client) -> dict:
+    """
+    Current Client.get path
+    """
+    return await client(bma.tx.history, PUBKEY)
+
+
+async def measure(client: Client, request) -> float:
+    """
+    Return mean duration of the request in milliseconds
+    """
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await request(client)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+async def main():
+    body = json.dumps(generate_history(TRANSACTIONS_COUNT)).encode("utf-8")
+    print("Payload size: {0:.1f} MB".format(len(body) / 1024 / 1024))
+
+    async def handler(request):
+        return web.Response(body=body, content_type="application/json")
+
+    app = web.Application()
+    app.router.add_route("GET", "/tx/history/{pubkey}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    client = Client(BMAEndpoint("127.0.0.1", "", "", PORT))
+    set_json_backend("json")
+    reference = await measure(client, double_decode)
+    print("{0:<30}{1:>10.1f} ms".format("double decode (json)", reference))
+    for backend in reversed(JSON_BACKENDS):
+        try:
+            set_json_backend(backend)
+        except ImportError:
+            continue
+        duration = await measure(client, single_decode)
+        print(
+            "{0:<30}{1:>10.1f} ms  ({2:+.0%})".format(
+                "single decode ({0})".format(backend),
+                duration,
+                duration / reference - 1,
+            )
+        )
+
+    await client.close()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,108 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+from duniterpy.api.client import Client
+from duniterpy.api.endpoint import BMAEndpoint
+from duniterpy.documents.ws2p.messages import Ack, Connect, Ok
+from duniterpy.helpers.ws2p import connect_sessions
+from duniterpy.key import SigningKey
+
+# Benchmark of concurrent WS2P handshakes against a local stand-in WS2P node
+#
+# The node answers each CONNECT message with signed CONNECT, ACK and OK messages.
+# It runs in the same process, so its signatures are part of the measure.
+#
+# Run from the parent folder:
+#
+#   poetry run python benchmarks/ws2p_handshake.py
+
+# CONFIG #######################################
+
+HANDSHAKES_COUNT = 300
+CONCURRENCIES = (1, 10, 100)
+PORT = 18766
+CURRENCY = "g1-test"
+
+################################################
+
+
+def node_handler(node_key: SigningKey):
+    """
+    Return the web socket handler of the stand-in WS2P node
+    """
+
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        connect = json.loads(
+            Connect(CURRENCY, node_key.pubkey).get_signed_json(node_key)
+        )
+        connect["currency"] = CURRENCY
+        await ws.send_json(connect)
+        async for message in ws:
+            data = json.loads(message.data)
+            if data.get("auth") == "CONNECT":
+                challenge = data["challenge"]
+                await ws.send_str(
+                    Ack(CURRENCY, node_key.pubkey, challenge).get_signed_json(node_key)
+                )
+                await ws.send_str(
+                    Ok(CURRENCY, node_key.pubkey, challenge).get_signed_json(node_key)
+                )
+        return ws
+
+    return handler
+
+
+async def main():
+    app = web.Application()
+    app.router.add_route("GET", "/", node_handler(SigningKey.from_seedhex("00" * 32)))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    signing_key = SigningKey.from_seedhex("01" * 32)
+    client = Client(BMAEndpoint("127.0.0.1", "", "", PORT), limit=0, limit_per_host=0)
+    for concurrency in CONCURRENCIES:
+        start = time.perf_counter()
+        sessions = await connect_sessions(
+            [client] * HANDSHAKES_COUNT,
+            signing_key,
+            CURRENCY,
+            concurrency=concurrency,
+        )
+        duration = time.perf_counter() - start
+        print(
+            "{0:<30}{1:>10.0f} handshakes/s  ({2} succeeded)".format(
+                "concurrency {0}".format(concurrency),
+                HANDSHAKES_COUNT / duration,
+                len(sessions),
+            )
+        )
+        await asyncio.gather(*[session.close() for session in sessions])
+
+    await client.close()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,173 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import logging
+import sqlite3
+from typing import Iterable, List, Optional
+
+from duniterpy.tools import json_dumps, json_loads
+
+logger = logging.getLogger("duniter/block_store")
+
+# Blocks deeper than the fork window can not change anymore
+DEFAULT_FORK_WINDOW = 100
+
+
+class BlockStore:
+    """
+    Persistent SQLite store of blocks json data, by number and hash
+
+    Blocks deeper than the fork window are served as is. Blocks in the fork window
+    are served only if the next stored block is chained to them by its previous hash.
+    Storing a block not chained to its stored neighbours removes the forked blocks.
+
+    SQLite calls are blocking, but fast enough for a local file.
+    """
+
+    def __init__(self, path: str, fork_window: int = DEFAULT_FORK_WINDOW) -> None:
+        """
+        Init BlockStore instance
+
+        :param path: SQLite database file path, ":memory:" for a transient store
+        :param fork_window: Number of blocks which can still be forked (optional, default 100)
+        """
+        self.path = path
+        self.fork_window = fork_window
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS blocks (
+                number INTEGER PRIMARY KEY,
+                hash TEXT NOT NULL,
+                previous_hash TEXT,
+                data TEXT NOT NULL
+            )"""
+        )
+        self.connection.commit()
+
+        # highest block number known on the network
+        self.head_number = -1
+
+    def head(self) -> int:
+        """
+        Return the highest known block number, -1 if unknown
+
+        :return:
+        """
+        row = self.connection.execute("SELECT MAX(number) FROM blocks").fetchone()
+        stored = -1 if row[0] is None else row[0]
+        return max(stored, self.head_number)
+
+    def set_head(self, number: int) -> None:
+        """
+        Set the current block number of the network
+
+        :param number: Current block number
+        :return:
+        """
+        self.head_number = max(self.head_number, number)
+
+    def get(self, number: int) -> Optional[dict]:
+        """
+        Return the block json data if stored and out of fork, else None
+
+        :param number: Block number
+        :return:
+        """
+        blocks = self.get_range(number, 1)
+        return None if blocks is None else blocks[0]
+
+    def get_range(self, start: int, count: int) -> Optional[List[dict]]:
+        """
+        Return count blocks json data from start if all are stored and out of fork, else None
+
+        :param start: First block number
+        :param count: Number of blocks
+        :return:
+        """
+        if count < 1:
+            return []
+
+        rows = self.connection.execute(
+            "SELECT number, hash, previous_hash, data FROM blocks "
+            "WHERE number >= ? AND number <= ? ORDER BY number",
+            (start, start + count),
+        ).fetchall()
+
+        last = start + count - 1
+        if len(rows) < count or rows[count - 1][0] != last:
+            return None
+
+        if last > self.head() - self.fork_window:
+            # blocks in the fork window must be chained up to a stored successor
+            if len(rows) <= count:
+                return None
+            for index in range(count):
+                if rows[index + 1][2] != rows[index][1]:
+                    return None
+
+        return [json_loads(row[3]) for row in rows[:count]]
+
+    def put(self, block: dict) -> None:
+        """
+        Store block json data, removing stored blocks forked by it
+
+        :param block: Block json data
+        :return:
+        """
+        self.put_many([block])
+
+    def put_many(self, blocks: Iterable[dict]) -> None:
+        """
+        Store blocks json data, removing stored blocks forked by them
+
+        :param blocks: Blocks json data
+        :return:
+        """
+        for block in blocks:
+            number = block["number"]
+            previous = self.connection.execute(
+                "SELECT hash FROM blocks WHERE number = ?", (number - 1,)
+            ).fetchone()
+            if previous is not None and previous[0] != block["previousHash"]:
+                logger.info("Fork detected at block %d", number - 1)
+                self.connection.execute(
+                    "DELETE FROM blocks WHERE number >= ?", (number - 1,)
+                )
+
+            following = self.connection.execute(
+                "SELECT previous_hash FROM blocks WHERE number = ?", (number + 1,)
+            ).fetchone()
+            if following is not None and following[0] != block["hash"]:
+                logger.info("Fork detected at block %d", number + 1)
+                self.connection.execute(
+                    "DELETE FROM blocks WHERE number > ?", (number,)
+                )
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO blocks (number, hash, previous_hash, data) "
+                "VALUES (?, ?, ?, ?)",
+                (number, block["hash"], block["previousHash"], json_dumps(block)),
+            )
+        self.connection.commit()
+
+    def close(self) -> None:
+        """
+        Close the database connection
+
+        :return:
+        """
+        self.connection.close()
@@ -267,7 +267,10 @@ async def current(client: Client) -> dict:
     :param client: Client to connect to the api
     :return:
     """
-    return await client.get(MODULE + "/current", schema=BLOCK_SCHEMA)
+    data = await client.get(MODULE + "/current", schema=BLOCK_SCHEMA)
+    if client.block_store is not None:
+        client.block_store.set_head(data["number"])
+    return data
 
 
 async def block(
@@ -290,7 +293,15 @@ async def block(
             rtype=RESPONSE_AIOHTTP,
         )
     # GET block
-    return await client.get(MODULE + "/block/%d" % number, schema=BLOCK_SCHEMA)
+    if client.block_store is not None:
+        data = client.block_store.get(number)
+        if data is not None:
+            return data
+
+    data = await client.get(MODULE + "/block/%d" % number, schema=BLOCK_SCHEMA)
+    if client.block_store is not None:
+        client.block_store.put(data)
+    return data
 
 
 async def blocks(client: Client, count: int, start: int) -> list:
@@ -305,9 +316,17 @@ async def blocks(client: Client, count: int, start: int) -> list:
     assert type(count) is int
     assert type(start) is int
 
-    return await client.get(
+    if client.block_store is not None:
+        data = client.block_store.get_range(start, count)
+        if data is not None:
+            return data
+
+    data = await client.get(
         MODULE + "/blocks/%d/%d" % (count, start), schema=BLOCKS_SCHEMA
     )
+    if client.block_store is not None:
+        client.block_store.put_many(data)
+    return data
 
 
 async def hardship(client: Client, pubkey: str) -> dict:
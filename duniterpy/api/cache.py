@@ -0,0 +1,370 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    TYPE_CHECKING,
+)
+
+import aiohttp
+
+if TYPE_CHECKING:
+    from .client import WSConnection  # pylint: disable=cyclic-import
+
+logger = logging.getLogger("duniter/cache")
+
+# Cache rules are (url path regex, ttl in seconds or None to cache forever,
+# True if the entries are invalidated by a new block)
+CacheRule = Tuple[str, Optional[float], bool]
+
+# Ttl of the height dependent entries if no new block invalidates them,
+# average block interval of the Ğ1 currency
+DEFAULT_HEIGHT_TTL = 300.0
+
+DEFAULT_CACHE_RULES = [
+    # immutable resources
+    (r"^blockchain/block/[0-9]+$", None, False),
+    (r"^blockchain/parameters$", None, False),
+    # resources depending on the blockchain height
+    (r"^blockchain/current$", DEFAULT_HEIGHT_TTL, True),
+    (r"^tx/sources/", DEFAULT_HEIGHT_TTL, True),
+    (r"^wot/requirements/", DEFAULT_HEIGHT_TTL, True),
+]  # type: List[CacheRule]
+
+# Web socket reconnection delays of watch(), in seconds
+DEFAULT_WATCH_BACKOFF = 1.0
+DEFAULT_WATCH_MAX_BACKOFF = 60.0
+
+# Errors of a lost web socket connection
+WATCH_ERRORS = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    OSError,
+)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# approximated memory size of scalar values and containers
+VALUE_SIZE = 16
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Return the approximated memory size in bytes of a decoded json value
+
+    :param value: Json data or text
+    :return:
+    """
+    if isinstance(value, str):
+        return VALUE_SIZE + len(value)
+    if isinstance(value, dict):
+        return VALUE_SIZE + sum(
+            estimate_size(key) + estimate_size(item) for key, item in value.items()
+        )
+    if isinstance(value, list):
+        return VALUE_SIZE + sum(estimate_size(item) for item in value)
+    return VALUE_SIZE
+
+
+class CacheEntry:
+    """
+    Cached response and its expiration data
+    """
+
+    __slots__ = ("value", "expires", "height_dependent", "size")
+
+    def __init__(
+        self, value: Any, expires: Optional[float], height_dependent: bool, size: int
+    ) -> None:
+        """
+        Init CacheEntry instance
+
+        :param value: Response data
+        :param expires: Expiration time, None if it never expires
+        :param height_dependent: True if invalidated by a new block
+        :param size: Approximated memory size in bytes
+        """
+        self.value = value
+        self.expires = expires
+        self.height_dependent = height_dependent
+        self.size = size
+
+
+class ResponseCache:
+    """
+    In memory LRU cache of GET responses
+
+    Only url paths matching a rule are cached. Entries of height dependent rules
+    are invalidated when a new block is received, or expire after their ttl.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[List[CacheRule]] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        """
+        Init ResponseCache instance
+
+        :param rules: Cache rules list (optional, default DEFAULT_CACHE_RULES)
+        :param max_entries: Maximum number of entries (optional, default 1024)
+        :param max_size: Maximum approximated memory size in bytes (optional, default 64 MB)
+        """
+        self.rules = [
+            (re.compile(pattern), ttl, height_dependent)
+            for pattern, ttl, height_dependent in (
+                DEFAULT_CACHE_RULES if rules is None else rules
+            )
+        ]  # type: List[Tuple[Pattern, Optional[float], bool]]
+        self.max_entries = max_entries
+        self.max_size = max_size
+
+        self.entries = OrderedDict()  # type: Dict[Tuple, CacheEntry]
+        self.size = 0
+        self.block_number = -1
+        self.block_hash = None  # type: Optional[str]
+        # incremented on each new block, to discard responses requested before it
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def rule(self, url_path: str) -> Optional[Tuple[Pattern, Optional[float], bool]]:
+        """
+        Return the first rule matching the url path, None if the path is not cached
+
+        :param url_path: Url path following the endpoint
+        :return:
+        """
+        url_path = url_path.lstrip("/")
+        for rule in self.rules:
+            if rule[0].search(url_path):
+                return rule
+        return None
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        """
+        Return the cached value of the key, None if missing or expired
+
+        :param key: Request key
+        :return:
+        """
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires is not None:
+            if entry.expires < time.monotonic():
+                self._remove(key)
+                entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)  # type: ignore
+        return entry.value
+
+    def put(
+        self, key: Tuple, value: Any, url_path: str, generation: Optional[int] = None
+    ) -> None:
+        """
+        Store the value of the key if the url path is cached
+
+        :param key: Request key
+        :param value: Response data
+        :param url_path: Url path following the endpoint
+        :param generation: Cache generation when the request was sent (optional, default None)
+        :return:
+        """
+        rule = self.rule(url_path)
+        if rule is None:
+            return
+        _, ttl, height_dependent = rule
+
+        # response may be older than the last block
+        if (
+            height_dependent
+            and generation is not None
+            and generation != self.generation
+        ):
+            return
+
+        size = estimate_size(value)
+        if size > self.max_size:
+            return
+
+        if key in self.entries:
+            self._remove(key)
+
+        expires = None if ttl is None else time.monotonic() + ttl
+        self.entries[key] = CacheEntry(value, expires, height_dependent, size)
+        self.size += size
+
+        while len(self.entries) > self.max_entries or self.size > self.max_size:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Tuple) -> None:
+        """
+        Remove the entry of the key
+
+        :param key: Request key
+        :return:
+        """
+        self.size -= self.entries.pop(key).size
+
+    def new_block(self, number: int, block_hash: str) -> None:
+        """
+        Invalidate the height dependent entries if the block is a new one
+
+        A block with the same number and another hash is a new one: a fork
+        replaced the head of the chain.
+
+        :param number: Block number
+        :param block_hash: Block hash
+        :return:
+        """
+        if number == self.block_number and block_hash == self.block_hash:
+            return
+
+        self.block_number = number
+        self.block_hash = block_hash
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """
+        Invalidate the height dependent entries
+
+        :return:
+        """
+        self.generation += 1
+        for key in [
+            key for key, entry in self.entries.items() if entry.height_dependent
+        ]:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """
+        Remove all entries
+
+        :return:
+        """
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        """
+        Return the cache statistics
+
+        :return:
+        """
+        return {
+            "entries": len(self.entries),
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    async def watch(
+        self,
+        ws: Optional["WSConnection"],
+        connect: Optional[Callable[[], Awaitable["WSConnection"]]] = None,
+        backoff: float = DEFAULT_WATCH_BACKOFF,
+        max_backoff: float = DEFAULT_WATCH_MAX_BACKOFF,
+    ) -> None:
+        """
+        Invalidate the height dependent entries on each block received on the web socket
+
+        Blocks may be missed when the connection is lost: the height dependent entries
+        are then invalidated. Without connect coroutine function, watch returns,
+        otherwise it reconnects with jittered exponential backoff until cancelled.
+
+        Usage::
+
+            ws = await client(bma.ws.block)
+            asyncio.ensure_future(cache.watch(ws, lambda: client(bma.ws.block)))
+
+        :param ws: Web socket connection to bma.ws.block, None to connect first
+        :param connect: Coroutine function returning a new connection to bma.ws.block
+            (optional, default None to stop on connection loss)
+        :param backoff: Base reconnection delay in seconds, doubled on each failure
+            (optional, default 1)
+        :param max_backoff: Maximum reconnection delay in seconds (optional, default 60)
+        :return:
+        """
+        attempt = 0
+        while True:
+            if ws is not None:
+                if await self._receive_blocks(ws):
+                    attempt = 0
+                logger.debug("Block web socket closed, invalidate cache")
+                self.invalidate()
+                try:
+                    await ws.close()
+                except Exception:  # pylint: disable=broad-except
+                    pass
+                ws = None
+            if connect is None:
+                return
+
+            await asyncio.sleep(
+                random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+            )
+            attempt += 1
+            try:
+                ws = await connect()
+            except WATCH_ERRORS as exception:
+                logger.warning("Block web socket connection failed: %s", exception)
+
+    async def _receive_blocks(self, ws: "WSConnection") -> bool:
+        """
+        Call new_block on each block received until the connection is lost,
+        return True if a block was received
+
+        :param ws: Web socket connection to bma.ws.block
+        :return:
+        """
+        received = False
+        while True:
+            try:
+                data = await ws.receive_json()
+            except TypeError:
+                # not a text message, the connection is closed
+                return received
+            except WATCH_ERRORS as exception:
+                logger.warning("Block web socket failed: %s", exception)
+                return received
+            if isinstance(data, dict) and "number" in data and "hash" in data:
+                logger.debug("New block %s, invalidate cache", data["number"])
+                self.new_block(data["number"], data["hash"])
+                received = True
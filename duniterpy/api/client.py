@@ -15,16 +15,31 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import json
+import asyncio
+import copy
 import logging
-from typing import Callable, Union, Any, Optional, Dict
+import ssl
+from collections import OrderedDict
+from typing import Awaitable, Callable, Union, Any, Optional, Dict, List, Tuple
 
 import aiohttp
 import jsonschema
-from aiohttp import ClientResponse, ClientSession, ClientWebSocketResponse
+from aiohttp import (
+    ClientResponse,
+    ClientSession,
+    ClientWebSocketResponse,
+    TCPConnector,
+)
+from aiohttp.abc import AbstractResolver
 from aiohttp.client import _WSRequestContextManager
 import duniterpy.api.endpoint as endpoint
-from .errors import DuniterError
+from duniterpy.tools import json_loads
+from .block_store import BlockStore
+from .cache import ResponseCache
+from .errors import DuniterError, ThrottledError, HTTP_LIMITATION
+from .happy_eyeballs import HappyEyeballs
+from .retry import RetryPolicy
+from .throttle import RateLimiter, THROTTLE_STATUSES, parse_retry_after
 
 logger = logging.getLogger("duniter")
 
@@ -36,6 +51,32 @@ RESPONSE_AIOHTTP = "aiohttp"
 # Connection type constants
 CONNECTION_TYPE_AIOHTTP = 1
 
+# Connection pool default settings
+DEFAULT_CONNECTIONS_LIMIT = 100
+DEFAULT_CONNECTIONS_LIMIT_PER_HOST = 20
+DEFAULT_KEEPALIVE_TIMEOUT = 30.0
+DEFAULT_DNS_CACHE_TTL = 300
+
+# shared SSL context, loading CA certificates is expensive
+_ssl_context = None  # type: Optional[ssl.SSLContext]
+
+# Response validation policy constants
+VALIDATION_ALWAYS = "always"
+VALIDATION_SAMPLED = "sampled"
+VALIDATION_OFF = "off"
+DEFAULT_VALIDATION_SAMPLE_RATE = 10
+
+# Retries of a request throttled by the node
+DEFAULT_THROTTLE_RETRIES = 2
+
+# Default requests timeout
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=15)
+
+# compiled validators registry, by schema id
+# the schema is kept referenced so that its id can not be reused
+VALIDATORS_REGISTRY_SIZE = 256
+_validators = OrderedDict()  # type: Dict[int, Tuple[dict, Any]]
+
 # jsonschema validator
 ERROR_SCHEMA = {
     "type": "object",
@@ -44,6 +85,50 @@ ERROR_SCHEMA = {
 }
 
 
+def get_validator(schema: dict) -> Any:
+    """
+    Return the validator compiled for the schema
+
+    Validators are compiled once and kept in a registry, the schema being checked at compile time.
+
+    :param schema: dict for jsonschema
+    :return:
+    """
+    try:
+        return _validators[id(schema)][1]
+    except KeyError:
+        pass
+
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    validator = validator_class(schema)
+
+    if len(_validators) >= VALIDATORS_REGISTRY_SIZE:
+        _validators.popitem(last=False)  # type: ignore
+    _validators[id(schema)] = (schema, validator)
+
+    return validator
+
+
+def validate(data: Any, schema: dict) -> None:
+    """
+    Validate data against the schema with its compiled validator
+
+    Same behavior as jsonschema.validate()
+
+    :param data: the json data
+    :param schema: dict for jsonschema
+    :return:
+    """
+    validator = get_validator(schema)
+    if validator.is_valid(data):
+        return
+
+    error = jsonschema.exceptions.best_match(validator.iter_errors(data))
+    if error is not None:
+        raise error
+
+
 def parse_text(text: str, schema: dict) -> Any:
     """
     Validate and parse the BMA answer from websocket
@@ -53,9 +138,9 @@ def parse_text(text: str, schema: dict) -> Any:
     :return: the json data
     """
     try:
-        data = json.loads(text)
-        jsonschema.validate(data, schema)
-    except (TypeError, json.decoder.JSONDecodeError) as e:
+        data = json_loads(text)
+        validate(data, schema)
+    except (TypeError, ValueError) as e:
         raise jsonschema.ValidationError("Could not parse json") from e
 
     return data
@@ -69,9 +154,9 @@ def parse_error(text: str) -> dict:
     :return: the json data
     """
     try:
-        data = json.loads(text)
-        jsonschema.validate(data, ERROR_SCHEMA)
-    except (TypeError, json.decoder.JSONDecodeError) as e:
+        data = json_loads(text)
+        validate(data, ERROR_SCHEMA)
+    except (TypeError, ValueError) as e:
         raise jsonschema.ValidationError(
             "Could not parse json : {0}".format(str(e))
         ) from e
@@ -88,17 +173,91 @@ async def parse_response(response: ClientResponse, schema: dict) -> Any:
     :return: the json data
     """
     try:
-        data = await response.json()
+        data = await response.json(loads=json_loads)
         response.close()
         if schema is not None:
-            jsonschema.validate(data, schema)
+            validate(data, schema)
         return data
-    except (TypeError, json.decoder.JSONDecodeError) as e:
+    except (TypeError, ValueError) as e:
         raise jsonschema.ValidationError(
             "Could not parse json : {0}".format(str(e))
         ) from e
 
 
+async def read_response(
+    response: ClientResponse, rtype: str, schema: Optional[dict] = None
+) -> Any:
+    """
+    Return the response in the chosen type, validated if a schema is supplied
+
+    The json body is decoded only once, even when validated.
+
+    :param response: Response of aiohttp request
+    :param rtype: Response type
+    :param schema: The expected response structure (optional, default None)
+    :return:
+    """
+    if rtype == RESPONSE_JSON:
+        if schema is not None:
+            return await parse_response(response, schema)
+        return await response.json(loads=json_loads)
+
+    if rtype == RESPONSE_TEXT:
+        text = await response.text()
+        if schema is not None:
+            parse_text(text, schema)
+        return text
+
+    # aiohttp response, body is kept in cache for the caller
+    if schema is not None:
+        await parse_response(response, schema)
+    return response
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    """
+    Return the SSL context shared by all clients sessions
+
+    The context is created on first call, then reused for every BMAS/GVA connection.
+
+    :return:
+    """
+    global _ssl_context  # pylint: disable=global-statement
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+def create_session(
+    limit: int = DEFAULT_CONNECTIONS_LIMIT,
+    limit_per_host: int = DEFAULT_CONNECTIONS_LIMIT_PER_HOST,
+    keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+    ttl_dns_cache: Optional[int] = DEFAULT_DNS_CACHE_TTL,
+    ssl_context: Optional[ssl.SSLContext] = None,
+    resolver: Optional[AbstractResolver] = None,
+) -> ClientSession:
+    """
+    Return an aiohttp session with an explicitly configured connection pool
+
+    :param limit: Total number of simultaneous connections (0 for no limit)
+    :param limit_per_host: Number of simultaneous connections to the same host (0 for no limit)
+    :param keepalive_timeout: Seconds to keep an idle connection open for reuse
+    :param ttl_dns_cache: Seconds to cache DNS resolutions (None to cache forever)
+    :param ssl_context: SSL context (optional, default shared context)
+    :param resolver: DNS resolver, as a HappyEyeballs instance (optional, default aiohttp resolver)
+    :return:
+    """
+    connector = TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        ttl_dns_cache=ttl_dns_cache,
+        ssl=get_ssl_context() if ssl_context is None else ssl_context,
+        resolver=resolver,
+    )
+    return ClientSession(connector=connector)
+
+
 class WSConnection:
     """
     From the documentation of the aiohttp_library, the web socket connection
@@ -124,7 +283,11 @@ class WSConnection:
 
         :param connection: Connection instance of the connection library
         """
-        if not isinstance(connection, _WSRequestContextManager):
+        # _WSRequestContextManager is a parameterized generic since aiohttp 3.11
+        if not isinstance(
+            connection,
+            getattr(_WSRequestContextManager, "__origin__", _WSRequestContextManager),
+        ):
             raise Exception(
                 BaseException(
                     "Only  aiohttp.client._WSRequestContextManager class supported"
@@ -202,15 +365,18 @@ class API:
         self,
         connection_handler: endpoint.ConnectionHandler,
         headers: Optional[dict] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
     ) -> None:
         """
         Asks a module in order to create the url used then by derivated classes.
 
         :param connection_handler: Connection handler
         :param headers: Headers dictionary (optional, default None)
+        :param timeout: Requests timeout (optional, default DEFAULT_TIMEOUT)
         """
         self.connection_handler = connection_handler
         self.headers = {} if headers is None else headers
+        self.timeout = DEFAULT_TIMEOUT if timeout is None else timeout
 
     def reverse_url(self, scheme: str, path: str) -> str:
         """
@@ -241,11 +407,53 @@ class API:
 
         return url
 
-    async def requests_get(self, path: str, **kwargs: Any) -> ClientResponse:
+    @staticmethod
+    def check_throttling(response: ClientResponse) -> None:
+        """
+        Raise ThrottledError if the node throttles requests
+
+        :param response: Response of aiohttp request
+        :return:
+        """
+        if response.status in THROTTLE_STATUSES:
+            response.release()
+            raise ThrottledError(
+                response.status, parse_retry_after(response.headers.get("Retry-After"))
+            )
+
+    async def check_status(self, response: ClientResponse) -> None:
+        """
+        Raise the error returned by the node if status code is not 200
+
+        :param response: Response of aiohttp request
+        :return:
+        """
+        if response.status == 200:
+            return
+
+        self.check_throttling(response)
+        try:
+            error_data = parse_error(await response.text())
+        except (TypeError, jsonschema.ValidationError) as e:
+            raise ValueError(
+                "status code != 200 => %d (%s)"
+                % (response.status, (await response.text()))
+            ) from e
+
+        if error_data["ucode"] == HTTP_LIMITATION:
+            raise ThrottledError(
+                response.status, parse_retry_after(response.headers.get("Retry-After"))
+            )
+        raise DuniterError(error_data)
+
+    async def requests_get(
+        self, path: str, _timeout: Optional[aiohttp.ClientTimeout] = None, **kwargs: Any
+    ) -> ClientResponse:
         """
         Requests GET wrapper in order to use API parameters.
 
         :param path: the request path
+        :param _timeout: the request timeout (optional, default API timeout)
         :return:
         """
         logging.debug(
@@ -257,25 +465,20 @@ class API:
             params=kwargs,
             headers=self.headers,
             proxy=self.connection_handler.proxy,
-            timeout=15,
+            timeout=self.timeout if _timeout is None else _timeout,
         )
-        if response.status != 200:
-            try:
-                error_data = parse_error(await response.text())
-                raise DuniterError(error_data)
-            except (TypeError, jsonschema.ValidationError) as e:
-                raise ValueError(
-                    "status code != 200 => %d (%s)"
-                    % (response.status, (await response.text()))
-                ) from e
+        await self.check_status(response)
 
         return response
 
-    async def requests_post(self, path: str, **kwargs: Any) -> ClientResponse:
+    async def requests_post(
+        self, path: str, _timeout: Optional[aiohttp.ClientTimeout] = None, **kwargs: Any
+    ) -> ClientResponse:
         """
         Requests POST wrapper in order to use API parameters.
 
         :param path: the request path
+        :param _timeout: the request timeout (optional, default API timeout)
         :return:
         """
         if "self_" in kwargs:
@@ -287,18 +490,10 @@ class API:
             data=kwargs,
             headers=self.headers,
             proxy=self.connection_handler.proxy,
-            timeout=15,
+            timeout=self.timeout if _timeout is None else _timeout,
         )
 
-        if response.status != 200:
-            try:
-                error_data = parse_error(await response.text())
-                raise DuniterError(error_data)
-            except (TypeError, jsonschema.ValidationError) as e:
-                raise ValueError(
-                    "status code != 200 => %d (%s)"
-                    % (response.status, (await response.text()))
-                ) from e
+        await self.check_status(response)
 
         return response
 
@@ -308,6 +503,7 @@ class API:
         path: str = "",
         data: Optional[dict] = None,
         _json: Optional[dict] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
     ) -> ClientResponse:
         """
         Generic requests wrapper on aiohttp
@@ -316,6 +512,7 @@ class API:
         :param path: the path added to endpoint
         :param data: data for form POST request
         :param _json: json for json POST request
+        :param timeout: the request timeout (optional, default API timeout)
         :rtype: aiohttp.ClientResponse
         """
         url = self.reverse_url(self.connection_handler.http_scheme, path)
@@ -324,20 +521,24 @@ class API:
             logging.debug("%s : %s, data=%s", method, url, data)
         elif _json is not None:
             logging.debug("%s : %s, json=%s", method, url, _json)
-            # http header to send json body
-            self.headers["Content-Type"] = "application/json"
         else:
             logging.debug("%s : %s", method, url)
 
+        headers = self.headers
+        if _json is not None:
+            # http header to send json body, without altering shared headers
+            headers = dict(self.headers, **{"Content-Type": "application/json"})
+
         response = await self.connection_handler.session.request(
             method,
             url,
             data=data,
             json=_json,
-            headers=self.headers,
+            headers=headers,
             proxy=self.connection_handler.proxy,
-            timeout=15,
+            timeout=self.timeout if timeout is None else timeout,
         )
+        self.check_throttling(response)
         return response
 
     async def connect_ws(self, path: str) -> WSConnection:
@@ -376,13 +577,55 @@ class Client:
         _endpoint: Union[str, endpoint.Endpoint],
         session: Optional[ClientSession] = None,
         proxy: Optional[str] = None,
+        limit: int = DEFAULT_CONNECTIONS_LIMIT,
+        limit_per_host: int = DEFAULT_CONNECTIONS_LIMIT_PER_HOST,
+        keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache: Optional[int] = DEFAULT_DNS_CACHE_TTL,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        validation: str = VALIDATION_ALWAYS,
+        validation_sample_rate: int = DEFAULT_VALIDATION_SAMPLE_RATE,
+        coalesce: bool = False,
+        cache: Optional[ResponseCache] = None,
+        block_store: Optional[BlockStore] = None,
+        rate_limit: Optional[float] = None,
+        rate_burst: int = 1,
+        max_in_flight: Optional[int] = None,
+        throttle_retries: int = DEFAULT_THROTTLE_RETRIES,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        happy_eyeballs: Optional[HappyEyeballs] = None,
     ) -> None:
         """
         Init Client instance
 
+        Connection pool settings are ignored if a session is given.
+
         :param _endpoint: Endpoint string in duniter format
         :param session: Aiohttp client session (optional, default None)
         :param proxy: Proxy server as hostname:port (optional, default None)
+        :param limit: Total number of simultaneous connections (optional, default 100)
+        :param limit_per_host: Simultaneous connections to the same host (optional, default 20)
+        :param keepalive_timeout: Seconds to keep idle connections open (optional, default 30)
+        :param ttl_dns_cache: Seconds to cache DNS resolutions (optional, default 300)
+        :param ssl_context: SSL context for secured endpoints (optional, default shared context)
+        :param validation: Response validation policy, VALIDATION_ALWAYS, VALIDATION_SAMPLED
+            or VALIDATION_OFF for trusted nodes (optional, default VALIDATION_ALWAYS)
+        :param validation_sample_rate: Validate one response every N with VALIDATION_SAMPLED
+            (optional, default 10)
+        :param coalesce: Send identical concurrent GET requests only once (optional, default False)
+        :param cache: Cache of GET responses, can be shared by many clients (optional, default None)
+        :param block_store: Persistent store of blocks used by bma.blockchain (optional, default None)
+        :param rate_limit: Maximum requests per second to the endpoint (optional, default None)
+        :param rate_burst: Requests sent at once within the rate limit (optional, default 1)
+        :param max_in_flight: Maximum requests in flight to the endpoint (optional, default None)
+        :param throttle_retries: Retries of a request throttled by the node, after a backoff delay
+            (optional, default 2)
+        :param timeout: Total, connect and read timeouts of requests (optional, default 15s total)
+        :param retry_policy: Retry policy of GET requests, can be shared by many clients
+            (optional, default None for no retry)
+        :param happy_eyeballs: Race the connections to the IPv6 and IPv4 addresses of the
+            endpoint, can be shared by many clients. A given session must use it as resolver
+            (optional, default None for the first address of the endpoint)
         """
         if isinstance(_endpoint, str):
             # Endpoint Protocol detection
@@ -395,20 +638,150 @@ class Client:
                 "{0} endpoint in not supported".format(self.endpoint.api)
             )
 
+        if validation not in (VALIDATION_ALWAYS, VALIDATION_SAMPLED, VALIDATION_OFF):
+            raise ValueError("Unknown validation policy {0}".format(validation))
+        if validation_sample_rate < 1:
+            raise ValueError("Validation sample rate must be a positive integer")
+
         # if no user session...
         if session is None:
-            # open a session
-            self.session = ClientSession()
+            # open a session with a tuned connection pool
+            self.session = create_session(
+                limit,
+                limit_per_host,
+                keepalive_timeout,
+                ttl_dns_cache,
+                ssl_context,
+                happy_eyeballs,
+            )
         else:
             self.session = session
         self.proxy = proxy
 
+        # one connection handler for the lifetime of the client
+        self.connection_handler = self.endpoint.conn_handler(self.session, self.proxy)
+        self.api = API(self.connection_handler, timeout=timeout)
+        self.retry_policy = retry_policy
+
+        self.validation = validation
+        self.validation_sample_rate = validation_sample_rate
+        self._responses_count = 0
+
+        self.coalesce = coalesce
+        # GET requests in flight, by request key
+        self._in_flight = {}  # type: Dict[Tuple, asyncio.Future]
+
+        self.cache = cache
+        self.block_store = block_store
+
+        self.rate_limiter = RateLimiter(rate_limit, rate_burst, max_in_flight)
+        self.throttle_retries = throttle_retries
+
+        self.happy_eyeballs = happy_eyeballs
+        # addresses raced when the endpoint has no domain name
+        self._race_hosts = []  # type: List[str]
+        if happy_eyeballs is not None:
+            happy_eyeballs.add_endpoint(self.endpoint)
+            if not getattr(self.endpoint, "server", None):
+                self._race_hosts = [
+                    address
+                    for address in (
+                        getattr(self.endpoint, "ipv6", None),
+                        getattr(self.endpoint, "ipv4", None),
+                    )
+                    if address
+                ]
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Return the number of requests waiting for the rate limiter
+
+        :return:
+        """
+        return self.rate_limiter.queue_depth
+
+    async def select_address(self) -> None:
+        """
+        Connect the next requests to the address winning the connection race,
+        if the endpoint has IPv6 and IPv4 addresses and no domain name
+
+        :return:
+        """
+        if self.happy_eyeballs is None or len(self._race_hosts) < 2:
+            return
+        try:
+            address = await self.happy_eyeballs.race(
+                self._race_hosts, self.connection_handler.port
+            )
+        except (OSError, asyncio.TimeoutError) as exception:
+            # the request fails on the default address
+            logger.debug("No connection to %s: %s", self.endpoint, exception)
+            return
+        if ":" in address:
+            address = "[{0}]".format(address)
+        self.connection_handler.server = address
+
+    async def throttle(self, request: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Send the request within the rate limits, retrying it after a backoff delay
+        if the node throttles it
+
+        :param request: Coroutine function sending the request
+        :return:
+        """
+        attempt = 0
+        while True:
+            await self.select_address()
+            async with self.rate_limiter:
+                try:
+                    result = await request()
+                except aiohttp.ClientConnectorError:
+                    if self._race_hosts and self.happy_eyeballs is not None:
+                        # race again on the next request
+                        self.happy_eyeballs.forget(
+                            self._race_hosts, self.connection_handler.port
+                        )
+                    raise
+                except ThrottledError as exception:
+                    delay = self.rate_limiter.throttled(exception.retry_after)
+                    if attempt >= self.throttle_retries:
+                        raise
+                    logger.warning(
+                        "Requests throttled by %s, retry in %.1fs", self.endpoint, delay
+                    )
+                else:
+                    self.rate_limiter.success()
+                    return result
+            attempt += 1
+
+    def validation_schema(self, schema: Optional[dict]) -> Optional[dict]:
+        """
+        Return the schema if the next response must be validated according to the policy, else None
+
+        :param schema: Json Schema to validate response
+        :return:
+        """
+        if schema is None or self.validation == VALIDATION_OFF:
+            return None
+
+        if self.validation == VALIDATION_SAMPLED:
+            # validate the first response, then one every sample rate
+            sampled = self._responses_count % self.validation_sample_rate == 0
+            self._responses_count += 1
+            if not sampled:
+                return None
+
+        return schema
+
     async def get(
         self,
         url_path: str,
         params: Optional[dict] = None,
         rtype: str = RESPONSE_JSON,
         schema: Optional[dict] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+        retry_policy: Optional[RetryPolicy] = None,
     ) -> Any:
         """
         GET request on endpoint host + url_path
@@ -417,29 +790,125 @@ class Client:
         :param params: Url query string parameters dictionary (optional, default None)
         :param rtype: Response type (optional, default RESPONSE_JSON)
         :param schema: Json Schema to validate response (optional, default None)
+        :param timeout: Request timeout (optional, default client timeout)
+        :param retry_policy: Request retry policy (optional, default client retry policy)
         :return:
         """
         if params is None:
             params = dict()
 
-        client = API(self.endpoint.conn_handler(self.session, self.proxy))
+        if timeout is not None or retry_policy is not None:
+            options = (timeout, retry_policy)  # type: Optional[Tuple]
+        else:
+            options = None
+
+        # aiohttp responses can not be shared
+        if rtype == RESPONSE_AIOHTTP or (not self.coalesce and self.cache is None):
+            return await self._get(url_path, params, rtype, schema, options)
 
-        # get aiohttp response
-        response = await client.requests_get(url_path, **params)
+        key = (url_path, tuple(sorted(params.items())), rtype, id(schema))
 
-        # if schema supplied...
-        if schema is not None:
-            # validate response
-            await parse_response(response, schema)
+        if self.cache is not None and self.cache.rule(url_path) is not None:
+            result = self.cache.get(key)
+            if result is None:
+                generation = self.cache.generation
+                result = await self._coalesced_get(
+                    key, url_path, params, rtype, schema, options
+                )
+                self.cache.put(key, result, url_path, generation)
+            # the cached data must not be modified by the caller
+            return copy.deepcopy(result)
 
-        # return the chosen type
-        result = response  # type: Any
-        if rtype == RESPONSE_TEXT:
-            result = await response.text()
-        elif rtype == RESPONSE_JSON:
-            result = await response.json()
+        return await self._coalesced_get(key, url_path, params, rtype, schema, options)
 
-        return result
+    async def _coalesced_get(
+        self,
+        key: Tuple,
+        url_path: str,
+        params: dict,
+        rtype: str,
+        schema: Optional[dict],
+        options: Optional[Tuple] = None,
+    ) -> Any:
+        """
+        GET request on endpoint host + url_path, shared with identical requests in flight
+        if coalesce is enabled
+
+        :param key: Request key
+        :param url_path: Url encoded path following the endpoint
+        :param params: Url query string parameters dictionary
+        :param rtype: Response type
+        :param schema: Json Schema to validate response
+        :param options: Timeout and retry policy of the request (optional, default None)
+        :return:
+        """
+        if not self.coalesce:
+            return await self._get(url_path, params, rtype, schema, options)
+
+        request = self._in_flight.get(key)
+        if request is None:
+            # first caller, send the request
+            request = asyncio.ensure_future(
+                self._get(url_path, params, rtype, schema, options)
+            )
+            self._in_flight[key] = request
+            request.add_done_callback(
+                lambda _request: self._request_done(key, _request)
+            )
+
+        # a cancelled caller does not cancel the request of the others,
+        # each caller gets its own copy of the shared result, the first one too
+        return copy.deepcopy(await asyncio.shield(request))
+
+    def _request_done(self, key: Tuple, request: asyncio.Future) -> None:
+        """
+        Remove the done GET request from the requests in flight
+
+        :param key: Request key
+        :param request: Request future
+        :return:
+        """
+        self._in_flight.pop(key, None)
+        # exception is retrieved, even if every caller was cancelled
+        if not request.cancelled():
+            request.exception()
+
+    async def _get(
+        self,
+        url_path: str,
+        params: dict,
+        rtype: str,
+        schema: Optional[dict],
+        options: Optional[Tuple] = None,
+    ) -> Any:
+        """
+        Send GET request on endpoint host + url_path
+
+        :param url_path: Url encoded path following the endpoint
+        :param params: Url query string parameters dictionary
+        :param rtype: Response type
+        :param schema: Json Schema to validate response
+        :param options: Timeout and retry policy of the request (optional, default None)
+        :return:
+        """
+        timeout, retry_policy = (None, None) if options is None else options
+        if retry_policy is None:
+            retry_policy = self.retry_policy
+
+        async def request() -> Any:
+            # get aiohttp response
+            response = await self.api.requests_get(url_path, timeout, **params)
+
+            # return the chosen type, validated if schema supplied
+            return await read_response(response, rtype, self.validation_schema(schema))
+
+        async def throttled_request() -> Any:
+            return await self.throttle(request)
+
+        # GET requests are idempotent, they can be retried
+        if retry_policy is None:
+            return await throttled_request()
+        return await retry_policy.call(throttled_request)
 
     async def post(
         self,
@@ -447,37 +916,31 @@ class Client:
         params: Optional[dict] = None,
         rtype: str = RESPONSE_JSON,
         schema: Optional[dict] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
     ) -> Any:
         """
         POST request on endpoint host + url_path
 
+        POST requests are never retried, they are not idempotent.
+
         :param url_path: Url encoded path following the endpoint
         :param params: Url query string parameters dictionary (optional, default None)
         :param rtype: Response type (optional, default RESPONSE_JSON)
         :param schema: Json Schema to validate response (optional, default None)
+        :param timeout: Request timeout (optional, default client timeout)
         :return:
         """
         if params is None:
             params = dict()
 
-        client = API(self.endpoint.conn_handler(self.session, self.proxy))
+        async def request() -> Any:
+            # get aiohttp response
+            response = await self.api.requests_post(url_path, timeout, **params)
 
-        # get aiohttp response
-        response = await client.requests_post(url_path, **params)
+            # return the chosen type, validated if schema supplied
+            return await read_response(response, rtype, self.validation_schema(schema))
 
-        # if schema supplied...
-        if schema is not None:
-            # validate response
-            await parse_response(response, schema)
-
-        # return the chosen type
-        result = response  # type: Any
-        if rtype == RESPONSE_TEXT:
-            result = await response.text()
-        elif rtype == RESPONSE_JSON:
-            result = await response.json()
-
-        return result
+        return await self.throttle(request)
 
     async def query(
         self,
@@ -485,6 +948,7 @@ class Client:
         variables: Optional[dict] = None,
         rtype: str = RESPONSE_JSON,
         schema: Optional[dict] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
     ) -> Any:
         """
         GraphQL query or mutation request on endpoint
@@ -493,6 +957,7 @@ class Client:
         :param variables: Variables for the query (optional, default None)
         :param rtype: Response type (optional, default RESPONSE_JSON)
         :param schema: Json Schema to validate response (optional, default None)
+        :param timeout: Request timeout (optional, default client timeout)
         :return:
         """
         payload = {"query": query}  # type: Dict[str, Union[str, dict]]
@@ -500,27 +965,24 @@ class Client:
         if variables is not None:
             payload["variables"] = variables
 
-        client = API(self.endpoint.conn_handler(self.session, self.proxy))
-
-        # get aiohttp response
-        response = await client.requests("POST", _json=payload)
+        async def request() -> Any:
+            # get aiohttp response
+            response = await self.api.requests("POST", _json=payload, timeout=timeout)
 
-        # if schema supplied...
-        if schema is not None:
-            # validate response
-            await parse_response(response, schema)
-
-        # return the chosen type
-        result = response  # type: Any
-        if rtype == RESPONSE_TEXT or response.status > 399:
-            result = await response.text()
-        elif rtype == RESPONSE_JSON:
+            # return the chosen type, validated if schema supplied
             try:
-                result = await response.json()
+                result = await read_response(
+                    response,
+                    RESPONSE_TEXT if response.status > 399 else rtype,
+                    self.validation_schema(schema),
+                )
             except aiohttp.client_exceptions.ContentTypeError as exception:
                 logging.error("Response is not a json format: %s", exception)
                 # return response to debug...
-        return result
+                result = response
+            return result
+
+        return await self.throttle(request)
 
     async def connect_ws(self, path: str = "") -> WSConnection:
         """
@@ -529,8 +991,8 @@ class Client:
         :param path: the url path
         :return:
         """
-        client = API(self.endpoint.conn_handler(self.session, self.proxy))
-        return await client.connect_ws(path)
+        await self.select_address()
+        return await self.api.connect_ws(path)
 
     async def close(self):
         """
@@ -15,6 +15,8 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import copy
+import functools
 import re
 from typing import Any, Optional, TypeVar, Type, Dict
 
@@ -23,6 +25,9 @@ from aiohttp import ClientSession
 import duniterpy.constants as constants
 from ..documents import MalformedDocumentError
 
+# Number of parsed endpoint strings kept in cache
+ENDPOINTS_CACHE_SIZE = 4096
+
 
 class ConnectionHandler:
     """Helper class used by other API classes to ease passing server connection information."""
@@ -797,24 +802,42 @@ MANAGED_API = {
 }  # type: Dict[str, Any]
 
 
+@functools.lru_cache(maxsize=ENDPOINTS_CACHE_SIZE)
+def _parse_endpoint(inline: str) -> Endpoint:
+    """
+    Return the Endpoint instance of an endpoint string, from a cache of the last ones parsed
+
+    The API name is the first word of the string, only the parser of its class is run.
+
+    :param inline: Endpoint string
+    :return:
+    """
+    api, separator, _ = inline.partition(" ")
+    cls = MANAGED_API.get(api) if separator else None
+    if cls is None:
+        return UnknownEndpoint.from_inline(inline)
+    return cls.from_inline(inline)
+
+
 def endpoint(value: Any) -> Any:
     """
     Convert an endpoint string to the corresponding Endpoint instance type
 
+    Endpoint instances are returned as is. Parsed strings are cached, a new copy of the
+    cached instance is returned on each call.
+
     :param value: Endpoint string or subclass
     :return:
     """
-    result = UnknownEndpoint.from_inline(value)
     # if Endpoint instance...
-    if issubclass(type(value), Endpoint):
-        result = value
-        # if str...
-    elif isinstance(value, str):
-        # find Endpoint instance
-        for api, cls in MANAGED_API.items():
-            if value.startswith(api + " "):
-                result = cls.from_inline(value)
-    else:
+    if isinstance(value, Endpoint):
+        return value
+    # if str...
+    if not isinstance(value, str):
         raise TypeError("Cannot convert {0} to endpoint".format(value))
 
+    cached = _parse_endpoint(value)
+    result = copy.copy(cached)
+    if isinstance(cached, UnknownEndpoint):
+        result.properties = list(cached.properties)
     return result
@@ -15,6 +15,10 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+from typing import Optional
+
+import aiohttp
+
 
 class DuniterError(Exception):
     """
@@ -32,6 +36,55 @@ class DuniterError(Exception):
         self.message = data["message"]
 
 
+class ThrottledError(ValueError):
+    """
+    Handle node throttling answer (HTTP 429/503 or HTTP_LIMITATION error)
+    """
+
+    def __init__(self, status: int, retry_after: Optional[float] = None) -> None:
+        """
+        Init instance from HTTP answer
+
+        :param status: HTTP status code
+        :param retry_after: Seconds to wait before retrying, if given by the node
+        """
+        super().__init__("Request throttled by node, status code {0}".format(status))
+        self.status = status
+        self.retry_after = retry_after
+
+
+class WS2PError(ValueError):
+    """
+    Handle WS2P request error response
+    """
+
+    def __init__(self, request_id: str, err: str) -> None:
+        """
+        Init instance from WS2P error response
+
+        :param request_id: Request unique id
+        :param err: Error message
+        """
+        super().__init__("WS2P request {0} failed: {1}".format(request_id, err))
+        self.request_id = request_id
+        self.err = err
+
+
+class CircuitOpenError(aiohttp.ClientConnectionError):
+    """
+    Handle request to a node whose circuit breaker is open
+    """
+
+    def __init__(self, _endpoint: object) -> None:
+        """
+        Init instance from the failing endpoint
+
+        :param _endpoint: Endpoint of the node
+        """
+        super().__init__("Circuit breaker open for {0}".format(_endpoint))
+        self.endpoint = _endpoint
+
+
 UNKNOWN = 1001
 UNHANDLED = 1002
 SIGNATURE_DOES_NOT_MATCH = 1003
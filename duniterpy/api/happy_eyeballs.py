@@ -0,0 +1,298 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import logging
+import socket
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+
+import duniterpy.api.endpoint as endpoint
+
+logger = logging.getLogger("duniter/happy_eyeballs")
+
+# Seconds before the connection attempt to the next address (RFC 8305)
+DEFAULT_STAGGER = 0.25
+# Seconds to wait for a connection attempt
+DEFAULT_CONNECT_TIMEOUT = 5.0
+# Seconds to remember the address which won a race
+DEFAULT_WINNER_TTL = 300.0
+
+
+def address_family(address: str) -> int:
+    """
+    Return the family of an IP address
+
+    :param address: IPv4 or IPv6 address
+    :return:
+    """
+    return socket.AF_INET6 if ":" in address else socket.AF_INET
+
+
+def interleave(addresses: Sequence[str]) -> List[str]:
+    """
+    Return the addresses alternating IPv6 and IPv4, IPv6 first (RFC 8305)
+
+    :param addresses: IP addresses in preference order
+    :return:
+    """
+    ipv6 = [
+        address for address in addresses if address_family(address) == socket.AF_INET6
+    ]
+    ipv4 = [
+        address for address in addresses if address_family(address) == socket.AF_INET
+    ]
+    result = []
+    for index in range(max(len(ipv6), len(ipv4))):
+        result.extend(ipv6[index : index + 1])
+        result.extend(ipv4[index : index + 1])
+    return result
+
+
+async def race_connections(
+    hosts: Sequence[str],
+    port: int,
+    stagger: float = DEFAULT_STAGGER,
+    timeout: float = DEFAULT_CONNECT_TIMEOUT,
+) -> str:
+    """
+    Return the first host to accept a TCP connection
+
+    A connection attempt is started to the next host every stagger seconds, or as soon
+    as an attempt fails. Losing attempts are cancelled.
+
+    The connections are only probes: the winning one is closed before returning, and
+    the request opens its own connection to the winner afterwards. A race costs one
+    extra TCP connection by attempted host.
+
+    :param hosts: IP addresses or domain names in preference order
+    :param port: Port number
+    :param stagger: Seconds before the next attempt (optional, default 0.25)
+    :param timeout: Seconds to wait for each attempt (optional, default 5)
+    :return:
+    """
+
+    async def attempt(host: str) -> str:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.close()
+        # StreamWriter.wait_closed is new in Python 3.7
+        if hasattr(writer, "wait_closed"):
+            try:
+                await writer.wait_closed()
+            except OSError:
+                # the connection was established, the race is won anyway
+                pass
+        return host
+
+    if not hosts:
+        raise ValueError("No host to connect to")
+
+    pending = set()  # type: set
+    error = None  # type: Optional[BaseException]
+    index = 0
+    try:
+        while True:
+            if index < len(hosts):
+                pending.add(asyncio.ensure_future(attempt(hosts[index])))
+                index += 1
+            elif not pending:
+                raise error  # type: ignore
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=stagger if index < len(hosts) else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+                logger.debug("Connection to %s:%s failed: %s", hosts, port, error)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class HappyEyeballs(AbstractResolver):
+    """
+    Dual-stack connection racing of endpoint addresses (RFC 8305), shared by clients
+
+    Connections to the IPv6 and IPv4 addresses of an endpoint, and to the addresses of
+    its domain name, are raced with a short stagger. The winner is remembered for each
+    endpoint, so a broken address family costs a stagger delay once instead of a timeout
+    on each request.
+
+    An instance is the DNS resolver of the session of the clients using it: it orders the
+    addresses of a domain name with the winner first, the domain name is kept in urls for
+    TLS. Endpoints without domain name are connected to their winner address.
+
+    A race opens probe connections, closed once the winner is known: it costs an extra
+    connection by endpoint every ttl seconds, and after a connection failure.
+    """
+
+    def __init__(
+        self,
+        stagger: float = DEFAULT_STAGGER,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        ttl: float = DEFAULT_WINNER_TTL,
+        resolver: Optional[AbstractResolver] = None,
+    ) -> None:
+        """
+        Init HappyEyeballs instance
+
+        :param stagger: Seconds before the connection attempt to the next address
+            (optional, default 0.25)
+        :param connect_timeout: Seconds to wait for a connection attempt (optional, default 5)
+        :param ttl: Seconds to remember the winner of a race (optional, default 300)
+        :param resolver: DNS resolver of domain names (optional, default aiohttp resolver)
+        """
+        self.stagger = stagger
+        self.connect_timeout = connect_timeout
+        self.ttl = ttl
+        self.resolver = DefaultResolver() if resolver is None else resolver
+        # addresses announced by endpoints, by domain name
+        self.addresses = {}  # type: Dict[str, List[str]]
+        # winner address and expiration time, by race key
+        self.winners = {}  # type: Dict[Tuple[Tuple[str, ...], int], Tuple[str, float]]
+
+    def add_endpoint(self, _endpoint: endpoint.Endpoint) -> None:
+        """
+        Register the addresses announced by an endpoint for its domain name
+
+        :param _endpoint: Endpoint instance
+        :return:
+        """
+        server = getattr(_endpoint, "server", None)
+        announced = [
+            address
+            for address in (
+                getattr(_endpoint, "ipv6", None),
+                getattr(_endpoint, "ipv4", None),
+            )
+            if address
+        ]
+        if not server or not announced:
+            return
+        known = self.addresses.setdefault(server, [])
+        known.extend(address for address in announced if address not in known)
+
+    def winner(self, hosts: Sequence[str], port: int) -> Optional[str]:
+        """
+        Return the remembered winner of a race between the hosts, None if unknown
+
+        :param hosts: IP addresses or domain names
+        :param port: Port number
+        :return:
+        """
+        key = (tuple(hosts), port)
+        winner = self.winners.get(key)
+        if winner is None:
+            return None
+        if winner[1] < time.monotonic():
+            del self.winners[key]
+            return None
+        return winner[0]
+
+    async def race(self, hosts: Sequence[str], port: int) -> str:
+        """
+        Return the host of the fastest connection, remembered for ttl seconds
+
+        :param hosts: IP addresses or domain names in preference order
+        :param port: Port number
+        :return:
+        """
+        winner = self.winner(hosts, port)
+        if winner is None:
+            winner = await race_connections(
+                hosts, port, self.stagger, self.connect_timeout
+            )
+            self.winners[(tuple(hosts), port)] = (winner, time.monotonic() + self.ttl)
+            logger.debug("Connection race to %s:%s won by %s", hosts, port, winner)
+        return winner
+
+    def forget(self, hosts: Sequence[str], port: int) -> None:
+        """
+        Forget the winner of a race between the hosts, after a connection failure
+
+        :param hosts: IP addresses or domain names
+        :param port: Port number
+        :return:
+        """
+        self.winners.pop((tuple(hosts), port), None)
+
+    async def resolve(
+        self, host: str, port: int = 0, family: int = socket.AF_INET
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the addresses of the domain name, the winner of a connection race first
+
+        :param host: Domain name
+        :param port: Port number
+        :param family: Address family, 0 for any (optional, default socket.AF_INET)
+        :return:
+        """
+        announced = self.addresses.get(host, [])
+        try:
+            resolved = [
+                result["host"]
+                for result in await self.resolver.resolve(host, port, family)
+            ]
+        except OSError:
+            if not announced:
+                raise
+            resolved = []
+
+        addresses = interleave(
+            announced + [address for address in resolved if address not in announced]
+        )
+        if family:
+            addresses = [
+                address for address in addresses if address_family(address) == family
+            ]
+        if not addresses:
+            raise OSError("No address of {0} for family {1}".format(host, family))
+
+        if len(addresses) > 1:
+            try:
+                winner = await self.race(addresses, port)
+            except (OSError, asyncio.TimeoutError) as exception:
+                logger.debug("No connection to %s:%s: %s", host, port, exception)
+            else:
+                addresses.remove(winner)
+                addresses.insert(0, winner)
+
+        return [
+            {
+                "hostname": host,
+                "host": address,
+                "port": port,
+                "family": address_family(address),
+                "proto": 0,
+                "flags": socket.AI_NUMERICHOST,
+            }
+            for address in addresses
+        ]
+
+    async def close(self) -> None:
+        """
+        Release the DNS resolver
+
+        :return:
+        """
+        await self.resolver.close()
@@ -0,0 +1,483 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import aiohttp
+import jsonschema
+from aiohttp import ClientSession
+
+import duniterpy.api.endpoint as endpoint
+from duniterpy.api import bma
+from .client import Client, create_session
+from .errors import CircuitOpenError, DuniterError
+
+logger = logging.getLogger("duniter/health")
+
+# Circuit breaker states
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half-open"
+
+# Circuit breaker default settings
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_HALF_OPEN_SUCCESSES = 2
+
+# Health monitor default settings
+DEFAULT_PROBE_INTERVAL = 30.0
+DEFAULT_PROBE_TIMEOUT = 5.0
+DEFAULT_MAX_LAG = 3
+
+# Errors of a probe, the node is failing
+PROBE_ERRORS = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    ValueError,
+    KeyError,
+    jsonschema.ValidationError,
+    DuniterError,
+)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a node
+
+    The circuit opens after failure_threshold failures in a row: requests fail fast.
+    After reset_timeout seconds, it is half-open: only half_open_successes trial
+    requests are allowed, and the circuit closes after half_open_successes successes
+    in a row or opens again on the first failure. Trial requests without result are
+    allowed again after reset_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        half_open_successes: int = DEFAULT_HALF_OPEN_SUCCESSES,
+    ) -> None:
+        """
+        Init CircuitBreaker instance
+
+        :param failure_threshold: Failures in a row before opening (optional, default 3)
+        :param reset_timeout: Seconds before an open circuit is half-open (optional, default 30)
+        :param half_open_successes: Successes in a row closing a half-open circuit
+            (optional, default 2)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_successes = half_open_successes
+        self.failures = 0
+        self.successes = 0
+        self.opened_at = None  # type: Optional[float]
+        # trial requests allowed while half-open
+        self.trials = 0
+        self.trial_at = None  # type: Optional[float]
+
+    @property
+    def state(self) -> str:
+        """
+        Return the circuit state
+
+        :return:
+        """
+        if self.opened_at is None:
+            return CIRCUIT_CLOSED
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return CIRCUIT_OPEN
+        return CIRCUIT_HALF_OPEN
+
+    def _trials_expired(self) -> bool:
+        """
+        Return True if the last trial request was allowed more than reset_timeout ago
+
+        :return:
+        """
+        return (
+            self.trial_at is not None
+            and time.monotonic() - self.trial_at >= self.reset_timeout
+        )
+
+    def allow(self) -> bool:
+        """
+        Return True if a request is allowed, without counting it
+
+        A half-open circuit allows requests while trial requests are left.
+
+        :return:
+        """
+        state = self.state
+        if state == CIRCUIT_HALF_OPEN:
+            return self.trials < self.half_open_successes or self._trials_expired()
+        return state == CIRCUIT_CLOSED
+
+    def acquire(self) -> bool:
+        """
+        Return True if a request is allowed, counting it as a trial request if half-open
+
+        :return:
+        """
+        if not self.allow():
+            return False
+        if self.opened_at is not None:
+            if self._trials_expired():
+                # trial requests lost without result, successful ones still count
+                self.trials = self.successes
+            self.trials += 1
+            self.trial_at = time.monotonic()
+        return True
+
+    def _reset_trials(self) -> None:
+        """
+        Reset the trial requests count
+
+        :return:
+        """
+        self.successes = 0
+        self.trials = 0
+        self.trial_at = None
+
+    def success(self) -> None:
+        """
+        Record a successful request
+
+        :return:
+        """
+        self.failures = 0
+        if self.opened_at is None:
+            return
+        self.successes += 1
+        if self.successes >= self.half_open_successes:
+            logger.debug("Circuit closed")
+            self.opened_at = None
+            self._reset_trials()
+
+    def failure(self) -> None:
+        """
+        Record a failed request
+
+        :return:
+        """
+        self.failures += 1
+        self._reset_trials()
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            # open, or open again after a failed half-open request
+            self.opened_at = time.monotonic()
+
+
+class NodeHealth:
+    """
+    Last probe results and circuit breaker of a node
+    """
+
+    def __init__(self, _endpoint: endpoint.Endpoint, breaker: CircuitBreaker) -> None:
+        """
+        Init NodeHealth instance
+
+        :param _endpoint: Endpoint of the node
+        :param breaker: Circuit breaker of the node
+        """
+        self.endpoint = _endpoint
+        self.breaker = breaker
+        self.software = None  # type: Optional[str]
+        self.version = None  # type: Optional[str]
+        self.latency = None  # type: Optional[float]
+        self.block_number = None  # type: Optional[int]
+        self.median_time = None  # type: Optional[int]
+        # blocks and seconds behind the network
+        self.lag = None  # type: Optional[int]
+        self.time_lag = None  # type: Optional[int]
+        self.last_probe = None  # type: Optional[float]
+        self.error = None  # type: Optional[BaseException]
+
+    @property
+    def available(self) -> bool:
+        """
+        Return True if the circuit breaker allows requests to the node
+
+        :return:
+        """
+        return self.breaker.allow()
+
+    def __str__(self) -> str:
+        return "{0} {1} latency={2} block={3} lag={4}".format(
+            self.endpoint,
+            self.breaker.state,
+            "-" if self.latency is None else "{0:.3f}s".format(self.latency),
+            "-" if self.block_number is None else self.block_number,
+            "-" if self.lag is None else self.lag,
+        )
+
+
+class HealthMonitor:
+    """
+    Background health monitor of nodes
+
+    Each node is probed periodically with node.summary and blockchain.current requests.
+    The latency, current block and lag against the network of each node are recorded,
+    and a circuit breaker fails requests to failing nodes fast. Open circuits are only
+    probed again when half-open.
+
+    A HealthMonitor instance can be given to a ClientPool to route its requests.
+    """
+
+    def __init__(
+        self,
+        endpoints: Iterable[Union[str, endpoint.Endpoint]],
+        interval: float = DEFAULT_PROBE_INTERVAL,
+        timeout: float = DEFAULT_PROBE_TIMEOUT,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        half_open_successes: int = DEFAULT_HALF_OPEN_SUCCESSES,
+        session: Optional[ClientSession] = None,
+        proxy: Optional[str] = None,
+        **kwargs: Any
+    ) -> None:
+        """
+        Init HealthMonitor instance
+
+        :param endpoints: Endpoints strings in duniter format or BMA Endpoint instances
+        :param interval: Seconds between probes of a node (optional, default 30)
+        :param timeout: Seconds to wait for a probe (optional, default 5)
+        :param failure_threshold: Failures in a row opening a circuit (optional, default 3)
+        :param reset_timeout: Seconds before an open circuit is half-open (optional, default 30)
+        :param half_open_successes: Successes in a row closing a half-open circuit
+            (optional, default 2)
+        :param session: Aiohttp client session (optional, default None for a new session)
+        :param proxy: Proxy server as hostname:port (optional, default None)
+        :param kwargs: Client settings of the probes (validation policy...)
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.own_session = session is None
+        self.session = create_session() if session is None else session
+
+        self.clients = {}  # type: Dict[endpoint.Endpoint, Client]
+        self.nodes = {}  # type: Dict[endpoint.Endpoint, NodeHealth]
+        for _endpoint in endpoints:
+            if isinstance(_endpoint, str):
+                _endpoint = endpoint.endpoint(_endpoint)
+            if _endpoint in self.nodes:
+                continue
+            self.clients[_endpoint] = Client(_endpoint, self.session, proxy, **kwargs)
+            self.nodes[_endpoint] = NodeHealth(
+                _endpoint,
+                CircuitBreaker(failure_threshold, reset_timeout, half_open_successes),
+            )
+
+        self.network_block_number = None  # type: Optional[int]
+        self.network_median_time = None  # type: Optional[int]
+        self._task = None  # type: Optional[asyncio.Future]
+
+    def health(self, _endpoint: endpoint.Endpoint) -> Optional[NodeHealth]:
+        """
+        Return the health of the node, None if not monitored
+
+        :param _endpoint: Endpoint of the node
+        :return:
+        """
+        return self.nodes.get(_endpoint)
+
+    def is_available(self, _endpoint: endpoint.Endpoint) -> bool:
+        """
+        Return True if requests to the node are allowed, unknown nodes are allowed
+
+        :param _endpoint: Endpoint of the node
+        :return:
+        """
+        node = self.nodes.get(_endpoint)
+        return node is None or node.available
+
+    def acquire(self, _endpoint: endpoint.Endpoint) -> bool:
+        """
+        Return True if a request to the node is allowed, unknown nodes are allowed
+
+        The request is counted as a trial request if the circuit is half-open.
+
+        :param _endpoint: Endpoint of the node
+        :return:
+        """
+        node = self.nodes.get(_endpoint)
+        return node is None or node.breaker.acquire()
+
+    def check(self, _endpoint: endpoint.Endpoint) -> None:
+        """
+        Raise CircuitOpenError if the circuit breaker of the node rejects a request
+
+        The request is counted as a trial request if the circuit is half-open.
+
+        :param _endpoint: Endpoint of the node
+        :return:
+        """
+        if not self.acquire(_endpoint):
+            raise CircuitOpenError(_endpoint)
+
+    def success(self, _endpoint: endpoint.Endpoint) -> None:
+        """
+        Record a successful request to the node
+
+        :param _endpoint: Endpoint of the node
+        :return:
+        """
+        node = self.nodes.get(_endpoint)
+        if node is not None:
+            node.breaker.success()
+
+    def failure(self, _endpoint: endpoint.Endpoint) -> None:
+        """
+        Record a failed request to the node
+
+        :param _endpoint: Endpoint of the node
+        :return:
+        """
+        node = self.nodes.get(_endpoint)
+        if node is not None:
+            node.breaker.failure()
+
+    def ranked_endpoints(
+        self, max_lag: int = DEFAULT_MAX_LAG
+    ) -> List[endpoint.Endpoint]:
+        """
+        Return the endpoints of the available nodes, in sync nodes first, by latency
+
+        Nodes more than max_lag blocks behind the network come after the others.
+
+        :param max_lag: Maximum number of blocks behind the network (optional, default 3)
+        :return:
+        """
+        nodes = [node for node in self.nodes.values() if node.available]
+        nodes.sort(
+            key=lambda node: (
+                node.lag is not None and node.lag > max_lag,
+                float("inf") if node.latency is None else node.latency,
+            )
+        )
+        return [node.endpoint for node in nodes]
+
+    async def probe(self, _endpoint: endpoint.Endpoint) -> NodeHealth:
+        """
+        Probe the node summary and current block
+
+        :param _endpoint: Endpoint of the node
+        :return:
+        """
+        node = self.nodes[_endpoint]
+        client = self.clients[_endpoint]
+        start = time.monotonic()
+        try:
+            summary, current = await asyncio.wait_for(
+                asyncio.gather(
+                    bma.node.summary(client), bma.blockchain.current(client)
+                ),
+                self.timeout,
+            )
+        except PROBE_ERRORS as exception:
+            node.error = exception
+            node.breaker.failure()
+            logger.warning("Probe of %s failed: %s", _endpoint, exception)
+        else:
+            node.latency = time.monotonic() - start
+            node.software = summary["duniter"]["software"]
+            node.version = summary["duniter"]["version"]
+            node.block_number = current["number"]
+            node.median_time = current["medianTime"]
+            node.error = None
+            node.breaker.success()
+        node.last_probe = time.monotonic()
+        return node
+
+    async def probe_all(self) -> None:
+        """
+        Probe the nodes allowed by their circuit breaker, then update their lag
+
+        :return:
+        """
+        endpoints = [
+            _endpoint
+            for _endpoint, node in self.nodes.items()
+            if node.breaker.acquire()
+        ]
+        results = await asyncio.gather(
+            *[self.probe(_endpoint) for _endpoint in endpoints], return_exceptions=True
+        )
+        for _endpoint, result in zip(endpoints, results):
+            if isinstance(result, Exception):
+                # unexpected error, the other nodes are still probed
+                self.nodes[_endpoint].error = result
+                self.nodes[_endpoint].breaker.failure()
+                logger.error("Probe of %s failed: %r", _endpoint, result)
+
+        reachable = [
+            node
+            for node in self.nodes.values()
+            if node.error is None and node.block_number is not None
+        ]
+        if not reachable:
+            return
+        self.network_block_number = statistics.median_high(
+            [node.block_number for node in reachable]
+        )
+        self.network_median_time = statistics.median_high(
+            [node.median_time for node in reachable]
+        )
+        for node in reachable:
+            node.lag = self.network_block_number - node.block_number
+            node.time_lag = self.network_median_time - node.median_time
+
+    async def _run(self) -> None:
+        """
+        Probe the nodes every interval
+
+        :return:
+        """
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        """
+        Start probing the nodes in background
+
+        :return:
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def close(self) -> None:
+        """
+        Stop probing, and close the aiohttp session if created by the monitor
+
+        :return:
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.own_session:
+            await self.session.close()
+
+    async def __aenter__(self) -> "HealthMonitor":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
@@ -0,0 +1,573 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+import aiohttp
+import jsonschema
+from aiohttp import ClientSession
+
+import duniterpy.api.endpoint as endpoint
+from .client import (
+    Client,
+    WSConnection,
+    create_session,
+    RESPONSE_JSON,
+)
+from .errors import CircuitOpenError
+from .health import DEFAULT_MAX_LAG, HealthMonitor
+from .retry import RetryPolicy
+
+logger = logging.getLogger("duniter/pool")
+
+# Endpoint types usable by a pool
+POOL_ENDPOINT_TYPES = (
+    endpoint.BMAEndpoint,
+    endpoint.SecuredBMAEndpoint,
+    endpoint.GVAEndpoint,
+)  # type: Tuple[Type[endpoint.Endpoint], ...]
+
+# Errors meaning the node is failing, the request is sent to the next one
+FAILOVER_ERRORS = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    ValueError,
+    jsonschema.ValidationError,
+)
+
+# Errors raised before the request is sent (connection refused, DNS failure, open
+# circuit breaker): only these fail over POST requests, which must not be duplicated
+SEND_FAILOVER_ERRORS = (
+    aiohttp.ClientConnectorError,
+    CircuitOpenError,
+)
+
+# Endpoint health default settings
+DEFAULT_SMOOTHING_FACTOR = 0.2
+DEFAULT_MAX_CONSECUTIVE_ERRORS = 3
+DEFAULT_COOLDOWN = 30.0
+DEFAULT_LATENCY_WINDOW = 100
+
+# Hedged requests default settings
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_DELAY = 1.0
+# latency samples required to compute a percentile
+HEDGE_MIN_SAMPLES = 10
+
+
+class EndpointStats:
+    """
+    Moving averages of the latency and error rate of an endpoint
+    """
+
+    def __init__(
+        self,
+        smoothing_factor: float = DEFAULT_SMOOTHING_FACTOR,
+        latency_window: int = DEFAULT_LATENCY_WINDOW,
+    ) -> None:
+        """
+        Init EndpointStats instance
+
+        :param smoothing_factor: Weight of the last request in the moving averages
+        :param latency_window: Number of last latencies kept to compute percentiles
+        """
+        self.smoothing_factor = smoothing_factor
+        self.latency = None  # type: Optional[float]
+        self.latencies = deque(maxlen=latency_window)  # type: deque
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.last_failure = 0.0
+
+    def success(self, latency: float) -> None:
+        """
+        Record a successful request
+
+        :param latency: Request duration in seconds
+        :return:
+        """
+        self.requests += 1
+        self.consecutive_errors = 0
+        self.latencies.append(latency)
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing_factor * (latency - self.latency)
+        self.error_rate -= self.smoothing_factor * self.error_rate
+
+    def failure(self) -> None:
+        """
+        Record a failed request
+
+        :return:
+        """
+        self.requests += 1
+        self.errors += 1
+        self.consecutive_errors += 1
+        self.last_failure = time.monotonic()
+        self.error_rate += self.smoothing_factor * (1 - self.error_rate)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Return the latency percentile of the last requests, None if not enough samples
+
+        :param percent: Percentile between 0 and 100
+        :return:
+        """
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self.latencies)
+        index = round(percent / 100 * (len(latencies) - 1))
+        return latencies[min(max(index, 0), len(latencies) - 1)]
+
+    def score(self) -> float:
+        """
+        Return the routing score of the endpoint, the lower the better
+
+        Endpoints without latency measure yet come first to be evaluated.
+
+        :return:
+        """
+        if self.latency is None:
+            return 0.0
+        return self.latency * (1 + 10 * self.error_rate)
+
+    def __str__(self) -> str:
+        return "latency={0} error_rate={1:.2f} requests={2} errors={3}".format(
+            "-" if self.latency is None else "{0:.3f}s".format(self.latency),
+            self.error_rate,
+            self.requests,
+            self.errors,
+        )
+
+
+class ClientPool:
+    """
+    Client dispatching requests between many endpoints
+
+    Each request is sent to the healthy endpoint with the best latency and error rate,
+    and sent again to the next one if the node fails or times out.
+    A ClientPool instance can be used everywhere a Client instance is expected.
+    """
+
+    def __init__(
+        self,
+        endpoints: Iterable[Union[str, endpoint.Endpoint]],
+        session: Optional[ClientSession] = None,
+        proxy: Optional[str] = None,
+        max_consecutive_errors: int = DEFAULT_MAX_CONSECUTIVE_ERRORS,
+        cooldown: float = DEFAULT_COOLDOWN,
+        smoothing_factor: float = DEFAULT_SMOOTHING_FACTOR,
+        hedge: bool = False,
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        hedge_delay: float = DEFAULT_HEDGE_DELAY,
+        hedge_paths: Optional[Iterable[str]] = None,
+        health_monitor: Optional[HealthMonitor] = None,
+        max_lag: int = DEFAULT_MAX_LAG,
+        **kwargs: Any
+    ) -> None:
+        """
+        Init ClientPool instance
+
+        Endpoints of other types than POOL_ENDPOINT_TYPES are ignored.
+
+        :param endpoints: Endpoints strings in duniter format or Endpoint instances
+        :param session: Aiohttp client session shared by all endpoints (optional, default None)
+        :param proxy: Proxy server as hostname:port (optional, default None)
+        :param max_consecutive_errors: Errors in a row before an endpoint is unhealthy (optional, default 3)
+        :param cooldown: Seconds before an unhealthy endpoint is tried again (optional, default 30)
+        :param smoothing_factor: Weight of the last request in moving averages (optional, default 0.2)
+        :param hedge: Send slow GET requests to a second endpoint (optional, default False)
+        :param hedge_percentile: Latency percentile of the endpoint after which a GET request
+            is hedged (optional, default 95)
+        :param hedge_delay: Seconds before hedging while the endpoint latency is unknown
+            (optional, default 1)
+        :param hedge_paths: Url path prefixes of the hedged GET requests
+            (optional, default None for all GET requests)
+        :param health_monitor: Health monitor of the endpoints: nodes with an open circuit
+            breaker are skipped, nodes behind the network come last (optional, default None)
+        :param max_lag: Maximum number of blocks behind the network of the nodes routed first,
+            with a health monitor (optional, default 3)
+        :param kwargs: Client settings (connection pool, validation policy...)
+        """
+        _endpoints = []  # type: List[endpoint.Endpoint]
+        for _endpoint in endpoints:
+            if isinstance(_endpoint, str):
+                _endpoint = endpoint.endpoint(_endpoint)
+            if (
+                isinstance(_endpoint, POOL_ENDPOINT_TYPES)
+                and _endpoint not in _endpoints
+            ):
+                _endpoints.append(_endpoint)
+
+        if not _endpoints:
+            raise ValueError("No endpoint supported by the pool")
+
+        # pool settings apply to the shared session
+        session_settings = {
+            key: kwargs.pop(key)
+            for key in (
+                "limit",
+                "limit_per_host",
+                "keepalive_timeout",
+                "ttl_dns_cache",
+                "ssl_context",
+            )
+            if key in kwargs
+        }
+        if kwargs.get("happy_eyeballs") is not None:
+            session_settings["resolver"] = kwargs["happy_eyeballs"]
+        self.session = (
+            create_session(**session_settings) if session is None else session
+        )
+        self.proxy = proxy
+        self.max_consecutive_errors = max_consecutive_errors
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.hedge_paths = None if hedge_paths is None else tuple(hedge_paths)
+        self.hedged_requests = 0
+        self.health_monitor = health_monitor
+        self.max_lag = max_lag
+
+        # used by bma.blockchain functions
+        self.block_store = kwargs.get("block_store")
+
+        self.clients = [
+            Client(_endpoint, self.session, proxy, **kwargs) for _endpoint in _endpoints
+        ]
+        self.stats = {
+            client.endpoint: EndpointStats(smoothing_factor) for client in self.clients
+        }  # type: Dict[endpoint.Endpoint, EndpointStats]
+
+    @classmethod
+    def from_peers(cls, peers: Iterable[Any], **kwargs: Any) -> "ClientPool":
+        """
+        Return ClientPool instance from the endpoints of Peer documents
+
+        :param peers: Peer documents
+        :param kwargs: ClientPool settings
+        :return:
+        """
+        return cls(
+            [_endpoint for peer in peers for _endpoint in peer.endpoints], **kwargs
+        )
+
+    def is_healthy(self, client: Client) -> bool:
+        """
+        Return True if the endpoint of the client is healthy
+
+        An unhealthy endpoint is healthy again after the cooldown delay.
+
+        :param client: Client of the pool
+        :return:
+        """
+        stats = self.stats[client.endpoint]
+        return (
+            stats.consecutive_errors < self.max_consecutive_errors
+            or time.monotonic() - stats.last_failure > self.cooldown
+        )
+
+    def ranked_clients(self) -> List[Client]:
+        """
+        Return clients by routing order
+
+        Healthy endpoints come first by score, then unhealthy ones as last resort.
+        With a health monitor, endpoints with an open circuit breaker are skipped and
+        endpoints behind the network come after the others.
+
+        :return:
+        """
+        clients = self.clients
+        if self.health_monitor is not None:
+            clients = [
+                client
+                for client in clients
+                if self.health_monitor.is_available(client.endpoint)
+            ]
+            if not clients:
+                raise CircuitOpenError(
+                    ", ".join(str(client.endpoint) for client in self.clients)
+                )
+
+        healthy = []
+        unhealthy = []
+        for client in clients:
+            if self.is_healthy(client):
+                healthy.append(client)
+            else:
+                unhealthy.append(client)
+
+        healthy.sort(key=lambda client: self.stats[client.endpoint].score())
+        if self.health_monitor is not None:
+            # stable sort, by score within in sync and late nodes
+            healthy.sort(key=self._is_late)
+        unhealthy.sort(key=lambda client: self.stats[client.endpoint].last_failure)
+        return healthy + unhealthy
+
+    def _is_late(self, client: Client) -> bool:
+        """
+        Return True if the health monitor found the node behind the network
+
+        :param client: Client of the pool
+        :return:
+        """
+        node = self.health_monitor.health(client.endpoint)  # type: ignore
+        return node is not None and node.lag is not None and node.lag > self.max_lag
+
+    async def _call(
+        self, client: Client, method: str, *args: Any, **kwargs: Any
+    ) -> Any:
+        """
+        Call the Client method and record the endpoint stats
+
+        :param client: Client of the pool
+        :param method: Client method name
+        :param args: The parameters
+        :param kwargs: The key/value parameters
+        :return:
+        """
+        if self.health_monitor is not None:
+            # half-open circuits only let their trial requests through
+            self.health_monitor.check(client.endpoint)
+        stats = self.stats[client.endpoint]
+        start = time.monotonic()
+        try:
+            result = await getattr(client, method)(*args, **kwargs)
+        except FAILOVER_ERRORS as exception:
+            stats.failure()
+            if self.health_monitor is not None:
+                self.health_monitor.failure(client.endpoint)
+            logger.warning(
+                "%s request failed on %s: %s", method, client.endpoint, exception
+            )
+            raise
+
+        stats.success(time.monotonic() - start)
+        if self.health_monitor is not None:
+            self.health_monitor.success(client.endpoint)
+        return result
+
+    async def request(
+        self,
+        method: str,
+        *args: Any,
+        failover_errors: Tuple[Type[BaseException], ...] = FAILOVER_ERRORS,
+        **kwargs: Any
+    ) -> Any:
+        """
+        Call the Client method on the best endpoint, failing over the next ones on errors
+
+        :param method: Client method name
+        :param args: The parameters
+        :param failover_errors: Errors sending the request to the next endpoint, others
+            are raised (optional, default FAILOVER_ERRORS)
+        :param kwargs: The key/value parameters
+        :return:
+        """
+        last_exception = None  # type: Optional[BaseException]
+        for client in self.ranked_clients():
+            try:
+                return await self._call(client, method, *args, **kwargs)
+            except failover_errors as exception:
+                last_exception = exception
+
+        raise last_exception  # type: ignore
+
+    async def hedged_request(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Call the Client method on the best endpoint, and on the next one if no answer is
+        received within the hedge percentile of the endpoint latency
+
+        The first answer wins, the other request is cancelled.
+        Only idempotent requests must be hedged.
+
+        :param method: Client method name
+        :param args: The parameters
+        :param kwargs: The key/value parameters
+        :return:
+        """
+        clients = self.ranked_clients()
+        primary = clients.pop(0)
+        delay = self.stats[primary.endpoint].percentile(self.hedge_percentile)
+        if delay is None:
+            delay = self.hedge_delay
+
+        tasks = {
+            asyncio.ensure_future(self._call(primary, method, *args, **kwargs))
+        }  # type: set
+        hedged = False
+        last_exception = None  # type: Optional[BaseException]
+        try:
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks,
+                    timeout=None if hedged or not clients else delay,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # primary endpoint is too slow, hedge on the next one
+                    hedged = True
+                    self.hedged_requests += 1
+                    logger.debug("hedge %s request on %s", method, clients[0].endpoint)
+                for task in done:
+                    exception = task.exception()
+                    if exception is None:
+                        return task.result()
+                    if not isinstance(exception, FAILOVER_ERRORS):
+                        raise exception
+                    last_exception = exception
+                if (not done or not tasks) and clients:
+                    # hedge or fail over on the next endpoint
+                    tasks.add(
+                        asyncio.ensure_future(
+                            self._call(clients.pop(0), method, *args, **kwargs)
+                        )
+                    )
+        finally:
+            # cancel the loser
+            for task in tasks:
+                task.cancel()
+
+        raise last_exception  # type: ignore
+
+    async def get(
+        self,
+        url_path: str,
+        params: Optional[dict] = None,
+        rtype: str = RESPONSE_JSON,
+        schema: Optional[dict] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> Any:
+        """
+        GET request on the best endpoint host + url_path
+
+        :param url_path: Url encoded path following the endpoint
+        :param params: Url query string parameters dictionary (optional, default None)
+        :param rtype: Response type (optional, default RESPONSE_JSON)
+        :param schema: Json Schema to validate response (optional, default None)
+        :param timeout: Request timeout (optional, default client timeout)
+        :param retry_policy: Request retry policy (optional, default client retry policy)
+        :return:
+        """
+        if self.hedge and (
+            self.hedge_paths is None or url_path.startswith(self.hedge_paths)
+        ):
+            return await self.hedged_request(
+                "get", url_path, params, rtype, schema, timeout, retry_policy
+            )
+        return await self.request(
+            "get", url_path, params, rtype, schema, timeout, retry_policy
+        )
+
+    async def post(
+        self,
+        url_path: str,
+        params: Optional[dict] = None,
+        rtype: str = RESPONSE_JSON,
+        schema: Optional[dict] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+    ) -> Any:
+        """
+        POST request on the best endpoint host + url_path
+
+        The request is sent to the next endpoint only if it could not be sent,
+        other errors, timeouts included, are raised.
+
+        :param url_path: Url encoded path following the endpoint
+        :param params: Url query string parameters dictionary (optional, default None)
+        :param rtype: Response type (optional, default RESPONSE_JSON)
+        :param schema: Json Schema to validate response (optional, default None)
+        :param timeout: Request timeout (optional, default client timeout)
+        :return:
+        """
+        return await self.request(
+            "post",
+            url_path,
+            params,
+            rtype,
+            schema,
+            timeout,
+            failover_errors=SEND_FAILOVER_ERRORS,
+        )
+
+    async def query(
+        self,
+        query: str,
+        variables: Optional[dict] = None,
+        rtype: str = RESPONSE_JSON,
+        schema: Optional[dict] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+    ) -> Any:
+        """
+        GraphQL query or mutation request on the best endpoint
+
+        Mutations are not idempotent: as with post, the request is sent to the next
+        endpoint only if it could not be sent.
+
+        :param query: GraphQL query string
+        :param variables: Variables for the query (optional, default None)
+        :param rtype: Response type (optional, default RESPONSE_JSON)
+        :param schema: Json Schema to validate response (optional, default None)
+        :param timeout: Request timeout (optional, default client timeout)
+        :return:
+        """
+        return await self.request(
+            "query",
+            query,
+            variables,
+            rtype,
+            schema,
+            timeout,
+            failover_errors=SEND_FAILOVER_ERRORS,
+        )
+
+    async def connect_ws(self, path: str = "") -> WSConnection:
+        """
+        Connect to a websocket on the best endpoint
+
+        :param path: the url path
+        :return:
+        """
+        return await self.request("connect_ws", path)
+
+    async def close(self) -> None:
+        """
+        Close aiohttp session
+
+        :return:
+        """
+        await self.session.close()
+
+    def __call__(self, _function: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Call the _function given with the args given
+        So we can call many packages wrapping the REST API
+
+        :param _function: The function to call
+        :param args: The parameters
+        :param kwargs: The key/value parameters
+        :return:
+        """
+        return _function(self, *args, **kwargs)
@@ -0,0 +1,117 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import logging
+import random
+from typing import Any, Awaitable, Callable, Tuple, Type
+
+import aiohttp
+
+logger = logging.getLogger("duniter/retry")
+
+# Errors of an idempotent request which can be retried
+RETRY_ERRORS = (
+    aiohttp.ClientConnectionError,
+    asyncio.TimeoutError,
+)  # type: Tuple[Type[BaseException], ...]
+
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF = 0.1
+DEFAULT_MAX_BACKOFF = 2.0
+DEFAULT_BUDGET_RATIO = 0.1
+DEFAULT_BUDGET_MIN = 10
+
+
+class RetryPolicy:
+    """
+    Retry policy of idempotent requests, with jittered exponential backoff and a retry budget
+
+    The budget earns budget_ratio retry for each request, up to budget_min retries,
+    so that retries can not exceed this ratio of the requests during an outage.
+    A policy instance can be shared by many clients to share its budget.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        budget_ratio: float = DEFAULT_BUDGET_RATIO,
+        budget_min: int = DEFAULT_BUDGET_MIN,
+        retry_errors: Tuple[Type[BaseException], ...] = RETRY_ERRORS,
+    ) -> None:
+        """
+        Init RetryPolicy instance
+
+        :param max_retries: Maximum retries of a request (optional, default 2)
+        :param backoff: Base backoff delay in seconds, doubled on each retry (optional, default 0.1)
+        :param max_backoff: Maximum backoff delay in seconds (optional, default 2)
+        :param budget_ratio: Retries earned by each request (optional, default 0.1)
+        :param budget_min: Retries available at start and maximum of the budget (optional, default 10)
+        :param retry_errors: Errors which can be retried (optional, default RETRY_ERRORS)
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget_ratio = budget_ratio
+        self.budget_min = budget_min
+        self.retry_errors = retry_errors
+
+        self.budget = float(budget_min)
+        self.retries = 0
+
+    def delay(self, attempt: int) -> float:
+        """
+        Return the backoff delay before the retry, with full jitter
+
+        :param attempt: Number of the failed attempt, from 0
+        :return:
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def withdraw(self) -> bool:
+        """
+        Take a retry from the budget, return False if the budget is empty
+
+        :return:
+        """
+        if self.budget < 1:
+            return False
+        self.budget -= 1
+        self.retries += 1
+        return True
+
+    async def call(self, request: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Send the request, retrying it on retry errors within the limits of the policy
+
+        :param request: Coroutine function sending the request
+        :return:
+        """
+        self.budget = min(self.budget_min, self.budget + self.budget_ratio)
+        attempt = 0
+        while True:
+            try:
+                return await request()
+            except self.retry_errors as exception:
+                if attempt >= self.max_retries or not self.withdraw():
+                    raise
+                delay = self.delay(attempt)
+                logger.debug("Retry request in %.2fs: %s", delay, exception)
+            await asyncio.sleep(delay)
+            attempt += 1
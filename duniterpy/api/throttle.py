@@ -0,0 +1,172 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import time
+from typing import Any, Optional
+
+# HTTP status codes of throttling answers
+THROTTLE_STATUSES = (429, 503)
+
+DEFAULT_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 60.0
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter with a maximum number of requests in flight
+
+    Use it as an async context manager around each request::
+
+        async with rate_limiter:
+            await send_request()
+
+    When the node throttles requests, all requests are paused for an exponential backoff delay.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        max_in_flight: Optional[int] = None,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+    ) -> None:
+        """
+        Init RateLimiter instance
+
+        :param rate: Requests per second, None for no limit (optional, default None)
+        :param burst: Maximum number of requests sent at once at the rate (optional, default 1)
+        :param max_in_flight: Maximum number of requests in flight, None for no limit
+            (optional, default None)
+        :param backoff: First backoff delay in seconds, doubled on each throttling (optional, default 1)
+        :param max_backoff: Maximum backoff delay in seconds (optional, default 60)
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_in_flight = max_in_flight
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.tokens = float(self.burst)
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.current_backoff = backoff
+
+        self.in_flight = 0
+        self.queue_depth = 0
+        self._semaphore = None  # type: Optional[asyncio.Semaphore]
+
+    async def acquire(self) -> None:
+        """
+        Wait for a request slot
+
+        :return:
+        """
+        self.queue_depth += 1
+        try:
+            if self.max_in_flight is not None:
+                if self._semaphore is None:
+                    # created lazily to be bound to the running loop
+                    self._semaphore = asyncio.Semaphore(self.max_in_flight)
+                await self._semaphore.acquire()
+            try:
+                await self._wait_token()
+            except BaseException:
+                if self._semaphore is not None:
+                    self._semaphore.release()
+                raise
+        finally:
+            self.queue_depth -= 1
+        self.in_flight += 1
+
+    async def _wait_token(self) -> None:
+        """
+        Wait for the end of the backoff pause and for a token of the bucket
+
+        :return:
+        """
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+
+            if self.rate is None:
+                return
+
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.last_refill) * self.rate
+            )
+            self.last_refill = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def release(self) -> None:
+        """
+        Release the request slot
+
+        :return:
+        """
+        self.in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def throttled(self, retry_after: Optional[float] = None) -> float:
+        """
+        Pause all requests after a throttling answer, return the pause delay
+
+        :param retry_after: Seconds to wait given by the node (optional, default None)
+        :return:
+        """
+        delay = self.current_backoff if retry_after is None else retry_after
+        delay = min(delay, self.max_backoff)
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        self.current_backoff = min(self.current_backoff * 2, self.max_backoff)
+        return delay
+
+    def success(self) -> None:
+        """
+        Reset the backoff delay after a successful request
+
+        :return:
+        """
+        self.current_backoff = self.backoff
+
+    async def __aenter__(self) -> "RateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        self.release()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Return the delay in seconds of a Retry-After header, None if missing or not in seconds
+
+    :param value: Retry-After header value
+    :return:
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
@@ -15,9 +15,9 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import json
 import re
 from duniterpy.api.bma.blockchain import BLOCK_SCHEMA, BLOCKS_SCHEMA
+from duniterpy.tools import json_dumps
 
 ERROR_RESPONSE_SCHEMA = {
     "type": "object",
@@ -182,7 +182,7 @@ def get_current(request_id: str) -> str:
     """
     if not re.fullmatch("^[0-9a-zA-Z]{8}$", request_id):
         raise Exception("Invalid ws2p request unique id")
-    return json.dumps({"reqId": request_id, "body": {"name": "CURRENT", "params": {}}})
+    return json_dumps({"reqId": request_id, "body": {"name": "CURRENT", "params": {}}})
 
 
 def get_block(request_id: str, block_number: int) -> str:
@@ -193,7 +193,7 @@ def get_block(request_id: str, block_number: int) -> str:
     """
     if not re.fullmatch("^[0-9a-zA-Z]{8}$", request_id):
         raise Exception("Invalid ws2p request unique id")
-    return json.dumps(
+    return json_dumps(
         {
             "reqId": request_id,
             "body": {"name": "BLOCK_BY_NUMBER", "params": {"number": block_number}},
@@ -209,7 +209,7 @@ def get_blocks(request_id: str, from_number: int, count: int) -> str:
     """
     if not re.fullmatch("^[0-9a-zA-Z]{8}$", request_id):
         raise Exception("Invalid ws2p request unique id")
-    return json.dumps(
+    return json_dumps(
         {
             "reqId": request_id,
             "body": {
@@ -228,7 +228,7 @@ def get_requirements_pending(request_id: str, min_cert: int) -> str:
     """
     if not re.fullmatch("^[0-9a-zA-Z]{8}$", request_id):
         raise Exception("Invalid ws2p request unique id")
-    return json.dumps(
+    return json_dumps(
         {
             "reqId": request_id,
             "body": {
@@ -18,7 +18,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import base64
 import hashlib
 import re
-from typing import TypeVar, Type, Optional, List, Sequence
+from typing import TypeVar, Type, Optional, List, Sequence, Dict
 from .block_uid import BlockUID
 from .certification import Certification
 from .revocation import Revocation
@@ -32,6 +32,32 @@ from ..constants import PUBKEY_REGEX, BLOCK_HASH_REGEX
 # required to type hint cls in classmethod
 BlockType = TypeVar("BlockType", bound="Block")
 
+# sections of the block document, in document order
+BLOCK_SECTIONS_HEADERS = (
+    "Identities:\n",
+    "Joiners:\n",
+    "Actives:\n",
+    "Leavers:\n",
+    "Revoked:\n",
+    "Excluded:\n",
+    "Certifications:\n",
+    "Transactions:\n",
+)
+(
+    SECTION_IDENTITIES,
+    SECTION_JOINERS,
+    SECTION_ACTIVES,
+    SECTION_LEAVERS,
+    SECTION_REVOKED,
+    SECTION_EXCLUDED,
+    SECTION_CERTIFICATIONS,
+    SECTION_TRANSACTIONS,
+) = range(len(BLOCK_SECTIONS_HEADERS))
+# section index by header line
+BLOCK_SECTIONS = {
+    header: index for index, header in enumerate(BLOCK_SECTIONS_HEADERS)
+}  # type: Dict[str, int]
+
 
 class Block(Document):
     """
@@ -321,97 +347,63 @@ class Block(Document):
         members_count = int(Block.parse_field("MembersCount", lines[n]))
         n += 1
 
-        identities = []
-        joiners = []
-        actives = []
-        leavers = []
-        revoked = []
-        excluded = []
-        certifications = []
-        transactions = []
-
-        if Block.re_identities.match(lines[n]) is not None:
-            n += 1
-            while Block.re_joiners.match(lines[n]) is None:
-                selfcert = Identity.from_inline(version, currency, lines[n])
-                identities.append(selfcert)
-                n += 1
-
-        if Block.re_joiners.match(lines[n]):
-            n += 1
-            while Block.re_actives.match(lines[n]) is None:
-                membership = Membership.from_inline(version, currency, "IN", lines[n])
-                joiners.append(membership)
-                n += 1
-
-        if Block.re_actives.match(lines[n]):
-            n += 1
-            while Block.re_leavers.match(lines[n]) is None:
-                membership = Membership.from_inline(version, currency, "IN", lines[n])
-                actives.append(membership)
-                n += 1
-
-        if Block.re_leavers.match(lines[n]):
-            n += 1
-            while Block.re_revoked.match(lines[n]) is None:
-                membership = Membership.from_inline(version, currency, "OUT", lines[n])
-                leavers.append(membership)
-                n += 1
-
-        if Block.re_revoked.match(lines[n]):
-            n += 1
-            while Block.re_excluded.match(lines[n]) is None:
-                revokation = Revocation.from_inline(version, currency, lines[n])
-                revoked.append(revokation)
-                n += 1
-
-        if Block.re_excluded.match(lines[n]):
-            n += 1
-            while Block.re_certifications.match(lines[n]) is None:
-                exclusion_match = Block.re_exclusion.match(lines[n])
-                if exclusion_match is not None:
-                    exclusion = exclusion_match.group(1)
-                    excluded.append(exclusion)
-                n += 1
-
-        if Block.re_certifications.match(lines[n]):
-            n += 1
-            while Block.re_transactions.match(lines[n]) is None:
-                certification = Certification.from_inline(
-                    version, currency, prev_hash, lines[n]
-                )
-                certifications.append(certification)
+        identities = []  # type: List[Identity]
+        joiners = []  # type: List[Membership]
+        actives = []  # type: List[Membership]
+        leavers = []  # type: List[Membership]
+        revoked = []  # type: List[Revocation]
+        excluded = []  # type: List[str]
+        certifications = []  # type: List[Certification]
+        transactions = []  # type: List[Transaction]
+
+        # single pass on the sections, a section header must be followed by the next ones
+        section = None  # type: Optional[int]
+        while True:
+            line = lines[n]
+            header = BLOCK_SECTIONS.get(line)
+            if header is not None:
+                if section is not None and header != section + 1:
+                    raise MalformedDocumentError(line.strip())
+                section = header
                 n += 1
-
-        if Block.re_transactions.match(lines[n]):
-            n += 1
-            while not Block.re_hash.match(lines[n]):
-                tx_lines = ""
-                header_data = Transaction.re_header.match(lines[n])
-                if header_data is None:
+            elif line.startswith("InnerHash: "):
+                if section is not None and section != SECTION_TRANSACTIONS:
                     raise MalformedDocumentError(
-                        "Compact transaction ({0})".format(lines[n])
+                        BLOCK_SECTIONS_HEADERS[section + 1].strip()
                     )
-                issuers_num = int(header_data.group(2))
-                inputs_num = int(header_data.group(3))
-                unlocks_num = int(header_data.group(4))
-                outputs_num = int(header_data.group(5))
-                has_comment = int(header_data.group(6))
-                sup_lines = 2
-                tx_max = (
-                    n
-                    + sup_lines
-                    + issuers_num * 2
-                    + inputs_num
-                    + unlocks_num
-                    + outputs_num
-                    + has_comment
-                )
-                for index in range(n, tx_max):
-                    tx_lines += lines[index]
-                n += tx_max - n
-                transaction = Transaction.from_compact(currency, tx_lines)
+                break
+            elif section == SECTION_TRANSACTIONS:
+                # compact transaction lines are parsed in place
+                transaction, n = Transaction.from_compact_lines(currency, lines, n)
                 transactions.append(transaction)
+            else:
+                if section == SECTION_IDENTITIES:
+                    identities.append(Identity.from_inline(version, currency, line))
+                elif section == SECTION_JOINERS:
+                    joiners.append(
+                        Membership.from_inline(version, currency, "IN", line)
+                    )
+                elif section == SECTION_ACTIVES:
+                    actives.append(
+                        Membership.from_inline(version, currency, "IN", line)
+                    )
+                elif section == SECTION_LEAVERS:
+                    leavers.append(
+                        Membership.from_inline(version, currency, "OUT", line)
+                    )
+                elif section == SECTION_REVOKED:
+                    revoked.append(Revocation.from_inline(version, currency, line))
+                elif section == SECTION_EXCLUDED:
+                    exclusion_match = Block.re_exclusion.match(line)
+                    if exclusion_match is not None:
+                        excluded.append(exclusion_match.group(1))
+                elif section == SECTION_CERTIFICATIONS:
+                    certifications.append(
+                        Certification.from_inline(version, currency, prev_hash, line)
+                    )
+                else:
+                    raise MalformedDocumentError("InnerHash")
+                n += 1
 
         inner_hash = Block.parse_field("InnerHash", lines[n])
         n += 1
@@ -451,6 +443,82 @@ class Block(Document):
             signature,
         )
 
+    @classmethod
+    def from_bma_json(cls: Type[BlockType], data: dict) -> BlockType:
+        """
+        Return a Block instance from the json data of a BMA block
+
+        The instance is built from the json fields, without formatting the raw document,
+        only the inline documents and transactions are parsed.
+
+        :param data: Block json data, as returned by bma.blockchain.block or blocks
+        :return:
+        """
+        try:
+            version = int(data["version"])
+            currency = data["currency"]
+            number = int(data["number"])
+            prev_hash = data["previousHash"] if number > 0 else None
+
+            parameters = None
+            if number == 0:
+                parameters = tuple(data["parameters"].split(":"))
+
+            return cls(
+                version,
+                currency,
+                number,
+                int(data["powMin"]),
+                int(data["time"]),
+                int(data["medianTime"]),
+                data["dividend"],
+                int(data["unitbase"]),
+                data["issuer"],
+                int(data["issuersFrame"]),
+                int(data["issuersFrameVar"]),
+                int(data["issuersCount"]),
+                prev_hash,
+                data["previousIssuer"] if number > 0 else None,
+                parameters,
+                int(data["membersCount"]),
+                [
+                    Identity.from_inline(version, currency, inline + "\n")
+                    for inline in data["identities"]
+                ],
+                [
+                    Membership.from_inline(version, currency, "IN", inline + "\n")
+                    for inline in data["joiners"]
+                ],
+                [
+                    Membership.from_inline(version, currency, "IN", inline + "\n")
+                    for inline in data["actives"]
+                ],
+                [
+                    Membership.from_inline(version, currency, "OUT", inline + "\n")
+                    for inline in data["leavers"]
+                ],
+                [
+                    Revocation.from_inline(version, currency, inline + "\n")
+                    for inline in data["revoked"]
+                ],
+                list(data["excluded"]),
+                [
+                    Certification.from_inline(
+                        version, currency, prev_hash, inline + "\n"
+                    )
+                    for inline in data["certifications"]
+                ],
+                [
+                    Transaction.from_bma_json(tx_data, currency)
+                    for tx_data in data["transactions"]
+                ],
+                data["inner_hash"],
+                int(data["nonce"]),
+                data["signature"],
+            )
+        except KeyError as exception:
+            raise MalformedDocumentError("Block") from exception
+
     def raw(self) -> str:
         doc = """Version: {version}
 Type: Block
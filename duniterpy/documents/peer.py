@@ -129,6 +129,28 @@ class Peer(Document):
 
         return cls(version, currency, pubkey, block_uid, endpoints, signature)
 
+    @classmethod
+    def from_bma_json(cls: Type[PeerType], data: dict) -> PeerType:
+        """
+        Return a Peer instance from the json data of a BMA peering document
+
+        The instance is built from the json fields, only the endpoints are parsed.
+
+        :param data: Peering document json data, as returned by bma.network.peering
+        :return:
+        """
+        try:
+            return cls(
+                int(data["version"]),
+                data["currency"],
+                data["pubkey"],
+                BlockUID.from_str(data["block"]),
+                [endpoint(inline) for inline in data["endpoints"]],
+                data["signature"],
+            )
+        except KeyError as exception:
+            raise MalformedDocumentError("Peer") from exception
+
     def raw(self) -> str:
         """
         Return a raw format string of the Peer document
@@ -15,6 +15,8 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import functools
+import pickle
 import re
 from typing import TypeVar, List, Any, Type, Optional, Dict, Union, Tuple
 
@@ -59,6 +61,30 @@ def reduce_base(amount: int, base: int) -> Tuple[int, int]:
     return int(amount), int(base)
 
 
+# Size of the output conditions parsing cache
+CONDITIONS_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=CONDITIONS_CACHE_SIZE)
+def _parse_condition(text: str) -> bytes:
+    """
+    Return the pickled Condition instance parsed from text, cached by text
+
+    Most outputs are locked by the same few conditions, parsing them with the PEG
+    grammar once is enough. Unpickling is much faster than a deep copy.
+
+    :param text: PEG parsable string
+    :return:
+    """
+    try:
+        condition = pypeg2.parse(text, output.Condition)
+    except SyntaxError:
+        # Invalid conditions are possible, see https://github.com/duniter/duniter/issues/1156
+        # In such a case, they are store as empty PEG grammar object and considered unlockable
+        condition = Condition(text)
+    return pickle.dumps(condition, pickle.HIGHEST_PROTOCOL)
+
+
 # required to type hint cls in classmethod
 InputSourceType = TypeVar("InputSourceType", bound="InputSource")
 
@@ -234,13 +260,8 @@ class OutputSource:
         :param text: PEG parsable string
         :return:
         """
-        try:
-            condition = pypeg2.parse(text, output.Condition)
-        except SyntaxError:
-            # Invalid conditions are possible, see https://github.com/duniter/duniter/issues/1156
-            # In such a case, they are store as empty PEG grammar object and considered unlockable
-            condition = Condition(text)
-        return condition
+        # each call unpickles a new instance, that the caller can modify
+        return pickle.loads(_parse_condition(text))
 
 
 # required to type hint cls in classmethod
@@ -618,36 +639,49 @@ class Transaction(Document):
         """
         Get the transaction instance from json
 
+        The locktime attribute is a str, as when this method parsed a signed raw
+        document. Use from_bma_json to get an int.
+
         :param currency: the currency of the tx
         :param tx_data: json data of the transaction
 
         :return:
         """
-        tx_data = tx_data.copy()
-        tx_data["currency"] = currency
-        for data_list in ("issuers", "outputs", "inputs", "unlocks", "signatures"):
-            tx_data["multiline_{0}".format(data_list)] = "\n".join(tx_data[data_list])
-        return cls.from_signed_raw(
-            """Version: {version}
-Type: Transaction
-Currency: {currency}
-Blockstamp: {blockstamp}
-Locktime: {locktime}
-Issuers:
-{multiline_issuers}
-Inputs:
-{multiline_inputs}
-Unlocks:
-{multiline_unlocks}
-Outputs:
-{multiline_outputs}
-Comment: {comment}
-{multiline_signatures}
-""".format(
-                **tx_data
-            ),
-            tx_data["time"],
-        )
+        transaction = cls.from_bma_json(tx_data, currency)
+        transaction.locktime = str(transaction.locktime)  # type: ignore
+        return transaction
+
+    @classmethod
+    def from_bma_json(
+        cls: Type[TransactionType], data: Dict, currency: Optional[str] = None
+    ) -> TransactionType:
+        """
+        Return Transaction instance from the json data of a BMA transaction,
+        as found in the transactions of a block or in a transaction history
+
+        The instance is built from the json fields,
+        only the inputs, unlocks and outputs inline strings are parsed.
+
+        :param data: Transaction json data
+        :param currency: Name of the currency (optional, default to the currency field)
+        :return:
+        """
+        try:
+            return cls(
+                int(data["version"]),
+                data["currency"] if currency is None else currency,
+                BlockUID.from_str(data["blockstamp"]),
+                int(data["locktime"]),
+                list(data["issuers"]),
+                [InputSource.from_inline(inline) for inline in data["inputs"]],
+                [Unlock.from_inline(inline) for inline in data["unlocks"]],
+                [OutputSource.from_inline(inline) for inline in data["outputs"]],
+                data["comment"],
+                list(data["signatures"]),
+                data.get("time"),
+            )
+        except KeyError as exception:
+            raise MalformedDocumentError("Transaction") from exception
 
     @classmethod
     def from_compact(
@@ -661,7 +695,31 @@ Comment: {comment}
         :return:
         """
         lines = compact.splitlines(True)
-        n = 0
+        transaction, _ = cls.from_compact_lines(currency, lines, 0, len(lines))
+        return transaction
+
+    @classmethod
+    def from_compact_lines(
+        cls: Type[TransactionType],
+        currency: str,
+        lines: List[str],
+        start: int = 0,
+        end: Optional[int] = None,
+    ) -> Tuple[TransactionType, int]:
+        """
+        Return Transaction instance from the compact format lines starting at start,
+        and the index of the line following the transaction
+
+        The lines are parsed in place, as in the lines of a block document.
+
+        :param currency: Name of the currency
+        :param lines: Lines of the document, with line breaks
+        :param start: Index of the header line (optional, default 0)
+        :param end: Index of the line following the signatures
+            (optional, default None for one signature by issuer)
+        :return:
+        """
+        n = start
 
         header_data = Transaction.re_header.match(lines[n])
         if header_data is None:
@@ -674,35 +732,35 @@ Comment: {comment}
         has_comment = int(header_data.group(6))
         locktime = int(header_data.group(7))
         n += 1
+        # blockstamp, issuers, inputs, unlocks, outputs and comment lines
+        body_end = (
+            n + 1 + issuers_num + inputs_num + unlocks_num + outputs_num + has_comment
+        )
+        if end is None:
+            end = body_end + issuers_num
+        if end < body_end or end > len(lines):
+            raise MalformedDocumentError("Compact TX lines")
 
         blockstamp = BlockUID.from_str(
             Transaction.parse_field("CompactBlockstamp", lines[n])
         )
         n += 1
 
-        issuers = []
-        inputs = []
-        unlocks = []
-        outputs = []
-        signatures = []
-        for index in range(0, issuers_num):
-            issuer = Transaction.parse_field("Pubkey", lines[n + index])
-            issuers.append(issuer)
+        issuers = [
+            Transaction.parse_field("Pubkey", line)
+            for line in lines[n : n + issuers_num]
+        ]
         n += issuers_num
 
-        for index in range(0, inputs_num):
-            input_source = InputSource.from_inline(lines[n + index])
-            inputs.append(input_source)
+        inputs = [InputSource.from_inline(line) for line in lines[n : n + inputs_num]]
         n += inputs_num
 
-        for index in range(0, unlocks_num):
-            unlock = Unlock.from_inline(lines[n + index])
-            unlocks.append(unlock)
+        unlocks = [Unlock.from_inline(line) for line in lines[n : n + unlocks_num]]
         n += unlocks_num
 
-        for index in range(0, outputs_num):
-            output_source = OutputSource.from_inline(lines[n + index])
-            outputs.append(output_source)
+        outputs = [
+            OutputSource.from_inline(line) for line in lines[n : n + outputs_num]
+        ]
         n += outputs_num
 
         comment = ""
@@ -714,7 +772,8 @@ Comment: {comment}
             else:
                 raise MalformedDocumentError("Compact TX Comment")
 
-        while n < len(lines):
+        signatures = []
+        while n < end:
             data = Transaction.re_signature.match(lines[n])
             if data:
                 signatures.append(data.group(1))
@@ -722,7 +781,7 @@ Comment: {comment}
             else:
                 raise MalformedDocumentError("Compact TX Signatures")
 
-        return cls(
+        transaction = cls(
             version,
             currency,
             blockstamp,
@@ -734,6 +793,7 @@ Comment: {comment}
             comment,
             signatures,
         )
+        return transaction, end
 
     @classmethod
     def from_signed_raw(
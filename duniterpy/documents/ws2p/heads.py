@@ -15,11 +15,16 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import base64
 import re
+from concurrent.futures import Executor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
 import attr
 
 from ..block_uid import BlockUID
 from ..document import MalformedDocumentError
+from ...key import get_verifying_key
 from ...constants import (
     WS2P_PUBLIC_PREFIX_REGEX,
     WS2P_PRIVATE_PREFIX_REGEX,
@@ -28,6 +33,7 @@ from ...constants import (
     SIGNATURE_REGEX,
     WS2PID_REGEX,
     BLOCK_UID_REGEX,
+    BLOCK_HASH_REGEX,
 )
 
 
@@ -214,3 +220,167 @@ class HeadV2(HeadV1):
             )
         except AttributeError:
             raise MalformedDocumentError("HeadV2") from AttributeError
+
+
+# Number of signatures verified by task of the executor
+DEFAULT_VERIFY_CHUNK_SIZE = 256
+
+# All head versions in a single regex, a group is None if the field is missing
+HEAD_REGEX = re.compile(
+    "^WS2P({ws2p_private})?({ws2p_public})?:HEAD(?::([0-9]+))?:({pubkey}):([0-9]+)-({block_hash})"
+    "(?::({ws2pid}):({software}):({software_version}):({pow_prefix})"
+    "(?::([0-9]+):([0-9]+))?)?".format(
+        ws2p_private=WS2P_PRIVATE_PREFIX_REGEX,
+        ws2p_public=WS2P_PUBLIC_PREFIX_REGEX,
+        pubkey=PUBKEY_REGEX,
+        block_hash=BLOCK_HASH_REGEX,
+        ws2pid=WS2PID_REGEX,
+        software="[A-Za-z-_]+",
+        software_version="[0-9]+[.][0-9]+[.][0-9]+[-\\w]*",
+        pow_prefix="[0-9]+",
+    )
+)
+
+AnyHead = Union[HeadV0, HeadV1, HeadV2]
+
+
+def parse_head(inline: str, signature: str) -> AnyHead:
+    """
+    Return the head of any version from its inline format, in a single pass
+
+    The head is equal to the one returned by the from_inline() method of its version class.
+
+    :param inline: Inline head message
+    :param signature: Base64 encoded signature of the message
+    :return:
+    """
+    data = HEAD_REGEX.match(inline)
+    if data is None:
+        raise MalformedDocumentError("Head")
+    (
+        private,
+        public,
+        version,
+        pubkey,
+        block_number,
+        block_hash,
+        ws2pid,
+        software,
+        software_version,
+        pow_prefix,
+        free_member_room,
+        free_mirror_room,
+    ) = data.groups()
+    version = 0 if version is None else int(version)
+    v0_fields = (
+        version,
+        signature,
+        API(private or "", public or ""),
+        Head(version),
+        pubkey,
+        BlockUID(int(block_number), block_hash),
+    )
+    if ws2pid is None:
+        return HeadV0(*v0_fields)
+    v1_fields = v0_fields + (ws2pid, software, software_version, int(pow_prefix))
+    if free_member_room is None:
+        return HeadV1(*v1_fields)
+    return HeadV2(*v1_fields, int(free_member_room), int(free_mirror_room))
+
+
+def verify_heads(heads: List[Tuple[AnyHead, str]]) -> List[bool]:
+    """
+    Return the signature check of each head on its inline message
+
+    The verifying keys are cached by pubkey.
+
+    :param heads: Heads with their inline message
+    :return:
+    """
+    results = []
+    for head, inline in heads:
+        try:
+            get_verifying_key(head.pubkey).verify(
+                base64.b64decode(head.signature) + inline.encode("ascii")
+            )
+            results.append(True)
+        except ValueError:
+            results.append(False)
+    return results
+
+
+def parse_heads(
+    heads: Iterable[dict],
+    verify: bool = True,
+    executor: Optional[Executor] = None,
+    chunk_size: int = DEFAULT_VERIFY_CHUNK_SIZE,
+) -> List[AnyHead]:
+    """
+    Return the newest valid head of each (pubkey, ws2pid) from the heads of bma.network.ws2p_heads()
+
+    The V2 message of a head is used if present. Malformed heads are dropped,
+    and heads with an invalid signature if verify is True.
+    Only the newest head of each node, by blockstamp, is verified, then the next one
+    if its signature is invalid. Signatures can be verified on an executor,
+    in tasks of chunk_size heads.
+
+    :param heads: Heads json data, with message and sig, or messageV2 and sigV2
+    :param verify: Drop heads with an invalid signature (optional, default True)
+    :param executor: Executor to verify signatures, as a ThreadPoolExecutor
+        (optional, default None)
+    :param chunk_size: Number of heads by executor task (optional, default 256)
+    :return:
+    """
+    # candidate heads of each node, with their inline message
+    nodes = dict()  # type: Dict[Tuple[str, str], List[Tuple[AnyHead, str]]]
+    for data in heads:
+        if "messageV2" in data and "sigV2" in data:
+            inline, signature = data["messageV2"], data["sigV2"]
+        else:
+            inline, signature = data.get("message"), data.get("sig")
+        if not isinstance(inline, str) or not isinstance(signature, str):
+            continue
+        try:
+            head = parse_head(inline, signature)
+        except (MalformedDocumentError, AssertionError, ValueError):
+            continue
+        key = (head.pubkey, getattr(head, "ws2pid", ""))
+        nodes.setdefault(key, []).append((head, inline))
+
+    for candidates in nodes.values():
+        # newest first, the first seen first between equals
+        candidates.sort(key=lambda candidate: -candidate[0].blockstamp.number)
+
+    if not verify:
+        return [candidates[0][0] for candidates in nodes.values()]
+
+    result = dict()  # type: Dict[Tuple[str, str], AnyHead]
+    depth = 0
+    while True:
+        batch = [
+            (key, candidates[depth])
+            for key, candidates in nodes.items()
+            if key not in result and depth < len(candidates)
+        ]
+        if not batch:
+            break
+        items = [item for _, item in batch]
+        if executor is None:
+            checks = verify_heads(items)
+        else:
+            chunks = [
+                items[index : index + chunk_size]
+                for index in range(0, len(items), chunk_size)
+            ]
+            checks = [
+                check
+                for chunk_checks in executor.map(verify_heads, chunks)
+                for check in chunk_checks
+            ]
+        for (key, (head, _)), check in zip(batch, checks):
+            if check:
+                result[key] = head
+        depth += 1
+
+    # keep the order of the nodes in the batch
+    return [result[key] for key in nodes if key in result]
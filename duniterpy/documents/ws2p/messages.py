@@ -15,13 +15,11 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import json
-
 from typing import Optional
 
 from duniterpy.documents import Document
-from duniterpy.key import VerifyingKey, SigningKey
-from duniterpy.tools import get_ws2p_challenge
+from duniterpy.key import SigningKey, get_verifying_key
+from duniterpy.tools import get_ws2p_challenge, json_dumps
 
 
 class HandshakeMessage(Document):
@@ -60,7 +58,7 @@ class HandshakeMessage(Document):
 
         if signature is not None:
             # verify signature
-            verifying_key = VerifyingKey(self.pubkey)
+            verifying_key = get_verifying_key(self.pubkey)
             verifying_key.verify_document(self)
 
     def raw(self):
@@ -91,7 +89,7 @@ class HandshakeMessage(Document):
             "challenge": self.challenge,
             "sig": self.signatures[0],
         }
-        return json.dumps(data)
+        return json_dumps(data)
 
     def __str__(self) -> str:
         return self.raw()
@@ -131,7 +129,7 @@ class Ack(HandshakeMessage):
         """
         self.sign([signing_key])
         data = {"auth": self.auth, "pub": self.pubkey, "sig": self.signatures[0]}
-        return json.dumps(data)
+        return json_dumps(data)
 
 
 class Ok(HandshakeMessage):
@@ -164,7 +162,7 @@ class Ok(HandshakeMessage):
         """
         self.sign([signing_key])
         data = {"auth": self.auth, "sig": self.signatures[0]}
-        return json.dumps(data)
+        return json_dumps(data)
 
 
 class DocumentMessage:
@@ -197,4 +195,4 @@ class DocumentMessage:
                 self.DOCUMENT_TYPE_NAMES[document_type_id]: document,
             }
         }
-        return json.dumps(data)
+        return json_dumps(data)
@@ -0,0 +1,149 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import logging
+import random
+from collections import deque
+from typing import AsyncIterator, Deque, Union
+
+import aiohttp
+import jsonschema
+
+from duniterpy.api.bma import blockchain
+from duniterpy.api.client import Client
+from duniterpy.api.pool import ClientPool
+
+logger = logging.getLogger("duniter/helpers/blockchain")
+
+DEFAULT_CHUNK_SIZE = 250
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_DELAY = 0.5
+
+# Errors of a chunk request which can be retried
+RETRY_ERRORS = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    ValueError,
+    jsonschema.ValidationError,
+)
+
+
+async def fetch_blocks_chunk(
+    client: Union[Client, ClientPool],
+    start: int,
+    count: int,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    retry_delay: float = DEFAULT_RETRY_DELAY,
+) -> list:
+    """
+    Return count blocks from start, retrying the request if it fails
+
+    With a ClientPool, each request fails over to the next endpoints of the pool.
+
+    :param client: Client or ClientPool instance
+    :param start: First block number
+    :param count: Number of blocks
+    :param max_retries: Maximum number of retries (optional, default 3)
+    :param retry_delay: Seconds before the first retry, doubled on each retry (optional, default 0.5)
+    :return:
+    """
+    attempt = 0
+    while True:
+        try:
+            blocks = await blockchain.blocks(client, count, start)
+            if [block["number"] for block in blocks] != list(
+                range(start, start + count)
+            ):
+                raise ValueError(
+                    "Incomplete blocks chunk {0}-{1}".format(start, start + count - 1)
+                )
+            return blocks
+        except RETRY_ERRORS as exception:
+            if attempt >= max_retries:
+                raise
+            logger.warning(
+                "Blocks chunk %d-%d failed, retry: %s",
+                start,
+                start + count - 1,
+                exception,
+            )
+        await asyncio.sleep(retry_delay * 2 ** attempt * random.uniform(0.5, 1.5))
+        attempt += 1
+
+
+async def iter_blocks(
+    client: Union[Client, ClientPool],
+    start: int,
+    end: int,
+    chunk: int = DEFAULT_CHUNK_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+) -> AsyncIterator[dict]:
+    """
+    Yield blocks json data from start to end included, strictly in order
+
+    The range is split in chunks fetched concurrently. With a ClientPool, each
+    chunk request goes through the pool routing, failover, endpoint stats,
+    circuit breakers and hedging. At most concurrency chunks are requested or
+    waiting to be yielded at once.
+
+    Usage::
+
+        async for block in iter_blocks(client, 0, 10000):
+            print(block["number"])
+
+    :param client: Client or ClientPool instance
+    :param start: First block number
+    :param end: Last block number
+    :param chunk: Number of blocks by request (optional, default 250)
+    :param concurrency: Number of chunks requested at once (optional, default 4)
+    :param max_retries: Maximum number of retries of a chunk (optional, default 3)
+    :return:
+    """
+    chunks = iter(range(start, end + 1, chunk))
+    # chunk requests, in order
+    pending = deque()  # type: Deque[asyncio.Future]
+
+    def next_chunk() -> None:
+        chunk_start = next(chunks, None)
+        if chunk_start is None:
+            return
+        pending.append(
+            asyncio.ensure_future(
+                fetch_blocks_chunk(
+                    client,
+                    chunk_start,
+                    min(chunk, end - chunk_start + 1),
+                    max_retries,
+                )
+            )
+        )
+
+    for _ in range(concurrency):
+        next_chunk()
+
+    try:
+        while pending:
+            blocks = await pending.popleft()
+            next_chunk()
+            for block in blocks:
+                yield block
+    finally:
+        for request in pending:
+            request.cancel()
@@ -0,0 +1,553 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import aiohttp
+import jsonschema
+from aiohttp import ClientSession
+
+from duniterpy.api import bma
+from duniterpy.api.client import Client, create_session, VALIDATION_ALWAYS
+from duniterpy.api.endpoint import BMAEndpoint, Endpoint, endpoint
+from duniterpy.api.errors import DuniterError
+from duniterpy.documents.document import MalformedDocumentError
+from duniterpy.documents.peer import Peer
+from duniterpy.key.verifying_key import get_verifying_key
+
+logger = logging.getLogger("duniter/helpers/network")
+
+# Requests in flight during a crawl
+DEFAULT_CRAWL_CONCURRENCY = 20
+# Seconds to wait for a node response
+DEFAULT_CRAWL_TIMEOUT = 5.0
+# Maximum number of blocks between a ranked node and the network
+DEFAULT_MAX_LAG = 3
+# Leaf requests in flight during a peer table sync
+DEFAULT_SYNC_CONCURRENCY = 10
+
+# Errors of a node request, the node is considered unreachable
+CRAWL_ERRORS = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    OSError,
+    ValueError,
+    KeyError,
+    jsonschema.ValidationError,
+    MalformedDocumentError,
+    DuniterError,
+)
+
+
+class EndpointProbe:
+    """
+    Result of the probe of a node endpoint
+    """
+
+    def __init__(
+        self,
+        _endpoint: Endpoint,
+        peer: Optional[Peer] = None,
+        latency: Optional[float] = None,
+        block_number: Optional[int] = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        """
+        Init EndpointProbe instance
+
+        :param _endpoint: Probed endpoint
+        :param peer: Peer document announcing the endpoint (optional, default None)
+        :param latency: Seconds to get the current block (optional, default None)
+        :param block_number: Current block number of the node (optional, default None)
+        :param error: Error of an unreachable node (optional, default None)
+        """
+        self.endpoint = _endpoint
+        self.peer = peer
+        self.latency = latency
+        self.block_number = block_number
+        self.error = error
+
+    @property
+    def reachable(self) -> bool:
+        """
+        Return True if the node answered with its current block
+
+        :return:
+        """
+        return self.error is None and self.block_number is not None
+
+    def __str__(self) -> str:
+        if not self.reachable:
+            return "{0} unreachable: {1}".format(self.endpoint.inline(), self.error)
+        return "{0} block {1} in {2:.3f}s".format(
+            self.endpoint.inline(), self.block_number, self.latency
+        )
+
+
+def verify_peer(peer: Peer) -> bool:
+    """
+    Return True if the peer document is signed by its pubkey
+
+    :param peer: Peer document
+    :return:
+    """
+    try:
+        return get_verifying_key(peer.pubkey).verify_document(peer)
+    except ValueError:
+        return False
+
+
+class PeerTable:
+    """
+    Local copy of the peers merkle tree of a node
+
+    Peer documents are stored by merkle leaf hash. A sync compares the merkle root, then
+    the leaf hashes, with the remote node and only fetches the peer documents of the new
+    leaves: a refresh costs one request when nothing changed and one request by changed
+    peer otherwise.
+    """
+
+    def __init__(self, verify: bool = True, currency: Optional[str] = None) -> None:
+        """
+        Init PeerTable instance
+
+        :param verify: Verify peer documents signatures (optional, default True)
+        :param currency: Currency of the peers, others are ignored
+            (optional, default None for the currency of the first peer)
+        """
+        self.verify = verify
+        self.currency = currency
+        # merkle root of the remote tree when the table was last in sync
+        self.root = None  # type: Optional[str]
+        # peer documents by leaf hash
+        self.leaves = {}  # type: Dict[str, Peer]
+        # leaf hash of the latest document by pubkey
+        self.pubkeys = {}  # type: Dict[str, str]
+        # leaves of invalid documents, never fetched again
+        self.ignored = set()  # type: Set[str]
+
+    def __len__(self) -> int:
+        return len(self.pubkeys)
+
+    def __contains__(self, pubkey: object) -> bool:
+        return pubkey in self.pubkeys
+
+    def get(self, pubkey: str) -> Optional[Peer]:
+        """
+        Return the peer document of the pubkey, None if unknown
+
+        :param pubkey: Public key of the peer
+        :return:
+        """
+        leaf = self.pubkeys.get(pubkey)
+        return None if leaf is None else self.leaves[leaf]
+
+    @property
+    def peers(self) -> List[Peer]:
+        """
+        Return the latest peer document of each pubkey
+
+        :return:
+        """
+        return [self.leaves[leaf] for leaf in self.pubkeys.values()]
+
+    def _add(self, leaf: str, peer: Peer) -> bool:
+        """
+        Store the peer document of the leaf, return True if it is the latest of its pubkey
+
+        :param leaf: Merkle leaf hash
+        :param peer: Peer document
+        :return:
+        """
+        if self.currency is not None and peer.currency != self.currency:
+            self.ignored.add(leaf)
+            return False
+        if self.verify and not verify_peer(peer):
+            logger.warning("Peer %s ignored: invalid signature", peer.pubkey)
+            self.ignored.add(leaf)
+            return False
+        if self.currency is None:
+            self.currency = peer.currency
+
+        self.leaves[leaf] = peer
+        current = self.get(peer.pubkey)
+        if current is not None and current.blockUID > peer.blockUID:
+            return False
+        self.pubkeys[peer.pubkey] = leaf
+        return True
+
+    def _remove(self, leaf: str) -> Optional[Peer]:
+        """
+        Remove the leaf, return its peer document if its pubkey has no document left
+
+        :param leaf: Merkle leaf hash
+        :return:
+        """
+        peer = self.leaves.pop(leaf)
+        if self.pubkeys.get(peer.pubkey) != leaf:
+            return None
+        # fall back to another document of the pubkey
+        others = [
+            (other_leaf, other)
+            for other_leaf, other in self.leaves.items()
+            if other.pubkey == peer.pubkey
+        ]
+        if others:
+            other_leaf, _ = max(others, key=lambda item: item[1].blockUID.number)
+            self.pubkeys[peer.pubkey] = other_leaf
+            return None
+        del self.pubkeys[peer.pubkey]
+        return peer
+
+    async def _fetch(
+        self, client: Client, leaf: str, semaphore: asyncio.Semaphore
+    ) -> Optional[Peer]:
+        try:
+            async with semaphore:
+                data = await bma.network.peers(client, leaf=leaf)
+            return Peer.from_bma_json(data["leaf"]["value"])
+        except (MalformedDocumentError, KeyError) as exception:
+            logger.warning("Leaf %s ignored: %s", leaf, exception)
+            self.ignored.add(leaf)
+            return None
+        except CRAWL_ERRORS as exception:
+            # node or network error, the leaf is fetched again on next sync
+            logger.warning("Leaf %s failed: %s", leaf, exception)
+            raise
+
+    async def sync(
+        self, client: Client, concurrency: int = DEFAULT_SYNC_CONCURRENCY
+    ) -> Tuple[List[Peer], List[Peer]]:
+        """
+        Update the table from the peers merkle tree of the node
+
+        Return the new peer documents and the documents of the peers removed from the
+        tree. Errors of the merkle tree requests are raised, the table is then unchanged.
+        Errors of the leaf requests are logged, the table is partially updated and the
+        next sync fetches the missing leaves.
+
+        :param client: Client of a BMA endpoint
+        :param concurrency: Maximum number of leaf requests in flight (optional, default 10)
+        :return:
+        """
+        summary = await bma.network.peers(client)
+        if self.root is not None and summary["root"] == self.root:
+            return [], []
+
+        data = await bma.network.peers(client, leaves=True)
+        remote = set(data["leaves"])
+
+        removed = []  # type: List[Peer]
+        for leaf in [leaf for leaf in self.leaves if leaf not in remote]:
+            peer = self._remove(leaf)
+            if peer is not None:
+                removed.append(peer)
+        self.ignored &= remote
+
+        new_leaves = [
+            leaf
+            for leaf in data["leaves"]
+            if leaf not in self.leaves and leaf not in self.ignored
+        ]
+        self.root = None
+        semaphore = asyncio.Semaphore(concurrency)
+        results = await asyncio.gather(
+            *[self._fetch(client, leaf, semaphore) for leaf in new_leaves],
+            return_exceptions=True
+        )
+        added = [
+            peer
+            for leaf, peer in zip(new_leaves, results)
+            if isinstance(peer, Peer) and self._add(leaf, peer)
+        ]
+        failed = 0
+        for result in results:
+            if isinstance(result, BaseException):
+                if not isinstance(result, CRAWL_ERRORS):
+                    raise result
+                failed += 1
+        if failed:
+            logger.warning("%d leaves of %s failed", failed, client.endpoint.inline())
+        else:
+            self.root = data["root"]
+
+        # a removed pubkey may come back with a new document
+        pubkeys = {peer.pubkey for peer in added}
+        removed = [peer for peer in removed if peer.pubkey not in pubkeys]
+        return added, removed
+
+
+class _Crawl:
+    """
+    State of a network crawl
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        proxy: Optional[str],
+        concurrency: int,
+        timeout: float,
+        max_peers: Optional[int],
+        verify: bool,
+        validation: str,
+    ) -> None:
+        self.session = session
+        self.proxy = proxy
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_peers = max_peers
+        self.verify = verify
+        self.validation = validation
+
+        self.currency = None  # type: Optional[str]
+        self.peers = {}  # type: Dict[str, Peer]
+        self.probes = []  # type: List[EndpointProbe]
+        self.known_leaves = set()  # type: Set[str]
+        self.probed_endpoints = set()  # type: Set[Endpoint]
+        self.tasks = set()  # type: Set[asyncio.Task]
+
+    def client(self, _endpoint: Endpoint) -> Client:
+        """
+        Return a client of the endpoint on the crawl session
+
+        :param _endpoint: Node endpoint
+        :return:
+        """
+        return Client(
+            _endpoint,
+            session=self.session,
+            proxy=self.proxy,
+            timeout=self.timeout,
+            validation=self.validation,
+        )
+
+    def spawn(self, coroutine) -> None:
+        self.tasks.add(asyncio.ensure_future(coroutine))
+
+    def accept(self, peer: Peer) -> bool:
+        """
+        Register the peer if it is new, valid and of the crawled currency
+
+        :param peer: Peer document
+        :return:
+        """
+        if peer.pubkey in self.peers:
+            return False
+        if self.max_peers is not None and len(self.peers) >= self.max_peers:
+            return False
+        if self.currency is not None and peer.currency != self.currency:
+            logger.debug("Peer %s of currency %s ignored", peer.pubkey, peer.currency)
+            return False
+        if self.verify and not verify_peer(peer):
+            logger.warning("Peer %s ignored: invalid signature", peer.pubkey)
+            return False
+        if self.currency is None:
+            self.currency = peer.currency
+        self.peers[peer.pubkey] = peer
+        return True
+
+    async def run(self, seeds: Iterable[Endpoint]) -> None:
+        for seed in seeds:
+            self.spawn(self.visit_seed(seed))
+        try:
+            while self.tasks:
+                done, _ = await asyncio.wait(
+                    self.tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                self.tasks -= done
+                for task in done:
+                    task.result()
+        finally:
+            for task in self.tasks:
+                task.cancel()
+
+    async def visit_seed(self, seed: Endpoint) -> None:
+        try:
+            async with self.semaphore:
+                data = await bma.network.peering(self.client(seed))
+            peer = Peer.from_bma_json(data)
+        except CRAWL_ERRORS as exception:
+            logger.warning("Seed %s failed: %s", seed.inline(), exception)
+            if seed not in self.probed_endpoints:
+                self.probed_endpoints.add(seed)
+                self.probes.append(EndpointProbe(seed, error=exception))
+            return
+        if self.accept(peer):
+            await self.visit_peer(peer)
+
+    async def visit_peer(self, peer: Peer) -> None:
+        endpoints = [
+            _endpoint
+            for _endpoint in peer.endpoints
+            if isinstance(_endpoint, BMAEndpoint)
+            and _endpoint not in self.probed_endpoints
+        ]
+        self.probed_endpoints.update(endpoints)
+        results = await asyncio.gather(
+            *[self.probe(_endpoint, peer) for _endpoint in endpoints],
+            return_exceptions=True
+        )
+        probes = []
+        for _endpoint, result in zip(endpoints, results):
+            if isinstance(result, Exception):
+                # unexpected error, the node is unreachable for the crawl
+                logger.warning("Probe of %s failed: %r", _endpoint.inline(), result)
+                result = EndpointProbe(_endpoint, peer, error=result)
+            probes.append(result)
+        self.probes.extend(probes)
+
+        # discover the peers known by the node from its fastest endpoint
+        reachable = sorted(
+            (probe for probe in probes if probe.reachable),
+            key=lambda probe: probe.latency,
+        )
+        if reachable:
+            await self.discover(self.client(reachable[0].endpoint))
+
+    async def probe(self, _endpoint: Endpoint, peer: Peer) -> EndpointProbe:
+        client = self.client(_endpoint)
+        try:
+            async with self.semaphore:
+                start = time.monotonic()
+                current = await bma.blockchain.current(client)
+                latency = time.monotonic() - start
+            return EndpointProbe(_endpoint, peer, latency, current["number"])
+        except CRAWL_ERRORS as exception:
+            logger.debug("Probe of %s failed: %s", _endpoint.inline(), exception)
+            return EndpointProbe(_endpoint, peer, error=exception)
+
+    async def discover(self, client: Client) -> None:
+        try:
+            async with self.semaphore:
+                data = await bma.network.peers(client, leaves=True)
+            leaves = data["leaves"]
+        except CRAWL_ERRORS as exception:
+            logger.warning(
+                "Peers of %s failed: %s", client.endpoint.inline(), exception
+            )
+            return
+
+        # leaves are peer document hashes, shared by all nodes
+        new_leaves = [leaf for leaf in leaves if leaf not in self.known_leaves]
+        self.known_leaves.update(new_leaves)
+        for leaf in new_leaves:
+            self.spawn(self.visit_leaf(client, leaf))
+
+    async def visit_leaf(self, client: Client, leaf: str) -> None:
+        if self.max_peers is not None and len(self.peers) >= self.max_peers:
+            return
+        try:
+            async with self.semaphore:
+                data = await bma.network.peers(client, leaf=leaf)
+            peer = Peer.from_bma_json(data["leaf"]["value"])
+        except CRAWL_ERRORS as exception:
+            logger.debug("Leaf %s failed: %s", leaf, exception)
+            return
+        if self.accept(peer):
+            await self.visit_peer(peer)
+
+
+async def crawl(
+    seeds: Iterable[Union[str, Endpoint]],
+    concurrency: int = DEFAULT_CRAWL_CONCURRENCY,
+    timeout: float = DEFAULT_CRAWL_TIMEOUT,
+    max_peers: Optional[int] = None,
+    verify: bool = True,
+    session: Optional[ClientSession] = None,
+    proxy: Optional[str] = None,
+    validation: str = VALIDATION_ALWAYS,
+) -> List[EndpointProbe]:
+    """
+    Crawl the network from the seed nodes and return the probes of the BMA endpoints found
+
+    Peers are discovered breadth first from the peers list of each node, peers known from
+    another node are requested once. Peers are deduplicated by pubkey and the peers with
+    an invalid signature are ignored. Each endpoint is probed with a current block request.
+
+    Usage:
+
+        probes = await crawl(["BMAS g1.duniter.org 443"])
+        pool = ClientPool(ranked_endpoints(probes))
+
+    :param seeds: Endpoints strings in duniter format or BMA Endpoint instances
+    :param concurrency: Maximum number of requests in flight (optional, default 20)
+    :param timeout: Seconds to wait for each node response (optional, default 5)
+    :param max_peers: Maximum number of peers to crawl (optional, default None for all)
+    :param verify: Verify peer documents signatures (optional, default True)
+    :param session: Aiohttp client session (optional, default None for a new session)
+    :param proxy: Proxy server as hostname:port (optional, default None)
+    :param validation: Responses validation policy (optional, default VALIDATION_ALWAYS)
+    :return:
+    """
+    seeds = [endpoint(seed) if isinstance(seed, str) else seed for seed in seeds]
+
+    own_session = session is None
+    if session is None:
+        session = create_session()
+    try:
+        state = _Crawl(
+            session, proxy, concurrency, timeout, max_peers, verify, validation
+        )
+        await state.run(seeds)
+    finally:
+        if own_session:
+            await session.close()
+
+    return state.probes
+
+
+def rank_probes(
+    probes: Iterable[EndpointProbe], max_lag: int = DEFAULT_MAX_LAG
+) -> List[EndpointProbe]:
+    """
+    Return the probes of the reachable nodes in sync with the network, fastest first
+
+    A node is in sync if its current block number is within max_lag blocks of the
+    median block number of the reachable nodes.
+
+    :param probes: Endpoint probes
+    :param max_lag: Maximum number of blocks between a node and the network
+        (optional, default 3)
+    :return:
+    """
+    reachable = [probe for probe in probes if probe.reachable]
+    if not reachable:
+        return []
+    median = statistics.median_low([probe.block_number for probe in reachable])
+    in_sync = [
+        probe for probe in reachable if abs(probe.block_number - median) <= max_lag
+    ]
+    return sorted(in_sync, key=lambda probe: probe.latency)
+
+
+def ranked_endpoints(
+    probes: Iterable[EndpointProbe], max_lag: int = DEFAULT_MAX_LAG
+) -> List[Endpoint]:
+    """
+    Return the endpoints of the reachable nodes in sync with the network, fastest first
+
+    :param probes: Endpoint probes
+    :param max_lag: Maximum number of blocks between a node and the network
+        (optional, default 3)
+    :return:
+    """
+    return [probe.endpoint for probe in rank_probes(probes, max_lag)]
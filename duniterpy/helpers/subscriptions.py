@@ -0,0 +1,558 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import logging
+import random
+from collections import deque
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import aiohttp
+import jsonschema
+
+from duniterpy.api.bma import blockchain, ws
+from duniterpy.api.client import Client, WSConnection, validate
+from duniterpy.api.pool import ClientPool
+from duniterpy.documents.block_uid import BlockUID
+from duniterpy.helpers.blockchain import RETRY_ERRORS, iter_blocks
+from duniterpy.tools import json_loads
+
+logger = logging.getLogger("duniter/helpers/subscriptions")
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 60.0
+# Number of yielded messages remembered to drop duplicates
+DEFAULT_DEDUPE_WINDOW = 1000
+# Maximum number of missed blocks fetched after a reconnection
+DEFAULT_MAX_GAP = 1000
+
+# Policies of a subscriber with a full queue
+POLICY_BLOCK = "block"
+POLICY_DROP = "drop"
+
+# Closed subscriber queue marker
+_CLOSED = object()
+
+# Errors meaning the websocket connection is lost
+RECONNECT_ERRORS = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    OSError,
+)
+
+
+class Deduplicator:
+    """
+    Remember the last keys seen, to drop duplicated messages
+    """
+
+    def __init__(self, window: int = DEFAULT_DEDUPE_WINDOW) -> None:
+        """
+        Init Deduplicator instance
+
+        :param window: Number of keys remembered (optional, default 1000)
+        """
+        self.window = window
+        self._keys = deque()  # type: Deque[Any]
+        self._seen = set()  # type: Set[Any]
+
+    def seen(self, key: Any) -> bool:
+        """
+        Return True if the key was already seen, else remember it
+
+        :param key: Hashable key of the message
+        :return:
+        """
+        if key in self._seen:
+            return True
+        self._seen.add(key)
+        self._keys.append(key)
+        if len(self._keys) > self.window:
+            self._seen.discard(self._keys.popleft())
+        return False
+
+
+async def ws_messages(
+    client: Union[Client, ClientPool],
+    connect: Callable[[Any], Awaitable[WSConnection]],
+    schema: Optional[dict] = None,
+    backoff: float = DEFAULT_BACKOFF,
+    max_backoff: float = DEFAULT_MAX_BACKOFF,
+    idle_timeout: Optional[float] = None,
+    on_reconnect: Optional[Callable[[], Awaitable[None]]] = None,
+) -> AsyncIterator[Any]:
+    """
+    Yield the json messages of a websocket forever, reconnecting when the connection is lost
+
+    Reconnections are delayed by a jittered exponential backoff, reset
+    when a message is received. Invalid messages are logged and dropped.
+
+    :param client: Client or ClientPool instance
+    :param connect: Websocket connection function, as bma.ws.block
+    :param schema: Json Schema to validate messages (optional, default None)
+    :param backoff: Seconds before the first reconnection (optional, default 1)
+    :param max_backoff: Maximum seconds between reconnections (optional, default 60)
+    :param idle_timeout: Seconds without message before reconnecting (optional, default None)
+    :param on_reconnect: Coroutine function called after each reconnection (optional, default None)
+    :return:
+    """
+    delay = backoff
+    connected = False
+    while True:
+        connection = None  # type: Optional[WSConnection]
+        try:
+            connection = await connect(client)
+            if connected and on_reconnect is not None:
+                await on_reconnect()
+            connected = True
+            while True:
+                try:
+                    data = await connection.receive_str(timeout=idle_timeout)
+                except TypeError as exception:
+                    # the message is not a string, the connection is closed
+                    raise aiohttp.ClientConnectionError(str(exception)) from exception
+                try:
+                    message = json_loads(data)
+                    if schema is not None:
+                        validate(message, schema)
+                except (ValueError, jsonschema.ValidationError) as exception:
+                    logger.warning("Invalid websocket message dropped: %s", exception)
+                    continue
+                delay = backoff
+                yield message
+        except RECONNECT_ERRORS as exception:
+            logger.warning("Websocket connection lost: %s", exception)
+        finally:
+            if connection is not None:
+                await connection.close()
+
+        await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+        delay = min(max_backoff, delay * 2)
+
+
+async def iter_queue(
+    produce: Callable[[Callable[[Any], Awaitable[None]]], Awaitable[None]],
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> AsyncIterator[Any]:
+    """
+    Yield the items put in a bounded queue by the produce coroutine function
+
+    The producer waits when the queue is full, until the consumer catches up.
+    An exception of the producer is raised to the consumer.
+
+    :param produce: Coroutine function called with the async put function
+    :param queue_size: Maximum number of items waiting (optional, default 100)
+    :return:
+    """
+    queue = asyncio.Queue(queue_size)  # type: asyncio.Queue
+
+    async def run() -> None:
+        try:
+            await produce(queue.put)
+        except Exception as exception:  # pylint: disable=broad-except
+            await queue.put(exception)
+
+    task = asyncio.ensure_future(run())
+    try:
+        while True:
+            item = await queue.get()
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        task.cancel()
+
+
+def subscribe_blocks(
+    client: Union[Client, ClientPool],
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    backoff: float = DEFAULT_BACKOFF,
+    max_backoff: float = DEFAULT_MAX_BACKOFF,
+    idle_timeout: Optional[float] = None,
+    max_gap: int = DEFAULT_MAX_GAP,
+    schema: Optional[dict] = ws.WS_BLOCK_SCHEMA,
+) -> AsyncIterator[dict]:
+    """
+    Yield the new blocks json data received on the block websocket, forever
+
+    The websocket is reconnected when lost, then the blocks missed meanwhile
+    are fetched with BMA, up to max_gap blocks. A block already yielded, with
+    the same BlockUID, is dropped. A fork block, with a known number but
+    a new hash, is yielded.
+
+    Usage::
+
+        async for block in subscribe_blocks(client):
+            print(block["number"])
+
+    :param client: Client or ClientPool instance
+    :param queue_size: Maximum number of blocks waiting for the consumer (optional, default 100)
+    :param backoff: Seconds before the first reconnection (optional, default 1)
+    :param max_backoff: Maximum seconds between reconnections (optional, default 60)
+    :param idle_timeout: Seconds without block before reconnecting (optional, default None)
+    :param max_gap: Maximum number of missed blocks fetched (optional, default 1000)
+    :param schema: Json Schema to validate blocks (optional, default WS_BLOCK_SCHEMA)
+    :return:
+    """
+    deduplicator = Deduplicator()
+    last_number = None  # type: Optional[int]
+
+    async def produce(put: Callable[[Any], Awaitable[None]]) -> None:
+        async def put_block(block: dict) -> None:
+            nonlocal last_number
+            if deduplicator.seen(BlockUID(block["number"], block["hash"])):
+                return
+            if last_number is None or block["number"] > last_number:
+                last_number = block["number"]
+            await put(block)
+
+        async def fill_gap(end: int) -> None:
+            if last_number is None or end <= last_number:
+                return
+            start = max(last_number + 1, end - max_gap + 1)
+            logger.info("Fetch missed blocks %d-%d", start, end)
+            try:
+                async for block in iter_blocks(client, start, end):
+                    await put_block(block)
+            except RETRY_ERRORS as exception:
+                logger.warning("Missed blocks %d-%d lost: %s", start, end, exception)
+
+        async def on_reconnect() -> None:
+            try:
+                current = await blockchain.current(client)
+            except RETRY_ERRORS as exception:
+                logger.warning("Current block request failed: %s", exception)
+                return
+            await fill_gap(current["number"])
+
+        messages = ws_messages(
+            client, ws.block, schema, backoff, max_backoff, idle_timeout, on_reconnect
+        )
+        try:
+            async for block in messages:
+                await fill_gap(block["number"] - 1)
+                await put_block(block)
+        finally:
+            await messages.aclose()
+
+    return iter_queue(produce, queue_size)
+
+
+def subscribe_peers(
+    client: Union[Client, ClientPool],
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    backoff: float = DEFAULT_BACKOFF,
+    max_backoff: float = DEFAULT_MAX_BACKOFF,
+    idle_timeout: Optional[float] = None,
+    schema: Optional[dict] = ws.WS_PEER_SCHEMA,
+) -> AsyncIterator[dict]:
+    """
+    Yield the peers json data received on the peer websocket, forever
+
+    The websocket is reconnected when lost. A peer document already yielded,
+    with the same signature, is dropped.
+
+    Usage::
+
+        async for peer in subscribe_peers(client):
+            print(peer["pubkey"])
+
+    :param client: Client or ClientPool instance
+    :param queue_size: Maximum number of peers waiting for the consumer (optional, default 100)
+    :param backoff: Seconds before the first reconnection (optional, default 1)
+    :param max_backoff: Maximum seconds between reconnections (optional, default 60)
+    :param idle_timeout: Seconds without peer before reconnecting (optional, default None)
+    :param schema: Json Schema to validate peers (optional, default WS_PEER_SCHEMA)
+    :return:
+    """
+    deduplicator = Deduplicator()
+
+    async def produce(put: Callable[[Any], Awaitable[None]]) -> None:
+        messages = ws_messages(
+            client, ws.peer, schema, backoff, max_backoff, idle_timeout
+        )
+        try:
+            async for peer in messages:
+                if not deduplicator.seen((peer["pubkey"], peer["signature"])):
+                    await put(peer)
+        finally:
+            await messages.aclose()
+
+    return iter_queue(produce, queue_size)
+
+
+class Subscriber:
+    """
+    Subscriber of a SubscriptionHub upstream websocket, with its own bounded queue
+
+    Messages are shared by all the subscribers of the upstream, they must not be modified.
+
+    Usage::
+
+        async with hub.subscribe(client, "ws/block") as subscriber:
+            async for block in subscriber:
+                print(block["number"])
+    """
+
+    def __init__(
+        self,
+        hub: "SubscriptionHub",
+        key: Tuple[Any, str],
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        policy: str = POLICY_BLOCK,
+    ) -> None:
+        """
+        Init Subscriber instance
+
+        :param hub: SubscriptionHub instance
+        :param key: Upstream key
+        :param queue_size: Maximum number of messages waiting (optional, default 100)
+        :param policy: POLICY_BLOCK to wait for the subscriber when its queue is full,
+            POLICY_DROP to drop the message (optional, default POLICY_BLOCK)
+        """
+        if policy not in (POLICY_BLOCK, POLICY_DROP):
+            raise ValueError("Unknown subscriber policy {0}".format(policy))
+
+        self.hub = hub
+        self.key = key
+        self.policy = policy
+        self.queue = asyncio.Queue(queue_size)  # type: asyncio.Queue
+        self.dropped = 0
+        self.closed = False
+        self._put = None  # type: Optional[asyncio.Future]
+
+    async def put(self, message: Any) -> None:
+        """
+        Put the message in the queue, according to the policy
+
+        :param message: Message
+        :return:
+        """
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            if self.policy == POLICY_DROP:
+                self.dropped += 1
+                return
+            # the put is cancelled if the subscriber is closed meanwhile
+            self._put = asyncio.ensure_future(self.queue.put(message))
+            await asyncio.wait([self._put])
+
+    def fail(self, exception: Exception) -> None:
+        """
+        Close the subscriber, raising the upstream exception to the consumer
+        after the waiting messages
+
+        :param exception: Exception instance
+        :return:
+        """
+        self._close(exception)
+
+    def close(self) -> None:
+        """
+        Unsubscribe, the upstream websocket is closed with its last subscriber
+
+        :return:
+        """
+        self._close(_CLOSED)
+
+    def _close(self, item: Any) -> None:
+        """
+        Unsubscribe and put the last item in the queue
+
+        :param item: Closed marker or exception
+        :return:
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.hub.unsubscribe(self)
+        if self._put is not None:
+            self._put.cancel()
+        self._push(item)
+
+    def _push(self, item: Any) -> None:
+        """
+        Put the item in the queue, dropping the oldest message if it is full
+
+        :param item: Queue item
+        :return:
+        """
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self.queue.get_nowait()
+
+    def __aiter__(self) -> "Subscriber":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self.closed and self.queue.empty():
+            raise StopAsyncIteration
+        message = await self.queue.get()
+        if message is _CLOSED:
+            raise StopAsyncIteration
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+    async def __aenter__(self) -> "Subscriber":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        self.close()
+
+
+class SubscriptionHub:
+    """
+    Share one upstream websocket by endpoint and path between many subscribers
+
+    Each message is received and decoded once, then put in the queue of every subscriber.
+    The upstream websocket is reconnected when lost, and closed with its last subscriber.
+    """
+
+    def __init__(
+        self,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        idle_timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Init SubscriptionHub instance
+
+        :param backoff: Seconds before the first reconnection (optional, default 1)
+        :param max_backoff: Maximum seconds between reconnections (optional, default 60)
+        :param idle_timeout: Seconds without message before reconnecting (optional, default None)
+        """
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idle_timeout = idle_timeout
+
+        self.subscribers = dict()  # type: Dict[Tuple[Any, str], List[Subscriber]]
+        self.upstreams = dict()  # type: Dict[Tuple[Any, str], asyncio.Future]
+
+    def subscribe(
+        self,
+        client: Union[Client, ClientPool],
+        path: str = ws.MODULE + "/block",
+        schema: Optional[dict] = None,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        policy: str = POLICY_BLOCK,
+    ) -> Subscriber:
+        """
+        Return a new subscriber of the websocket path, opening the upstream websocket if needed
+
+        :param client: Client or ClientPool instance
+        :param path: Websocket url path (optional, default "ws/block")
+        :param schema: Json Schema to validate messages, set by the first subscriber
+            (optional, default None)
+        :param queue_size: Maximum number of messages waiting (optional, default 100)
+        :param policy: POLICY_BLOCK or POLICY_DROP (optional, default POLICY_BLOCK)
+        :return:
+        """
+        # Clients of the same endpoint share the upstream
+        key = (client.endpoint if isinstance(client, Client) else client, path)
+        subscriber = Subscriber(self, key, queue_size, policy)
+        self.subscribers.setdefault(key, []).append(subscriber)
+        if key not in self.upstreams:
+            self.upstreams[key] = asyncio.ensure_future(
+                self._upstream(client, key, schema)
+            )
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """
+        Remove the subscriber, closing the upstream websocket without subscribers
+
+        :param subscriber: Subscriber instance
+        :return:
+        """
+        subscribers = self.subscribers.get(subscriber.key, [])
+        if subscriber in subscribers:
+            subscribers.remove(subscriber)
+        if not subscribers:
+            self.subscribers.pop(subscriber.key, None)
+            upstream = self.upstreams.pop(subscriber.key, None)
+            if upstream is not None:
+                upstream.cancel()
+
+    async def _upstream(
+        self,
+        client: Union[Client, ClientPool],
+        key: Tuple[Any, str],
+        schema: Optional[dict],
+    ) -> None:
+        """
+        Receive the upstream websocket messages and put them to the subscribers
+
+        :param client: Client or ClientPool instance
+        :param key: Upstream key
+        :param schema: Json Schema to validate messages
+        :return:
+        """
+
+        async def connect(_client: Union[Client, ClientPool]) -> WSConnection:
+            return await _client.connect_ws(key[1])
+
+        messages = ws_messages(
+            client, connect, schema, self.backoff, self.max_backoff, self.idle_timeout
+        )
+        try:
+            async for message in messages:
+                # copy, subscribers can unsubscribe meanwhile
+                for subscriber in list(self.subscribers.get(key, [])):
+                    await subscriber.put(message)
+        except Exception as exception:  # pylint: disable=broad-except
+            # the upstream is over, a new subscriber opens a new one
+            self.upstreams.pop(key, None)
+            for subscriber in list(self.subscribers.get(key, [])):
+                subscriber.fail(exception)
+        finally:
+            await messages.aclose()
+
+    async def close(self) -> None:
+        """
+        Close all subscribers and upstream websockets
+
+        :return:
+        """
+        for subscribers in list(self.subscribers.values()):
+            for subscriber in list(subscribers):
+                subscriber.close()
+        upstreams = list(self.upstreams.values())
+        self.upstreams.clear()
+        for upstream in upstreams:
+            upstream.cancel()
+        await asyncio.gather(*upstreams, return_exceptions=True)
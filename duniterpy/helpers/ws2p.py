@@ -15,20 +15,92 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import jsonschema
-from typing import Union
+import asyncio
+import itertools
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Union
+
+import aiohttp
+
 from duniterpy.api import ws2p, bma
-from duniterpy.api.client import WSConnection, Client
+from duniterpy.api.client import WSConnection, Client, validate
 from duniterpy.api.endpoint import BMAEndpoint, SecuredBMAEndpoint, WS2PEndpoint
-from duniterpy.documents.ws2p.messages import Connect, Ack, Ok
-from duniterpy.key import SigningKey
+from duniterpy.api.errors import WS2PError
+from duniterpy.documents.ws2p.messages import Connect, Ack, Ok, HandshakeMessage
+from duniterpy.key import SigningKey, get_verifying_key
+from duniterpy.tools import json_loads
 import logging
 
+# Default seconds to wait for a WS2P response
+DEFAULT_REQUEST_TIMEOUT = 30.0
+# Default seconds to open the web socket connection
+DEFAULT_CONNECT_TIMEOUT = 10.0
+# Default seconds to complete the handshake
+DEFAULT_HANDSHAKE_TIMEOUT = 10.0
+# Default number of handshakes at once
+DEFAULT_HANDSHAKE_CONCURRENCY = 100
+# Default maximum number of pushed messages waiting to be read
+DEFAULT_PUSHED_QUEUE_SIZE = 1000
+
+# Closed session marker of the pushed messages queue
+_CLOSED = object()
+
+
+async def receive_str(ws: WSConnection, timeout: Optional[float] = None) -> str:
+    """
+    Wait for a data string from the web socket connection,
+    raise aiohttp.ClientConnectionError if the connection is closed
+
+    :param ws: Web socket connection instance
+    :param timeout: Timeout in seconds (optional, default None)
+    :return:
+    """
+    try:
+        return await ws.receive_str(timeout=timeout)
+    except TypeError as exception:
+        # the message is not a string, the connection is closed
+        raise aiohttp.ClientConnectionError(str(exception)) from exception
+
+
+def verify_handshake_message(document: HandshakeMessage, signature: str) -> None:
+    """
+    Raise ValueError if the signature of the handshake message is not valid
+
+    The verifying key of the remote node is cached.
 
-async def handshake(ws: WSConnection, signing_key: SigningKey, currency: str):
+    :param document: Handshake message document, without signature
+    :param signature: Base64 encoded signature of the message
+    :return:
+    """
+    document.signatures = [signature]
+    if not get_verifying_key(document.pubkey).verify_document(document):
+        raise ValueError("Invalid {0} message signature".format(document.auth))
+
+
+async def handshake(
+    ws: WSConnection,
+    signing_key: SigningKey,
+    currency: str,
+    timeout: Optional[float] = None,
+):
     """
     Perform ws2p handshake on the web socket connection using the signing_key instance
 
+    The timeout is a deadline for the whole handshake: a peer sending other messages
+    than the handshake ones can not hold it forever.
+
+    :param ws: Web socket connection instance
+    :param signing_key: SigningKey instance
+    :param currency: Currency name
+    :param timeout: Seconds to complete the handshake (optional, default None)
+    :return:
+    """
+    await asyncio.wait_for(_handshake(ws, signing_key, currency), timeout)
+
+
+async def _handshake(ws: WSConnection, signing_key: SigningKey, currency: str):
+    """
+    Perform ws2p handshake on the web socket connection, without deadline
+
     :param ws: Web socket connection instance
     :param signing_key: SigningKey instance
     :param currency: Currency name
@@ -48,16 +120,16 @@ async def handshake(ws: WSConnection, signing_key: SigningKey, currency: str):
     # Iterate on each message received...
     while loop:
 
-        data = await ws.receive_json()
+        data = json_loads(await receive_str(ws))
+        auth = data.get("auth") if isinstance(data, dict) else None
 
-        if "auth" in data and data["auth"] == "CONNECT":
-            jsonschema.validate(data, ws2p.network.WS2P_CONNECT_MESSAGE_SCHEMA)
+        if auth == "CONNECT":
+            validate(data, ws2p.network.WS2P_CONNECT_MESSAGE_SCHEMA)
 
             logging.debug("Received a CONNECT message")
 
-            remote_connect_document = Connect(
-                currency, data["pub"], data["challenge"], data["sig"]
-            )
+            remote_connect_document = Connect(currency, data["pub"], data["challenge"])
+            verify_handshake_message(remote_connect_document, data["sig"])
 
             logging.debug("Received CONNECT message signature is valid")
 
@@ -69,13 +141,15 @@ async def handshake(ws: WSConnection, signing_key: SigningKey, currency: str):
             logging.debug("Send ACK message...")
             await ws.send_str(ack_message)
 
-        if "auth" in data and data["auth"] == "ACK":
-            jsonschema.validate(data, ws2p.network.WS2P_ACK_MESSAGE_SCHEMA)
+        if auth == "ACK":
+            validate(data, ws2p.network.WS2P_ACK_MESSAGE_SCHEMA)
 
             logging.debug("Received an ACK message")
 
             # Create ACK document from ACK response to verify signature
-            Ack(currency, data["pub"], connect_document.challenge, data["sig"])
+            verify_handshake_message(
+                Ack(currency, data["pub"], connect_document.challenge), data["sig"]
+            )
 
             logging.debug("Received ACK message signature is valid")
 
@@ -88,19 +162,17 @@ async def handshake(ws: WSConnection, signing_key: SigningKey, currency: str):
             logging.debug("Send OK message...")
             await ws.send_str(ok_message)
 
-        if (
-            remote_connect_document is not None
-            and "auth" in data
-            and data["auth"] == "OK"
-        ):
-            jsonschema.validate(data, ws2p.network.WS2P_OK_MESSAGE_SCHEMA)
+        if remote_connect_document is not None and auth == "OK":
+            validate(data, ws2p.network.WS2P_OK_MESSAGE_SCHEMA)
 
             logging.debug("Received an OK message")
 
-            Ok(
-                currency,
-                remote_connect_document.pubkey,
-                connect_document.challenge,
+            verify_handshake_message(
+                Ok(
+                    currency,
+                    remote_connect_document.pubkey,
+                    connect_document.challenge,
+                ),
                 data["sig"],
             )
 
@@ -128,3 +200,339 @@ async def generate_ws2p_endpoint(
         if endpoint.startswith("WS2P"):
             return WS2PEndpoint.from_inline(endpoint)
     raise ValueError("No WS2P endpoint found")
+
+
+class WS2PSession:
+    """
+    Multiplex WS2P requests on a handshaken web socket connection
+
+    Many requests can be in flight at once, each response is routed to its request by its resId.
+    Messages pushed by the remote node (heads, documents, requests)
+    are put in a separate bounded queue, the oldest are dropped when it is full.
+
+    Usage::
+
+        session = await WS2PSession.connect(client, signing_key, currency)
+        chunks = await asyncio.gather(
+            session.get_blocks(0, 500), session.get_blocks(500, 500)
+        )
+        async for message in session.pushed():
+            print(message)
+        await session.close()
+    """
+
+    def __init__(
+        self,
+        ws: WSConnection,
+        timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        pushed_queue_size: int = DEFAULT_PUSHED_QUEUE_SIZE,
+        validation: bool = True,
+    ) -> None:
+        """
+        Init WS2PSession instance and start reading the connection
+
+        :param ws: Handshaken web socket connection instance
+        :param timeout: Default seconds to wait for a response (optional, default 30)
+        :param pushed_queue_size: Maximum number of pushed messages waiting (optional, default 1000)
+        :param validation: Validate responses with their Json Schema (optional, default True)
+        """
+        self.ws = ws
+        self.timeout = timeout
+        self.validation = validation
+
+        self.pending = dict()  # type: Dict[str, asyncio.Future]
+        self.pushed_queue = asyncio.Queue(pushed_queue_size)  # type: asyncio.Queue
+        self.dropped = 0
+        self.closed = False
+        self._ids = itertools.count()
+        self._reader = asyncio.ensure_future(self._read())
+
+    @classmethod
+    async def connect(
+        cls,
+        client: Client,
+        signing_key: SigningKey,
+        currency: str,
+        timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        pushed_queue_size: int = DEFAULT_PUSHED_QUEUE_SIZE,
+        validation: bool = True,
+        connect_timeout: Optional[float] = DEFAULT_CONNECT_TIMEOUT,
+        handshake_timeout: Optional[float] = DEFAULT_HANDSHAKE_TIMEOUT,
+    ) -> "WS2PSession":
+        """
+        Return a session on a new handshaken web socket connection
+
+        :param client: Client instance of a WS2P endpoint
+        :param signing_key: SigningKey instance
+        :param currency: Currency name
+        :param timeout: Default seconds to wait for a response (optional, default 30)
+        :param pushed_queue_size: Maximum number of pushed messages waiting (optional, default 1000)
+        :param validation: Validate responses with their Json Schema (optional, default True)
+        :param connect_timeout: Seconds to open the connection (optional, default 10)
+        :param handshake_timeout: Seconds to complete the handshake (optional, default 10)
+        :return:
+        """
+        ws = await asyncio.wait_for(client.connect_ws(), connect_timeout)
+        try:
+            await handshake(ws, signing_key, currency, handshake_timeout)
+        except BaseException:
+            await ws.close()
+            raise
+        return cls(ws, timeout, pushed_queue_size, validation)
+
+    def new_request_id(self) -> str:
+        """
+        Return a new request unique id of the session
+
+        :return:
+        """
+        return "{0:08x}".format(next(self._ids) % 0x100000000)
+
+    async def request(
+        self,
+        build: Callable[..., str],
+        *args: Any,
+        schema: Optional[dict] = None,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """
+        Send the request and return the body of its response
+
+        :param build: Request builder of ws2p.requests, as get_blocks
+        :param args: Request parameters
+        :param schema: Json Schema to validate the response (optional, default None)
+        :param timeout: Seconds to wait for the response (optional, default session timeout)
+        :return:
+        """
+        if self.closed:
+            raise aiohttp.ClientConnectionError("WS2P session is closed")
+
+        request_id = self.new_request_id()
+        future = asyncio.get_event_loop().create_future()
+        self.pending[request_id] = future
+        try:
+            await self.ws.send_str(build(request_id, *args))
+            response = await asyncio.wait_for(
+                future, self.timeout if timeout is None else timeout
+            )
+        finally:
+            self.pending.pop(request_id, None)
+
+        if "err" in response:
+            raise WS2PError(request_id, response["err"])
+        if schema is not None and self.validation:
+            validate(response, schema)
+        return response["body"]
+
+    async def get_current(self, timeout: Optional[float] = None) -> dict:
+        """
+        Return the current block of the remote node
+
+        :param timeout: Seconds to wait for the response (optional, default session timeout)
+        :return:
+        """
+        return await self.request(
+            ws2p.requests.get_current,
+            schema=ws2p.requests.BLOCK_RESPONSE_SCHEMA,
+            timeout=timeout,
+        )
+
+    async def get_block(self, number: int, timeout: Optional[float] = None) -> dict:
+        """
+        Return the block number
+
+        :param number: Block number
+        :param timeout: Seconds to wait for the response (optional, default session timeout)
+        :return:
+        """
+        return await self.request(
+            ws2p.requests.get_block,
+            number,
+            schema=ws2p.requests.BLOCK_RESPONSE_SCHEMA,
+            timeout=timeout,
+        )
+
+    async def get_blocks(
+        self, from_number: int, count: int, timeout: Optional[float] = None
+    ) -> list:
+        """
+        Return count blocks from the block from_number
+
+        :param from_number: First block number
+        :param count: Number of blocks
+        :param timeout: Seconds to wait for the response (optional, default session timeout)
+        :return:
+        """
+        return await self.request(
+            ws2p.requests.get_blocks,
+            from_number,
+            count,
+            schema=ws2p.requests.BLOCKS_RESPONSE_SCHEMA,
+            timeout=timeout,
+        )
+
+    async def get_requirements_pending(
+        self, min_cert: int, timeout: Optional[float] = None
+    ) -> dict:
+        """
+        Return the requirements of the pending identities with at least min_cert certifications
+
+        :param min_cert: Minimum number of certifications
+        :param timeout: Seconds to wait for the response (optional, default session timeout)
+        :return:
+        """
+        return await self.request(
+            ws2p.requests.get_requirements_pending,
+            min_cert,
+            schema=ws2p.requests.REQUIREMENTS_RESPONSE_SCHEMA,
+            timeout=timeout,
+        )
+
+    async def pushed(self) -> AsyncIterator[Any]:
+        """
+        Yield the messages pushed by the remote node, until the session is closed
+
+        :return:
+        """
+        while True:
+            message = await self.pushed_queue.get()
+            if message is _CLOSED:
+                # for the other readers
+                self._push(_CLOSED)
+                return
+            yield message
+
+    def _push(self, message: Any) -> None:
+        """
+        Put the message in the pushed queue, dropping the oldest one if it is full
+
+        :param message: Message
+        :return:
+        """
+        while True:
+            try:
+                self.pushed_queue.put_nowait(message)
+                return
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self.pushed_queue.get_nowait()
+
+    async def _read(self) -> None:
+        """
+        Route the received messages to their request or to the pushed queue
+
+        :return:
+        """
+        error = aiohttp.ClientConnectionError("WS2P session is closed")
+        try:
+            while True:
+                data = await receive_str(self.ws)
+                try:
+                    message = json_loads(data)
+                except ValueError as exception:
+                    logging.warning("Invalid WS2P message dropped: %s", exception)
+                    continue
+
+                if isinstance(message, dict) and "resId" in message:
+                    future = self.pending.get(message["resId"])
+                    if future is not None and not future.done():
+                        future.set_result(message)
+                    else:
+                        logging.debug("Unexpected response %s", message["resId"])
+                    continue
+                self._push(message)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as exception:
+            logging.warning("WS2P connection lost: %s", exception)
+            error = aiohttp.ClientConnectionError(
+                "WS2P connection lost: {0}".format(exception)
+            )
+        finally:
+            self.closed = True
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._push(_CLOSED)
+
+    async def wait_closed(self) -> None:
+        """
+        Wait until the session is closed, or its connection lost
+
+        :return:
+        """
+        try:
+            await asyncio.shield(self._reader)
+        except asyncio.CancelledError:
+            # the reader is cancelled by close()
+            if not self._reader.cancelled():
+                raise
+
+    async def close(self) -> None:
+        """
+        Close the session and its web socket connection
+
+        :return:
+        """
+        self._reader.cancel()
+        try:
+            await self._reader
+        except asyncio.CancelledError:
+            pass
+        await self.ws.close()
+
+    async def __aenter__(self) -> "WS2PSession":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+
+async def connect_sessions(
+    clients: Iterable[Client],
+    signing_key: SigningKey,
+    currency: str,
+    timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    validation: bool = True,
+    concurrency: int = DEFAULT_HANDSHAKE_CONCURRENCY,
+    connect_timeout: Optional[float] = DEFAULT_CONNECT_TIMEOUT,
+    handshake_timeout: Optional[float] = DEFAULT_HANDSHAKE_TIMEOUT,
+) -> List[WS2PSession]:
+    """
+    Connect and handshake concurrently with WS2P endpoints, return the sessions which succeeded
+
+    Silent or chatty peers fail on the connect or handshake timeouts.
+
+    :param clients: Client instances of WS2P endpoints
+    :param signing_key: SigningKey instance
+    :param currency: Currency name
+    :param timeout: Default seconds to wait for a response (optional, default 30)
+    :param validation: Validate responses with their Json Schema (optional, default True)
+    :param concurrency: Maximum number of handshakes at once (optional, default 100)
+    :param connect_timeout: Seconds to open a connection (optional, default 10)
+    :param handshake_timeout: Seconds to complete the handshake (optional, default 10)
+    :return:
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def connect(client: Client) -> WS2PSession:
+        async with semaphore:
+            return await WS2PSession.connect(
+                client,
+                signing_key,
+                currency,
+                timeout,
+                validation=validation,
+                connect_timeout=connect_timeout,
+                handshake_timeout=handshake_timeout,
+            )
+
+    clients = list(clients)
+    results = await asyncio.gather(
+        *[connect(client) for client in clients], return_exceptions=True
+    )
+    sessions = []
+    for client, result in zip(clients, results):
+        if isinstance(result, Exception):
+            logging.warning("WS2P connection to %s failed: %s", client.endpoint, result)
+            continue
+        sessions.append(result)
+    return sessions
@@ -0,0 +1,413 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import aiohttp
+import jsonschema
+from aiohttp import ClientSession
+
+from duniterpy.api import bma
+from duniterpy.api.client import Client, create_session
+from duniterpy.api.endpoint import WS2PEndpoint
+from duniterpy.documents.ws2p.heads import HeadV2, parse_heads
+from duniterpy.helpers.ws2p import DEFAULT_REQUEST_TIMEOUT, WS2PSession
+from duniterpy.key import SigningKey
+
+logger = logging.getLogger("duniter/helpers/ws2p_mesh")
+
+# Number of connections kept by the mesh
+DEFAULT_MESH_SIZE = 4
+# Seconds between two checks of the connections
+DEFAULT_CHECK_INTERVAL = 30.0
+# Seconds before connecting again to a failed endpoint, doubled on each failure
+DEFAULT_RECONNECT_DELAY = 5.0
+DEFAULT_MAX_RECONNECT_DELAY = 300.0
+# Seconds between two refreshes of the heads
+DEFAULT_HEADS_INTERVAL = 60.0
+# Free rooms of a candidate over the worst connected peer to rotate it
+DEFAULT_ROTATE_MARGIN = 2
+# Seconds to wait for the requests in flight of a rotated session before closing it
+DEFAULT_DRAIN_TIMEOUT = 30.0
+# Heads verified on the event loop up to this number, on an executor above
+DEFAULT_EXECUTOR_HEADS = 32
+
+# Errors of a connection attempt
+CONNECT_ERRORS = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    OSError,
+    ValueError,
+    jsonschema.ValidationError,
+)
+
+
+class WS2PMesh:
+    """
+    Keep a target number of handshaken WS2P connections to the peers with the most free rooms
+
+    Peers are ranked by the free member or mirror rooms of their HeadV2.
+    Lost connections are replaced, failed endpoints are retried after a growing delay,
+    and the worst connected peer is rotated out when a candidate has more free rooms.
+    The connections are multiplexed sessions, lent to many callers at once: a rotated
+    session is no longer lent, and closed once its requests in flight are answered.
+
+    Usage::
+
+        mesh = WS2PMesh(endpoints, signing_key, currency, heads_client=bma_client)
+        await mesh.start()
+        session = await mesh.acquire()
+        blocks = await session.get_blocks(0, 500)
+        await mesh.close()
+    """
+
+    def __init__(
+        self,
+        endpoints: Iterable[Union[str, WS2PEndpoint]],
+        signing_key: SigningKey,
+        currency: str,
+        size: int = DEFAULT_MESH_SIZE,
+        member: bool = False,
+        heads_client: Optional[Any] = None,
+        heads_interval: float = DEFAULT_HEADS_INTERVAL,
+        check_interval: float = DEFAULT_CHECK_INTERVAL,
+        reconnect_delay: float = DEFAULT_RECONNECT_DELAY,
+        max_reconnect_delay: float = DEFAULT_MAX_RECONNECT_DELAY,
+        rotate_margin: int = DEFAULT_ROTATE_MARGIN,
+        drain_timeout: float = DEFAULT_DRAIN_TIMEOUT,
+        executor: Optional[Executor] = None,
+        session: Optional[ClientSession] = None,
+        proxy: Optional[str] = None,
+        timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        validation: bool = True,
+    ) -> None:
+        """
+        Init WS2PMesh instance
+
+        :param endpoints: WS2P endpoints of the candidate peers
+        :param signing_key: SigningKey instance
+        :param currency: Currency name
+        :param size: Number of connections to keep (optional, default 4)
+        :param member: Rank by free member rooms instead of mirror rooms (optional, default False)
+        :param heads_client: BMA Client or ClientPool to refresh the heads (optional, default None)
+        :param heads_interval: Seconds between heads refreshes (optional, default 60)
+        :param check_interval: Seconds between connections checks (optional, default 30)
+        :param reconnect_delay: Seconds before retrying a failed endpoint (optional, default 5)
+        :param max_reconnect_delay: Maximum seconds before retrying (optional, default 300)
+        :param rotate_margin: Free rooms of a candidate over the worst connected peer
+            to rotate it (optional, default 2)
+        :param drain_timeout: Seconds to wait for the requests in flight of a rotated
+            session before closing it (optional, default 30)
+        :param executor: Executor to verify the heads signatures
+            (optional, default None for the event loop default executor)
+        :param session: Aiohttp client session (optional, default None)
+        :param proxy: Proxy server as hostname:port (optional, default None)
+        :param timeout: Default seconds to wait for a WS2P response (optional, default 30)
+        :param validation: Validate WS2P responses with their Json Schema (optional, default True)
+        """
+        self.endpoints = [
+            WS2PEndpoint.from_inline(_endpoint)
+            if isinstance(_endpoint, str)
+            else _endpoint
+            for _endpoint in endpoints
+        ]  # type: List[WS2PEndpoint]
+        self.signing_key = signing_key
+        self.currency = currency
+        self.size = size
+        self.member = member
+        self.heads_client = heads_client
+        self.heads_interval = heads_interval
+        self.check_interval = check_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.rotate_margin = rotate_margin
+        self.drain_timeout = drain_timeout
+        self.executor = executor
+        self.proxy = proxy
+        self.timeout = timeout
+        self.validation = validation
+
+        self.own_session = session is None
+        self.session = create_session() if session is None else session
+
+        # last known head by ws2pid
+        self.heads = dict()  # type: Dict[str, HeadV2]
+        self.sessions = dict()  # type: Dict[WS2PEndpoint, WS2PSession]
+        # rotated sessions closed when their requests in flight are answered
+        self.draining = dict()  # type: Dict[WS2PEndpoint, WS2PSession]
+        self.failures = dict()  # type: Dict[WS2PEndpoint, int]
+        self.retry_at = dict()  # type: Dict[WS2PEndpoint, float]
+        self._changed = asyncio.Event()
+        self._ready = asyncio.Event()
+        self._tasks = []  # type: List[asyncio.Future]
+
+    def free_room(self, endpoint: WS2PEndpoint) -> int:
+        """
+        Return the free rooms of the peer, -1 if its head is unknown
+
+        :param endpoint: WS2P endpoint
+        :return:
+        """
+        head = self.heads.get(endpoint.ws2pid)
+        if head is None:
+            return -1
+        return head.free_member_room if self.member else head.free_mirror_room
+
+    def update_heads(self, heads: Iterable[HeadV2]) -> None:
+        """
+        Update the peers ranking with their last heads and rotate the worst connected peer
+
+        :param heads: HeadV2 instances
+        :return:
+        """
+        for head in heads:
+            known = self.heads.get(head.ws2pid)
+            if known is None or head.blockstamp.number >= known.blockstamp.number:
+                self.heads[head.ws2pid] = head
+        self.rotate()
+
+    def ranked_endpoints(self) -> List[WS2PEndpoint]:
+        """
+        Return the unconnected endpoints which can be connected, by free rooms
+
+        :return:
+        """
+        now = time.monotonic()
+        candidates = [
+            _endpoint
+            for _endpoint in self.endpoints
+            if _endpoint not in self.sessions
+            and _endpoint not in self.draining
+            and self.retry_at.get(_endpoint, 0) <= now
+        ]
+        # sort is stable, endpoints order is kept between equals
+        return sorted(candidates, key=self.free_room, reverse=True)
+
+    def rotate(self) -> None:
+        """
+        Replace the connection of the worst peer if a candidate has more free rooms
+
+        The session of the worst peer is no longer lent, and closed when its requests
+        in flight are answered.
+
+        :return:
+        """
+        if len(self.sessions) < self.size:
+            # a free slot is filled by the next check
+            self._changed.set()
+            return
+        candidates = self.ranked_endpoints()
+        if not candidates:
+            return
+        worst = min(self.sessions, key=self.free_room)
+        if self.free_room(candidates[0]) >= self.free_room(worst) + self.rotate_margin:
+            logger.info(
+                "Rotate WS2P peer %s for %s", worst.inline(), candidates[0].inline()
+            )
+            session = self.sessions.pop(worst)
+            # do not reconnect at once to a rotated peer
+            self._failed(worst)
+            self.draining[worst] = session
+            self._tasks.append(asyncio.ensure_future(self._drain(worst, session)))
+            self._changed.set()
+
+    async def _drain(self, endpoint: WS2PEndpoint, session: WS2PSession) -> None:
+        """
+        Close the session when its requests in flight are answered, or on drain timeout
+
+        :param endpoint: WS2P endpoint
+        :param session: Rotated session of the endpoint
+        :return:
+        """
+        deadline = time.monotonic() + self.drain_timeout
+        try:
+            while session.pending and not session.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(
+                        "Close WS2P session to %s with %d requests in flight",
+                        endpoint.inline(),
+                        len(session.pending),
+                    )
+                    break
+                await asyncio.wait(list(session.pending.values()), timeout=remaining)
+            await session.close()
+        finally:
+            if self.draining.get(endpoint) is session:
+                del self.draining[endpoint]
+
+    async def start(self) -> None:
+        """
+        Start keeping the connections
+
+        :return:
+        """
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.ensure_future(self._maintain()))
+        if self.heads_client is not None:
+            self._tasks.append(asyncio.ensure_future(self._refresh_heads()))
+
+    async def acquire(self, timeout: Optional[float] = None) -> WS2PSession:
+        """
+        Return the connected session with the fewest requests in flight,
+        waiting for a connection if none is ready
+
+        :param timeout: Seconds to wait for a connection (optional, default None)
+        :return:
+        """
+        if not self._tasks:
+            await self.start()
+        while True:
+            sessions = [
+                session for session in self.sessions.values() if not session.closed
+            ]
+            if sessions:
+                return min(sessions, key=lambda session: len(session.pending))
+            self._ready.clear()
+            await asyncio.wait_for(self._ready.wait(), timeout)
+
+    async def _connect(self, endpoint: WS2PEndpoint) -> None:
+        """
+        Connect and handshake with the endpoint, or delay its next attempt
+
+        :param endpoint: WS2P endpoint
+        :return:
+        """
+        client = Client(endpoint, session=self.session, proxy=self.proxy)
+        try:
+            session = await WS2PSession.connect(
+                client,
+                self.signing_key,
+                self.currency,
+                self.timeout,
+                validation=self.validation,
+            )
+        except CONNECT_ERRORS as exception:
+            self._failed(endpoint)
+            logger.warning(
+                "WS2P connection to %s failed: %s", endpoint.inline(), exception
+            )
+            return
+
+        self.failures.pop(endpoint, None)
+        self.sessions[endpoint] = session
+        self._tasks = [task for task in self._tasks if not task.done()]
+        self._tasks.append(asyncio.ensure_future(self._watch(endpoint, session)))
+        self._ready.set()
+
+    def _failed(self, endpoint: WS2PEndpoint) -> None:
+        """
+        Delay the next connection to the endpoint, more after each failure
+
+        :param endpoint: WS2P endpoint
+        :return:
+        """
+        failures = self.failures.get(endpoint, 0)
+        self.failures[endpoint] = failures + 1
+        self.retry_at[endpoint] = time.monotonic() + min(
+            self.max_reconnect_delay, self.reconnect_delay * 2 ** failures
+        )
+
+    async def _watch(self, endpoint: WS2PEndpoint, session: WS2PSession) -> None:
+        """
+        Replace the session when it is closed
+
+        :param endpoint: WS2P endpoint
+        :param session: Session of the endpoint
+        :return:
+        """
+        await session.wait_closed()
+        if self.sessions.get(endpoint) is session:
+            del self.sessions[endpoint]
+            logger.info("WS2P connection to %s closed", endpoint.inline())
+            # do not reconnect at once to a rotated or lost peer
+            self._failed(endpoint)
+        self._changed.set()
+
+    async def _maintain(self) -> None:
+        """
+        Connect to the best candidates until the mesh is full, on each change or check
+
+        :return:
+        """
+        while True:
+            self._changed.clear()
+            missing = self.size - len(self.sessions)
+            if missing > 0:
+                candidates = self.ranked_endpoints()[:missing]
+                await asyncio.gather(
+                    *[self._connect(_endpoint) for _endpoint in candidates]
+                )
+            if not self._changed.is_set():
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.check_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _refresh_heads(self) -> None:
+        """
+        Refresh the heads from the BMA node periodically
+
+        :return:
+        """
+        while True:
+            try:
+                data = await bma.network.ws2p_heads(self.heads_client)
+            except CONNECT_ERRORS as exception:
+                logger.warning("WS2P heads request failed: %s", exception)
+            else:
+                heads = data["heads"]
+                if len(heads) > DEFAULT_EXECUTOR_HEADS:
+                    # keep the event loop free during the signatures verification
+                    parsed = await asyncio.get_event_loop().run_in_executor(
+                        self.executor, parse_heads, heads
+                    )
+                else:
+                    parsed = parse_heads(heads)
+                self.update_heads(head for head in parsed if isinstance(head, HeadV2))
+            await asyncio.sleep(self.heads_interval)
+
+    async def close(self) -> None:
+        """
+        Close all connections, and the aiohttp session if created by the mesh
+
+        :return:
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        sessions = list(self.sessions.values()) + list(self.draining.values())
+        self.sessions.clear()
+        self.draining.clear()
+        await asyncio.gather(
+            *[session.close() for session in sessions], return_exceptions=True
+        )
+        if self.own_session:
+            await self.session.close()
+
+    async def __aenter__(self) -> "WS2PMesh":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
@@ -0,0 +1,283 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import bisect
+import logging
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+import aiohttp
+import jsonschema
+
+from duniterpy.api import bma
+from duniterpy.api.client import Client
+from duniterpy.api.endpoint import WS2PEndpoint
+from duniterpy.helpers.ws2p import WS2PSession
+
+logger = logging.getLogger("duniter/helpers/ws2p_sync")
+
+# Number of blocks by BLOCKS_CHUNK request
+DEFAULT_WS2P_CHUNK_SIZE = 500
+# Requests in flight by session
+DEFAULT_REQUESTS_PER_SESSION = 2
+# Chunks fetched ahead of the next chunk to yield
+DEFAULT_WINDOW = 16
+# Seconds to wait for a chunk
+DEFAULT_CHUNK_TIMEOUT = 30.0
+# Maximum number of failed requests of a chunk
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Errors of a chunk request, the chunk is requested from another session
+CHUNK_ERRORS = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    ValueError,
+    jsonschema.ValidationError,
+)
+
+
+async def discover_ws2p_endpoints(clients: Iterable[Client]) -> List[WS2PEndpoint]:
+    """
+    Return the WS2P endpoints found in the peering documents of BMA nodes
+
+    Nodes which do not answer are ignored.
+
+    :param clients: Client instances of BMA endpoints
+    :return:
+    """
+    clients = list(clients)
+    results = await asyncio.gather(
+        *[bma.network.peering(client) for client in clients], return_exceptions=True
+    )
+    endpoints = []  # type: List[WS2PEndpoint]
+    for client, result in zip(clients, results):
+        if isinstance(result, Exception):
+            logger.warning("Peering request to %s failed: %s", client.endpoint, result)
+            continue
+        for inline in result["endpoints"]:
+            if not inline.startswith(WS2PEndpoint.API + " "):
+                continue
+            try:
+                endpoint = WS2PEndpoint.from_inline(inline)
+            except ValueError:
+                continue
+            if endpoint not in endpoints:
+                endpoints.append(endpoint)
+    return endpoints
+
+
+def check_chunk(blocks: list, start: int, count: int) -> None:
+    """
+    Raise ValueError if the blocks are not the chained blocks of the chunk
+
+    :param blocks: Blocks json data
+    :param start: First block number
+    :param count: Number of blocks
+    :return:
+    """
+    if [block["number"] for block in blocks] != list(range(start, start + count)):
+        raise ValueError(
+            "Incomplete blocks chunk {0}-{1}".format(start, start + count - 1)
+        )
+    for previous, block in zip(blocks, blocks[1:]):
+        if block.get("previousHash") != previous.get("hash"):
+            raise ValueError("Block {0} is not chained".format(block["number"]))
+
+
+async def sync_blocks(
+    sessions: List[WS2PSession],
+    start: int,
+    end: int,
+    chunk: int = DEFAULT_WS2P_CHUNK_SIZE,
+    requests_per_session: int = DEFAULT_REQUESTS_PER_SESSION,
+    window: int = DEFAULT_WINDOW,
+    timeout: float = DEFAULT_CHUNK_TIMEOUT,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> AsyncIterator[dict]:
+    """
+    Yield blocks json data from start to end included, strictly in order,
+    requesting BLOCKS_CHUNK from many WS2P sessions at once
+
+    Each session pulls the next chunk to fetch when it has a free request slot,
+    so the fastest peers fetch the most chunks. A chunk which fails on a session,
+    on timeout, error or invalid data, is requested from another one.
+    An idle session also requests the next chunk to yield if it is slow to come,
+    the first answer wins. Sessions which lose their connection are left out.
+
+    Usage::
+
+        sessions = await connect_sessions(clients, signing_key, currency)
+        async for block in sync_blocks(sessions, 0, 500000):
+            print(block["number"])
+
+    :param sessions: WS2PSession instances
+    :param start: First block number
+    :param end: Last block number
+    :param chunk: Number of blocks by request (optional, default 500)
+    :param requests_per_session: Requests in flight by session (optional, default 2)
+    :param window: Maximum number of chunks fetched ahead (optional, default 16)
+    :param timeout: Seconds to wait for a chunk (optional, default 30)
+    :param max_attempts: Maximum number of failed requests of a chunk (optional, default 5)
+    :return:
+    """
+    if not sessions:
+        raise ValueError("No WS2P session to sync from")
+
+    # chunks to fetch, sorted
+    todo = list(range(start, end + 1, chunk))
+    # sessions fetching each chunk
+    in_flight = dict()  # type: Dict[int, Set[WS2PSession]]
+    # sessions which failed each chunk
+    failed = dict()  # type: Dict[int, Set[WS2PSession]]
+    attempts = dict()  # type: Dict[int, int]
+    # fetched chunks, with the session they come from
+    done = dict()  # type: Dict[int, Tuple[list, WS2PSession]]
+    condition = asyncio.Condition()
+    next_start = start
+    error = None  # type: Optional[BaseException]
+    workers_left = len(sessions) * requests_per_session
+
+    def live_sessions() -> List[WS2PSession]:
+        return [session for session in sessions if not session.closed]
+
+    def has_failed(session: WS2PSession, chunk_start: int) -> bool:
+        failed_by = failed.get(chunk_start)
+        if not failed_by or session not in failed_by:
+            return False
+        # every live session failed the chunk, try them again
+        if set(live_sessions()) <= failed_by:
+            failed_by.clear()
+            return False
+        return True
+
+    def pick(session: WS2PSession) -> Optional[int]:
+        limit = next_start + window * chunk
+        for chunk_start in todo:
+            if chunk_start >= limit:
+                break
+            if not has_failed(session, chunk_start):
+                todo.remove(chunk_start)
+                return chunk_start
+        # steal the next chunk to yield, at most one extra request
+        fetching = in_flight.get(next_start)
+        if (
+            fetching
+            and len(fetching) == 1
+            and session not in fetching
+            and not has_failed(session, next_start)
+        ):
+            return next_start
+        return None
+
+    def retry(chunk_start: int, session: WS2PSession, exception: BaseException) -> None:
+        nonlocal error
+        logger.warning("Blocks chunk %d failed: %s", chunk_start, exception)
+        attempts[chunk_start] = attempts.get(chunk_start, 0) + 1
+        if attempts[chunk_start] >= max_attempts:
+            error = exception
+            return
+        failed.setdefault(chunk_start, set()).add(session)
+        if (
+            chunk_start not in done
+            and not in_flight.get(chunk_start)
+            and chunk_start not in todo
+        ):
+            bisect.insort(todo, chunk_start)
+
+    async def worker(session: WS2PSession) -> None:
+        nonlocal workers_left
+        try:
+            while error is None and not session.closed:
+                async with condition:
+                    chunk_start = pick(session)
+                    if chunk_start is None:
+                        if next_start > end:
+                            return
+                        await condition.wait()
+                        continue
+                    in_flight.setdefault(chunk_start, set()).add(session)
+
+                count = min(chunk, end - chunk_start + 1)
+                try:
+                    blocks = await session.get_blocks(chunk_start, count, timeout)
+                    check_chunk(blocks, chunk_start, count)
+                except CHUNK_ERRORS as exception:
+                    async with condition:
+                        in_flight[chunk_start].discard(session)
+                        if chunk_start not in done:
+                            retry(chunk_start, session, exception)
+                        condition.notify_all()
+                    continue
+
+                async with condition:
+                    in_flight[chunk_start].discard(session)
+                    if chunk_start >= next_start and chunk_start not in done:
+                        done[chunk_start] = (blocks, session)
+                        todo_index = bisect.bisect_left(todo, chunk_start)
+                        if todo_index < len(todo) and todo[todo_index] == chunk_start:
+                            del todo[todo_index]
+                    condition.notify_all()
+        finally:
+            async with condition:
+                workers_left -= 1
+                condition.notify_all()
+
+    async def watch(session: WS2PSession) -> None:
+        await session.wait_closed()
+        # the chunks failed by the other sessions may be tried again
+        async with condition:
+            condition.notify_all()
+
+    tasks = [
+        asyncio.ensure_future(worker(session))
+        for session in sessions
+        for _ in range(requests_per_session)
+    ] + [asyncio.ensure_future(watch(session)) for session in sessions]
+    previous_hash = None  # type: Optional[str]
+    try:
+        while next_start <= end:
+            async with condition:
+                await condition.wait_for(
+                    lambda: next_start in done or error is not None or workers_left == 0
+                )
+                if next_start not in done:
+                    if error is not None:
+                        raise error
+                    raise aiohttp.ClientConnectionError("No WS2P session left")
+
+                blocks, session = done.pop(next_start)
+                # the chunk must follow the last yielded block
+                if (
+                    previous_hash is not None
+                    and blocks[0].get("previousHash") != previous_hash
+                ):
+                    retry(
+                        next_start,
+                        session,
+                        ValueError("Block {0} is not chained".format(next_start)),
+                    )
+                    condition.notify_all()
+                    continue
+                previous_hash = blocks[-1].get("hash")
+                next_start += chunk
+                condition.notify_all()
+
+            for block in blocks:
+                yield block
+    finally:
+        for task in tasks:
+            task.cancel()
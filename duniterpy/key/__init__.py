@@ -16,6 +16,6 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from .signing_key import SigningKey
-from .verifying_key import VerifyingKey
+from .verifying_key import VerifyingKey, get_verifying_key
 from .encryption_key import SecretKey, PublicKey
 from .ascii_armor import AsciiArmor
@@ -16,6 +16,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import base64
+import functools
 from typing import Any
 
 import libnacl.sign
@@ -25,6 +26,9 @@ from duniterpy.documents import Document
 from duniterpy.documents.block import Block
 from .base58 import Base58Encoder
 
+# Maximum number of instances cached by get_verifying_key()
+VERIFYING_KEYS_CACHE_SIZE = 4096
+
 
 class VerifyingKey(libnacl.sign.Verifier):
     """
@@ -86,3 +90,16 @@ class VerifyingKey(libnacl.sign.Verifier):
         :return:
         """
         return self.verify(data)
+
+
+@functools.lru_cache(maxsize=VERIFYING_KEYS_CACHE_SIZE)
+def get_verifying_key(pubkey: str) -> VerifyingKey:
+    """
+    Return the VerifyingKey instance of the pubkey, from a cache of the last ones used
+
+    Decoding the base58 pubkey and building the key is paid once by pubkey.
+
+    :param pubkey: Base58 public key
+    :return:
+    """
+    return VerifyingKey(pubkey)
@@ -15,10 +15,20 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import json
 import uuid
-from typing import Union
+from importlib import import_module
+from typing import Union, Any, Optional
 from libnacl.encode import hex_decode, hex_encode
 
+# JSON backends, by order of preference
+JSON_BACKENDS = ("orjson", "ujson", "json")
+
+# current JSON backend name and functions, see set_json_backend()
+_json_backend = "json"
+_json_loads = json.loads
+_json_dumps = json.dumps
+
 
 def ensure_bytes(data: Union[str, bytes]) -> bytes:
     """
@@ -87,3 +97,73 @@ def get_ws2p_challenge() -> str:
     :rtype str:
     """
     return str(uuid.uuid4()) + str(uuid.uuid4())
+
+
+def set_json_backend(name: Optional[str] = None) -> str:
+    """
+    Select the JSON backend used to encode and decode API messages and documents
+
+    Without name, the fastest installed backend in JSON_BACKENDS is selected,
+    the standard library json module being the fallback.
+
+    :param name: Backend name in JSON_BACKENDS (optional, default None)
+    :rtype str: The selected backend name
+    """
+    global _json_backend, _json_loads, _json_dumps  # pylint: disable=global-statement
+
+    if name is not None and name not in JSON_BACKENDS:
+        raise ValueError("Unknown JSON backend {0}".format(name))
+
+    for backend in JSON_BACKENDS if name is None else (name,):
+        try:
+            module = import_module(backend)
+        except ImportError:
+            if name is not None:
+                raise
+            continue
+
+        if backend == "orjson":
+            # orjson encodes to bytes
+            def _orjson_dumps(data: Any, _dumps=module.dumps) -> str:
+                return _dumps(data).decode("utf-8")
+
+            _json_dumps = _orjson_dumps
+        else:
+            _json_dumps = module.dumps
+        _json_loads = module.loads
+        _json_backend = backend
+        break
+
+    return _json_backend
+
+
+def get_json_backend() -> str:
+    """
+    Return the name of the JSON backend in use
+
+    :rtype str:
+    """
+    return _json_backend
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """
+    Decode JSON data with the selected backend
+
+    :param data: JSON string or bytes
+    :return:
+    """
+    return _json_loads(data)
+
+
+def json_dumps(data: Any) -> str:
+    """
+    Encode data in a JSON string with the selected backend
+
+    :param data: Data to encode
+    :rtype str:
+    """
+    return _json_dumps(data)
+
+
+set_json_backend()
@@ -0,0 +1,121 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest
+
+from duniterpy.api.bma import blockchain
+from duniterpy.api.block_store import BlockStore
+from duniterpy.api.client import Client, VALIDATION_OFF
+from duniterpy.api.endpoint import BMAEndpoint
+from tests.api.webserver import WebFunctionalSetupMixin, web
+
+
+def make_chain(length: int, fork: str = "") -> list:
+    """
+    Return a chain of minimal blocks json data
+    """
+    return [
+        {
+            "number": number,
+            "hash": "HASH%d%s" % (number, fork),
+            "previousHash": "HASH%d%s" % (number - 1, fork) if number else None,
+        }
+        for number in range(length)
+    ]
+
+
+class TestBlockStore(unittest.TestCase):
+    def setUp(self):
+        self.store = BlockStore(":memory:", fork_window=5)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_fork_window(self):
+        self.store.put_many(make_chain(20))
+        self.assertEqual(self.store.head(), 19)
+        # deep blocks are served
+        self.assertEqual(self.store.get(3)["hash"], "HASH3")
+        # blocks in the fork window are served if chained to their successor
+        self.assertEqual(self.store.get(18)["hash"], "HASH18")
+        # head has no successor to verify it
+        self.assertIsNone(self.store.get(19))
+        self.assertEqual(len(self.store.get_range(0, 19)), 19)
+        self.assertIsNone(self.store.get_range(0, 20))
+        self.assertIsNone(self.store.get(25))
+
+    def test_fork(self):
+        self.store.put_many(make_chain(20))
+        fork = make_chain(20, "F")
+        # block 18 of the fork does not chain to stored block 17
+        self.store.put(dict(fork[18], previousHash="HASH17"))
+        self.assertIsNone(self.store.get(19))
+        self.assertEqual(self.store.get(17)["hash"], "HASH17")
+
+        self.store.put(fork[17])
+        # stored block 16 is not chained to the fork block 17
+        self.assertIsNone(self.store.get(16))
+        self.assertEqual(self.store.head(), 17)
+
+    def test_missing_blocks(self):
+        chain = make_chain(20)
+        self.store.put_many(chain[:5] + chain[6:])
+        self.assertIsNone(self.store.get_range(0, 10))
+        self.assertEqual(len(self.store.get_range(6, 4)), 4)
+
+
+class TestClientBlockStore(WebFunctionalSetupMixin, unittest.TestCase):
+    def test_block_store(self):
+        chain = make_chain(300)
+        requests = []
+
+        async def handler(request):
+            await request.read()
+            requests.append(request.path)
+            count = int(request.match_info["count"])
+            start = int(request.match_info["start"])
+            return web.json_response(chain[start : start + count])
+
+        async def go():
+            _, port, _ = await self.create_server(
+                "GET", "/blockchain/blocks/{count}/{start}", handler
+            )
+            store = BlockStore(":memory:")
+            # current block of the network
+            store.set_head(299)
+            client = Client(
+                BMAEndpoint("127.0.0.1", "", "", port),
+                validation=VALIDATION_OFF,
+                block_store=store,
+            )
+            blocks = await client(blockchain.blocks, 100, 0)
+            self.assertEqual(len(blocks), 100)
+            self.assertEqual(len(requests), 1)
+
+            blocks = await client(blockchain.blocks, 100, 0)
+            self.assertEqual(blocks, chain[:100])
+            self.assertEqual(len(requests), 1)
+
+            # blocks in the fork window are not chained yet
+            await client(blockchain.blocks, 100, 200)
+            await client(blockchain.blocks, 100, 200)
+            self.assertEqual(len(requests), 3)
+
+            await client.close()
+            store.close()
+
+        self.loop.run_until_complete(go())
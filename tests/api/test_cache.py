@@ -0,0 +1,188 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import unittest
+
+import aiohttp
+
+from duniterpy.api.cache import DEFAULT_HEIGHT_TTL, ResponseCache, estimate_size
+from duniterpy.api.client import Client
+from duniterpy.api.endpoint import BMAEndpoint
+from tests.api.webserver import WebFunctionalSetupMixin, web
+
+
+class FakeBlockWS:
+    """
+    Block web socket sending the given blocks, then closed
+    """
+
+    def __init__(self, numbers):
+        self.numbers = list(numbers)
+        self.closed = False
+
+    async def receive_json(self):
+        await asyncio.sleep(0)
+        if not self.numbers:
+            raise TypeError("Received message is not a text message")
+        number = self.numbers.pop(0)
+        return {"number": number, "hash": "HASH%d" % number}
+
+    async def close(self):
+        self.closed = True
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_rules(self):
+        cache = ResponseCache()
+        self.assertIsNotNone(cache.rule("blockchain/block/10"))
+        self.assertIsNotNone(cache.rule("/blockchain/parameters"))
+        self.assertIsNotNone(cache.rule("tx/sources/pubkey"))
+        self.assertIsNone(cache.rule("blockchain/blocks/10/0"))
+        self.assertIsNone(cache.rule("node/summary"))
+
+        cache.put(("node/summary",), {"a": 1}, "node/summary")
+        self.assertEqual(len(cache.entries), 0)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2)
+        for number in range(3):
+            path = "blockchain/block/%d" % number
+            cache.put((path,), {"number": number}, path)
+            # keep block 0 recently used
+            cache.get(("blockchain/block/0",))
+
+        self.assertIsNotNone(cache.get(("blockchain/block/0",)))
+        self.assertIsNone(cache.get(("blockchain/block/1",)))
+        self.assertIsNotNone(cache.get(("blockchain/block/2",)))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_memory_bound(self):
+        value = {"hash": "A" * 1000}
+        cache = ResponseCache(max_size=estimate_size(value) * 2)
+        for number in range(3):
+            path = "blockchain/block/%d" % number
+            cache.put((path,), value, path)
+        self.assertEqual(len(cache.entries), 2)
+        self.assertLessEqual(cache.size, cache.max_size)
+
+        cache.put(("blockchain/block/3",), {"hash": "A" * 10000}, "blockchain/block/3")
+        self.assertIsNone(cache.get(("blockchain/block/3",)))
+
+    def test_new_block(self):
+        cache = ResponseCache()
+        cache.put(("blockchain/current",), {"number": 1}, "blockchain/current")
+        cache.put(("blockchain/block/1",), {"number": 1}, "blockchain/block/1")
+        cache.new_block(2, "HASH2")
+        self.assertIsNone(cache.get(("blockchain/current",)))
+        self.assertIsNotNone(cache.get(("blockchain/block/1",)))
+
+        # same block
+        cache.put(("blockchain/current",), {"number": 2}, "blockchain/current")
+        cache.new_block(2, "HASH2")
+        self.assertIsNotNone(cache.get(("blockchain/current",)))
+        # fork replacing the block at the same height
+        cache.new_block(2, "FORK2")
+        self.assertIsNone(cache.get(("blockchain/current",)))
+
+        # response requested before the new block is not stored
+        generation = cache.generation
+        cache.new_block(3, "HASH3")
+        cache.put(
+            ("blockchain/current",), {"number": 2}, "blockchain/current", generation
+        )
+        self.assertIsNone(cache.get(("blockchain/current",)))
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 3)
+
+    def test_height_ttl(self):
+        cache = ResponseCache()
+        for path in ("blockchain/current", "tx/sources/pubkey", "wot/requirements/uid"):
+            _, ttl, height_dependent = cache.rule(path)
+            self.assertTrue(height_dependent)
+            self.assertEqual(ttl, DEFAULT_HEIGHT_TTL)
+        cache.put(("blockchain/current",), {"number": 1}, "blockchain/current")
+        self.assertIsNotNone(cache.entries[("blockchain/current",)].expires)
+
+    def test_ttl(self):
+        cache = ResponseCache(rules=[("^node/summary$", -1, False)])
+        cache.put(("node/summary",), {}, "node/summary")
+        self.assertIsNone(cache.get(("node/summary",)))
+        self.assertEqual(cache.size, 0)
+
+
+class TestClientCache(WebFunctionalSetupMixin, unittest.TestCase):
+    def test_client_cache(self):
+        requests = []
+
+        async def handler(request):
+            await request.read()
+            requests.append(request.path)
+            return web.json_response({"currency": "g1", "number": len(requests)})
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/blockchain/current", handler)
+            cache = ResponseCache()
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port), cache=cache)
+
+            first = await client.get("blockchain/current")
+            first["number"] = 42
+            second = await client.get("blockchain/current")
+            self.assertEqual(second["number"], 1)
+            self.assertEqual(len(requests), 1)
+
+            cache.new_block(2, "HASH2")
+            third = await client.get("blockchain/current")
+            self.assertEqual(third["number"], 2)
+            self.assertEqual(len(requests), 2)
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_watch(self):
+        async def go():
+            cache = ResponseCache()
+            ws = FakeBlockWS([1, 2])
+            await cache.watch(ws)
+            self.assertEqual(cache.block_number, 2)
+            self.assertTrue(ws.closed)
+            # blocks may be missed after the connection loss
+            cache.put(("blockchain/current",), {"number": 2}, "blockchain/current")
+            generation = cache.generation
+            connections = [aiohttp.ClientConnectionError(), FakeBlockWS([3])]
+            received = asyncio.Event()
+
+            async def connect():
+                connection = connections.pop(0)
+                if isinstance(connection, Exception):
+                    raise connection
+                received.set()
+                return connection
+
+            task = asyncio.ensure_future(
+                cache.watch(FakeBlockWS([]), connect, backoff=0.001)
+            )
+            await asyncio.wait_for(received.wait(), 1)
+            while cache.block_number != 3:
+                await asyncio.sleep(0.001)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            self.assertEqual(connections, [])
+            self.assertIsNone(cache.get(("blockchain/current",)))
+            self.assertGreater(cache.generation, generation)
+
+        self.loop.run_until_complete(go())
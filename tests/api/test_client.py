@@ -0,0 +1,195 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import unittest
+from unittest import mock
+
+import jsonschema
+
+from duniterpy.api import client as client_module
+from duniterpy.api.client import (
+    Client,
+    get_ssl_context,
+    get_validator,
+    validate,
+    RESPONSE_TEXT,
+    VALIDATION_OFF,
+    VALIDATION_SAMPLED,
+)
+from duniterpy.api.endpoint import BMAEndpoint
+from tests.api.webserver import WebFunctionalSetupMixin, web
+
+
+class TestValidators(unittest.TestCase):
+    def test_validator_compiled_once(self):
+        schema = {"type": "object", "required": ["ucode"]}
+        self.assertIs(get_validator(schema), get_validator(schema))
+
+    def test_validate(self):
+        schema = {"type": "object", "required": ["ucode"]}
+        validate({"ucode": 1}, schema)
+        with self.assertRaises(jsonschema.ValidationError):
+            validate({}, schema)
+
+    def test_invalid_schema(self):
+        with self.assertRaises(jsonschema.SchemaError):
+            get_validator({"type": 12})
+
+
+class TestClient(WebFunctionalSetupMixin, unittest.TestCase):
+    def test_connection_pool_settings(self):
+        async def go():
+            client = Client(
+                BMAEndpoint("127.0.0.1", "", "", 9092),
+                limit=50,
+                limit_per_host=5,
+                keepalive_timeout=60,
+            )
+            connector = client.session.connector
+            self.assertEqual(connector.limit, 50)
+            self.assertEqual(connector.limit_per_host, 5)
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_shared_ssl_context(self):
+        self.assertIs(get_ssl_context(), get_ssl_context())
+
+    def test_connection_handler_reused(self):
+        async def handler(request):
+            await request.read()
+            return web.json_response({"content_type": request.content_type})
+
+        async def go():
+            self.app.router.add_route("POST", "/", handler)
+            _, port, _ = await self.create_server("GET", "/node/summary", handler)
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+            connection_handler = client.connection_handler
+
+            response = await client.query("{ node { version } }")
+            self.assertEqual(response["content_type"], "application/json")
+            # json content type must not leak in the next requests
+            response = await client.get("node/summary")
+            self.assertEqual(response["content_type"], "application/octet-stream")
+
+            self.assertIs(client.connection_handler, connection_handler)
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_get_decodes_json_once(self):
+        async def handler(request):
+            await request.read()
+            return web.json_response({"ucode": 1, "message": "ok"})
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/node/summary", handler)
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+            with mock.patch.object(
+                client_module, "json_loads", wraps=client_module.json_loads
+            ) as json_loads:
+                response = await client.get(
+                    "node/summary", schema=client_module.ERROR_SCHEMA
+                )
+                self.assertEqual(response, {"ucode": 1, "message": "ok"})
+                self.assertEqual(json_loads.call_count, 1)
+
+                response = await client.get(
+                    "node/summary",
+                    rtype=RESPONSE_TEXT,
+                    schema=client_module.ERROR_SCHEMA,
+                )
+                self.assertIsInstance(response, str)
+                self.assertEqual(json_loads.call_count, 2)
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_validation_policy(self):
+        async def handler(request):
+            await request.read()
+            return web.json_response({})
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/node/summary", handler)
+            schema = client_module.ERROR_SCHEMA
+
+            client = Client(
+                BMAEndpoint("127.0.0.1", "", "", port), validation=VALIDATION_OFF
+            )
+            self.assertEqual(await client.get("node/summary", schema=schema), {})
+            await client.close()
+
+            client = Client(
+                BMAEndpoint("127.0.0.1", "", "", port),
+                validation=VALIDATION_SAMPLED,
+                validation_sample_rate=3,
+            )
+            sampled = [client.validation_schema(schema) is schema for _ in range(6)]
+            self.assertEqual(sampled, [True, False, False, True, False, False])
+            with self.assertRaises(jsonschema.ValidationError):
+                await client.get("node/summary", schema=schema)
+            await client.close()
+
+            with self.assertRaises(ValueError):
+                Client(BMAEndpoint("127.0.0.1", "", "", port), validation="never")
+
+        self.loop.run_until_complete(go())
+
+    def test_coalesce(self):
+        requests = []
+
+        async def handler(request):
+            await request.read()
+            requests.append(request.path)
+            await asyncio.sleep(0.1)
+            return web.json_response({"ucode": 1, "message": "ok"})
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/node/summary", handler)
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port), coalesce=True)
+            responses = await asyncio.gather(
+                *[
+                    client.get("node/summary", schema=client_module.ERROR_SCHEMA)
+                    for _ in range(10)
+                ]
+            )
+            self.assertEqual(len(requests), 1)
+            self.assertEqual(responses, [{"ucode": 1, "message": "ok"}] * 10)
+            # each caller has its own copy
+            self.assertEqual(len(set(id(response) for response in responses)), 10)
+
+            # the first caller modifies its result before the others resume
+            async def modify():
+                response = await client.get("node/summary")
+                response["ucode"] = 2
+                return response
+
+            first, other = await asyncio.gather(modify(), client.get("node/summary"))
+            self.assertEqual(len(requests), 2)
+            self.assertEqual(first["ucode"], 2)
+            self.assertEqual(other, {"ucode": 1, "message": "ok"})
+
+            # requests with other parameters are not coalesced
+            await asyncio.gather(
+                client.get("node/summary"), client.get("node/summary", {"a": 1})
+            )
+            self.assertEqual(len(requests), 4)
+            await client.close()
+
+        self.loop.run_until_complete(go())
@@ -76,3 +76,44 @@ class TestEndpoint(unittest.TestCase):
         self.assertEqual(gvasub_endpoint.path, "gva")
 
         assert gvasub_endpoint.inline(), endpoint_str
+
+    def test_endpoint(self):
+        bmas = endpoint.endpoint("BMAS g1.duniter.org 443 /bma")
+        self.assertIsInstance(bmas, endpoint.SecuredBMAEndpoint)
+        self.assertEqual(bmas.path, "/bma")
+        self.assertIsInstance(
+            endpoint.endpoint("GVASUB S g1.duniter.org 443 gva"),
+            endpoint.GVASUBEndpoint,
+        )
+        self.assertIsInstance(
+            endpoint.endpoint("GVA S g1.duniter.org 443 gva"), endpoint.GVAEndpoint
+        )
+        unknown = endpoint.endpoint("WS2PTOR 3eaab4c7 xyz.onion 20901")
+        self.assertIsInstance(unknown, endpoint.UnknownEndpoint)
+        self.assertEqual(unknown.properties, ["3eaab4c7", "xyz.onion", "20901"])
+        self.assertIsInstance(endpoint.endpoint("BMAS"), endpoint.UnknownEndpoint)
+
+        with self.assertRaises(endpoint.MalformedDocumentError):
+            endpoint.endpoint("BMAS not an endpoint")
+        with self.assertRaises(endpoint.MalformedDocumentError):
+            endpoint.endpoint("")
+        with self.assertRaises(TypeError):
+            endpoint.endpoint(443)
+
+        # Endpoint instances are returned as is
+        self.assertIs(endpoint.endpoint(bmas), bmas)
+
+    def test_endpoint_cache(self):
+        first = endpoint.endpoint("BMAS g1.duniter.org 443")
+        first.port = 80
+        second = endpoint.endpoint("BMAS g1.duniter.org 443")
+        # each call returns a copy of the cached endpoint
+        self.assertIsNot(first, second)
+        self.assertEqual(second.port, 443)
+
+        unknown = endpoint.endpoint("WS2PTOR 3eaab4c7 xyz.onion 20901")
+        unknown.properties.append("path")
+        self.assertEqual(
+            endpoint.endpoint("WS2PTOR 3eaab4c7 xyz.onion 20901").properties,
+            ["3eaab4c7", "xyz.onion", "20901"],
+        )
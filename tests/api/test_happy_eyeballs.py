@@ -0,0 +1,125 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+import time
+import unittest
+
+import aiohttp
+
+from duniterpy.api.client import Client, VALIDATION_OFF
+from duniterpy.api.endpoint import BMAEndpoint
+from duniterpy.api.happy_eyeballs import HappyEyeballs, interleave, race_connections
+from tests.api.webserver import WebFunctionalSetupMixin, web, find_unused_port
+
+
+class TestHappyEyeballs(WebFunctionalSetupMixin, unittest.TestCase):
+    async def handler_host(self, request):
+        await request.read()
+        return web.json_response({"host": request.host})
+
+    def test_interleave(self):
+        self.assertEqual(
+            interleave(["1.1.1.1", "2.2.2.2", "::1", "::2", "::3"]),
+            ["::1", "1.1.1.1", "::2", "2.2.2.2", "::3"],
+        )
+
+    def test_race_connections(self):
+        async def go():
+            # the server listens on IPv4 only
+            _, port, _ = await self.create_server("GET", "/", self.handler_host)
+            start = time.monotonic()
+            host = await race_connections(["::1", "127.0.0.1"], port, stagger=5)
+            self.assertEqual(host, "127.0.0.1")
+            # a failed attempt starts the next one without waiting for the stagger
+            self.assertLess(time.monotonic() - start, 5)
+
+            with self.assertRaises(OSError):
+                await race_connections(["::1", "127.0.0.1"], find_unused_port())
+
+        self.loop.run_until_complete(go())
+
+    def test_race_connections_closed(self):
+        received = []
+
+        async def handler(reader, writer):
+            # read until the probe connection is closed by the client
+            received.append(await reader.read())
+            writer.close()
+
+        async def go():
+            server = await asyncio.start_server(handler, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            self.assertEqual(await race_connections(["127.0.0.1"], port), "127.0.0.1")
+            for _ in range(100):
+                if received:
+                    break
+                await asyncio.sleep(0.01)
+            # a single probe connection, closed without data
+            self.assertEqual(received, [b""])
+            server.close()
+            await server.wait_closed()
+
+        self.loop.run_until_complete(go())
+
+    def test_client_without_domain_name(self):
+        async def go():
+            _, port, _ = await self.create_server("GET", "/", self.handler_host)
+            _endpoint = BMAEndpoint(None, "127.0.0.1", "::1", port)
+
+            # IPv6 address is used by default
+            client = Client(_endpoint, validation=VALIDATION_OFF)
+            with self.assertRaises(aiohttp.ClientConnectorError):
+                await client.get("/")
+            await client.close()
+
+            happy_eyeballs = HappyEyeballs(stagger=5)
+            client = Client(
+                _endpoint, validation=VALIDATION_OFF, happy_eyeballs=happy_eyeballs
+            )
+            self.assertEqual(await client.get("/"), {"host": "127.0.0.1:%d" % port})
+            # the winner is remembered
+            self.assertEqual(
+                happy_eyeballs.winner(["::1", "127.0.0.1"], port), "127.0.0.1"
+            )
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_client_with_domain_name(self):
+        async def go():
+            _, port, _ = await self.create_server("GET", "/", self.handler_host)
+            happy_eyeballs = HappyEyeballs(stagger=5)
+            client = Client(
+                BMAEndpoint("node.invalid", "127.0.0.1", "::1", port),
+                validation=VALIDATION_OFF,
+                happy_eyeballs=happy_eyeballs,
+            )
+            # the domain name is kept in urls, connections use the winner address
+            self.assertEqual(await client.get("/"), {"host": "node.invalid:%d" % port})
+            self.assertEqual(
+                happy_eyeballs.winner(["::1", "127.0.0.1"], port), "127.0.0.1"
+            )
+
+            results = await happy_eyeballs.resolve("node.invalid", port, 0)
+            self.assertEqual(
+                [result["host"] for result in results], ["127.0.0.1", "::1"]
+            )
+            with self.assertRaises(OSError):
+                await happy_eyeballs.resolve("other.invalid", port, 0)
+            await client.close()
+
+        self.loop.run_until_complete(go())
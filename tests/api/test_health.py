@@ -0,0 +1,247 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+import time
+import unittest
+
+from duniterpy.api.client import VALIDATION_OFF
+from duniterpy.api.endpoint import BMAEndpoint
+from duniterpy.api.errors import CircuitOpenError
+from duniterpy.api.health import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+    HealthMonitor,
+)
+from duniterpy.api.pool import ClientPool
+from tests.api.webserver import WebFunctionalSetupMixin, web, find_unused_port
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout=0.05, half_open_successes=2
+        )
+        breaker.failure()
+        self.assertEqual(breaker.state, CIRCUIT_CLOSED)
+        breaker.failure()
+        self.assertEqual(breaker.state, CIRCUIT_OPEN)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, CIRCUIT_HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        # a failed half-open request opens the circuit again
+        breaker.failure()
+        self.assertEqual(breaker.state, CIRCUIT_OPEN)
+
+        time.sleep(0.06)
+        breaker.success()
+        self.assertEqual(breaker.state, CIRCUIT_HALF_OPEN)
+        breaker.success()
+        self.assertEqual(breaker.state, CIRCUIT_CLOSED)
+
+    def test_half_open_trials(self):
+        breaker = CircuitBreaker(
+            failure_threshold=1, reset_timeout=0.05, half_open_successes=2
+        )
+        breaker.failure()
+        self.assertFalse(breaker.acquire())
+
+        time.sleep(0.06)
+        # only half_open_successes trial requests are let through
+        self.assertTrue(breaker.acquire())
+        self.assertTrue(breaker.acquire())
+        self.assertFalse(breaker.allow())
+        self.assertFalse(breaker.acquire())
+        breaker.success()
+        self.assertFalse(breaker.acquire())
+        breaker.success()
+        self.assertEqual(breaker.state, CIRCUIT_CLOSED)
+        self.assertTrue(breaker.acquire())
+        self.assertTrue(breaker.acquire())
+
+        # trial requests without result are allowed again after reset_timeout
+        breaker.failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.acquire())
+        breaker.success()
+        self.assertTrue(breaker.acquire())
+        self.assertFalse(breaker.acquire())
+        time.sleep(0.06)
+        self.assertTrue(breaker.acquire())
+        self.assertFalse(breaker.acquire())
+        breaker.success()
+        self.assertEqual(breaker.state, CIRCUIT_CLOSED)
+
+
+class TestHealthMonitor(WebFunctionalSetupMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        # node on 127.0.0.1 is in sync, node on localhost is late
+        self.blocks = {"127.0.0.1": (100, 5000), "localhost": (90, 4000)}
+        self.requests = []
+        # nodes without current block yet
+        self.syncing = set()
+
+    async def summary_handler(self, request):
+        await request.read()
+        return web.json_response(
+            {"duniter": {"software": "duniter", "version": "1.8.1"}}
+        )
+
+    async def current_handler(self, request):
+        await request.read()
+        host = request.host.split(":")[0]
+        if host in self.syncing:
+            return web.json_response(
+                {"ucode": 2010, "message": "No current block"}, status=404
+            )
+        number, median_time = self.blocks[host]
+        return web.json_response({"number": number, "medianTime": median_time})
+
+    async def block_handler(self, request):
+        await request.read()
+        self.requests.append(request.host.split(":")[0])
+        return web.json_response({"number": int(request.match_info["number"])})
+
+    async def create_nodes(self):
+        self.app.router.add_route("GET", "/node/summary", self.summary_handler)
+        self.app.router.add_route(
+            "GET", "/blockchain/block/{number}", self.block_handler
+        )
+        _, port, _ = await self.create_server(
+            "GET", "/blockchain/current", self.current_handler
+        )
+        self.endpoint_sync = BMAEndpoint("127.0.0.1", None, None, port)
+        self.endpoint_late = BMAEndpoint("localhost", None, None, port)
+        self.endpoint_down = BMAEndpoint("127.0.0.1", None, None, find_unused_port())
+
+    def test_probe_all(self):
+        async def go():
+            await self.create_nodes()
+            monitor = HealthMonitor(
+                [
+                    self.endpoint_down.inline(),
+                    self.endpoint_late,
+                    self.endpoint_sync,
+                ],
+                timeout=1,
+                failure_threshold=1,
+                validation=VALIDATION_OFF,
+            )
+            await monitor.probe_all()
+
+            node = monitor.health(self.endpoint_sync)
+            self.assertEqual(node.version, "1.8.1")
+            self.assertEqual(node.block_number, 100)
+            self.assertIsNotNone(node.latency)
+            late = monitor.health(self.endpoint_late)
+            self.assertEqual(monitor.network_block_number, 100)
+            self.assertEqual((node.lag, node.time_lag), (0, 0))
+            self.assertEqual((late.lag, late.time_lag), (10, 1000))
+
+            down = monitor.health(self.endpoint_down)
+            self.assertIsNotNone(down.error)
+            self.assertFalse(down.available)
+            with self.assertRaises(CircuitOpenError):
+                monitor.check(self.endpoint_down)
+            monitor.check(self.endpoint_sync)
+
+            # open circuits are not probed
+            probe = down.last_probe
+            await monitor.probe_all()
+            self.assertEqual(down.last_probe, probe)
+
+            # late node last
+            self.assertEqual(
+                monitor.ranked_endpoints(), [self.endpoint_sync, self.endpoint_late]
+            )
+            self.assertEqual(
+                set(monitor.ranked_endpoints(max_lag=10)),
+                {self.endpoint_sync, self.endpoint_late},
+            )
+            await monitor.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_probe_duniter_error(self):
+        async def go():
+            await self.create_nodes()
+            self.syncing.add("localhost")
+            monitor = HealthMonitor(
+                [self.endpoint_sync, self.endpoint_late],
+                interval=0.01,
+                timeout=1,
+                failure_threshold=2,
+                validation=VALIDATION_OFF,
+            )
+            async with monitor:
+                late = monitor.health(self.endpoint_late)
+                while late.breaker.failures < 2:
+                    await asyncio.sleep(0.01)
+                # the node error is a probe failure, the monitor keeps probing
+                self.assertEqual(late.error.ucode, 2010)
+                self.assertFalse(late.available)
+                self.assertFalse(monitor._task.done())
+                probe = monitor.health(self.endpoint_sync).last_probe
+                while monitor.health(self.endpoint_sync).last_probe == probe:
+                    await asyncio.sleep(0.01)
+                self.assertEqual(monitor.network_block_number, 100)
+
+        self.loop.run_until_complete(go())
+
+    def test_pool(self):
+        async def go():
+            await self.create_nodes()
+            monitor = HealthMonitor(
+                [self.endpoint_sync, self.endpoint_late, self.endpoint_down],
+                timeout=1,
+                failure_threshold=1,
+                validation=VALIDATION_OFF,
+            )
+            async with monitor:
+                while monitor.health(self.endpoint_sync).last_probe is None:
+                    await asyncio.sleep(0.01)
+                self.assertEqual(monitor.health(self.endpoint_late).lag, 10)
+
+                pool = ClientPool(
+                    [self.endpoint_down, self.endpoint_late, self.endpoint_sync],
+                    health_monitor=monitor,
+                    validation=VALIDATION_OFF,
+                )
+                # the dead node is skipped without waiting for a timeout
+                start = time.monotonic()
+                self.assertEqual(await pool.get("blockchain/block/1"), {"number": 1})
+                self.assertLess(time.monotonic() - start, 1)
+                # the late node comes last, even without latency measure
+                self.assertEqual(self.requests, ["127.0.0.1"])
+                self.assertNotIn(
+                    self.endpoint_down,
+                    [client.endpoint for client in pool.ranked_clients()],
+                )
+
+                # every circuit open: fail fast
+                for endpoint in (self.endpoint_sync, self.endpoint_late):
+                    for _ in range(3):
+                        monitor.failure(endpoint)
+                with self.assertRaises(CircuitOpenError):
+                    await pool.get("blockchain/block/1")
+                await pool.close()
+
+        self.loop.run_until_complete(go())
@@ -0,0 +1,217 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import time
+import unittest
+
+import aiohttp
+
+from duniterpy.api import bma
+from duniterpy.api.endpoint import BMAEndpoint
+from duniterpy.api.pool import ClientPool, EndpointStats
+from duniterpy.documents.peer import Peer
+from tests.api.webserver import WebFunctionalSetupMixin, web, find_unused_port
+
+
+class TestEndpointStats(unittest.TestCase):
+    def test_moving_averages(self):
+        stats = EndpointStats(smoothing_factor=0.5)
+        self.assertEqual(stats.score(), 0.0)
+        stats.success(1.0)
+        stats.success(2.0)
+        self.assertEqual(stats.latency, 1.5)
+        self.assertEqual(stats.error_rate, 0.0)
+        stats.failure()
+        self.assertEqual(stats.error_rate, 0.5)
+        self.assertEqual(stats.consecutive_errors, 1)
+        self.assertEqual(stats.score(), 1.5 * 6)
+
+    def test_percentile(self):
+        stats = EndpointStats()
+        stats.success(1.0)
+        self.assertIsNone(stats.percentile(95))
+        for latency in range(2, 101):
+            stats.success(float(latency))
+        self.assertEqual(stats.percentile(50), 51.0)
+        self.assertEqual(stats.percentile(95), 95.0)
+        self.assertEqual(stats.percentile(100), 100.0)
+
+
+class TestClientPool(WebFunctionalSetupMixin, unittest.TestCase):
+    def test_unsupported_endpoints(self):
+        async def go():
+            with self.assertRaises(ValueError):
+                ClientPool(["WS2P 3eaab4c7 g1.duniter.org 20900"])
+            pool = ClientPool(
+                [
+                    "BASIC_MERKLED_API g1.duniter.org 80",
+                    "BASIC_MERKLED_API g1.duniter.org 80",
+                    "WS2P 3eaab4c7 g1.duniter.org 20900",
+                    "BMAS g1.duniter.org 443",
+                ]
+            )
+            self.assertEqual(len(pool.clients), 2)
+            await pool.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_from_peers(self):
+        peer = Peer.from_signed_raw(
+            """Version: 10
+Type: Peer
+Currency: g1
+PublicKey: 8Fi1VSTbjkXguwThF4v2ZxC5whK7pwG2vcGTkPUPjPGU
+Block: 8-1922C324ABC4AF7EF7656734A31F5197888DDD52
+Endpoints:
+BASIC_MERKLED_API some.dns.name 88.77.66.55 2001:42d0:52:a00::648 9001
+BMAS some.dns.name 443
+WS2P 3eaab4c7 g1.duniter.org 20900
+ZyHKXvH2ACkOGZW3hCOOtEG0OCVDtjJ8cbZ5tRBqQbwqcmkDn5NWu2w0hDYPVwRGlOC7HXXa4KlVERsWJMyHBg==
+"""
+        )
+
+        async def go():
+            pool = ClientPool.from_peers([peer])
+            self.assertEqual(len(pool.clients), 2)
+            await pool.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_failover(self):
+        async def handler(request):
+            await request.read()
+            return web.json_response({"ucode": 1, "message": "ok"})
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/node/summary", handler)
+            dead = BMAEndpoint("127.0.0.1", "", "", find_unused_port())
+            alive = BMAEndpoint("127.0.0.1", "", "", port)
+            pool = ClientPool([dead, alive], max_consecutive_errors=1)
+
+            response = await pool.get("node/summary")
+            self.assertEqual(response["ucode"], 1)
+            self.assertEqual(pool.stats[dead].errors, 1)
+            self.assertEqual(pool.stats[alive].requests, 1)
+            # dead endpoint is now last
+            self.assertEqual(pool.ranked_clients()[0].endpoint, alive)
+
+            response = await pool.get("node/summary")
+            self.assertEqual(pool.stats[dead].requests, 1)
+            self.assertEqual(pool.stats[alive].requests, 2)
+            await pool.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_post_failover(self):
+        requests = []
+
+        async def handler(request):
+            await request.read()
+            requests.append(request.host)
+            if len(requests) > 1:
+                await asyncio.sleep(0.5)
+            return web.json_response({"ucode": len(requests), "message": "ok"})
+
+        async def go():
+            _, port, _ = await self.create_server("POST", "/tx/process", handler)
+            dead = BMAEndpoint("127.0.0.1", "", "", find_unused_port())
+            pool = ClientPool(
+                [
+                    dead,
+                    BMAEndpoint("127.0.0.1", "", "", port),
+                    BMAEndpoint("localhost", "", "", port),
+                ]
+            )
+            # not sent to the dead endpoint, sent to the next one
+            response = await pool.post("tx/process", {"transaction": "TX"})
+            self.assertEqual(response["ucode"], 1)
+            self.assertEqual(pool.stats[dead].errors, 1)
+
+            # sent but timed out, never sent again
+            with self.assertRaises(asyncio.TimeoutError):
+                await pool.post(
+                    "tx/process",
+                    {"transaction": "TX"},
+                    timeout=aiohttp.ClientTimeout(total=0.1),
+                )
+            self.assertEqual(len(requests), 2)
+            await pool.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_all_endpoints_failing(self):
+        async def go():
+            pool = ClientPool(
+                [
+                    BMAEndpoint("127.0.0.1", "", "", find_unused_port()),
+                    BMAEndpoint("127.0.0.1", "", "", find_unused_port()),
+                ]
+            )
+            with self.assertRaises(Exception):
+                await pool(bma.node.summary)
+            for stats in pool.stats.values():
+                self.assertEqual(stats.errors, 1)
+            await pool.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_latency_routing(self):
+        async def go():
+            fast = BMAEndpoint("127.0.0.1", "", "", 9001)
+            slow = BMAEndpoint("127.0.0.1", "", "", 9002)
+            pool = ClientPool([slow, fast])
+            pool.stats[slow].success(1.0)
+            pool.stats[fast].success(0.1)
+            self.assertEqual(
+                [client.endpoint for client in pool.ranked_clients()], [fast, slow]
+            )
+            await pool.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_hedged_request(self):
+        requests = []
+
+        async def handler(request):
+            await request.read()
+            requests.append(request.host)
+            if len(requests) == 1:
+                # straggler
+                await asyncio.sleep(2)
+            return web.json_response({"ucode": len(requests), "message": "ok"})
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/node/summary", handler)
+            pool = ClientPool(
+                [
+                    BMAEndpoint("127.0.0.1", "", "", port),
+                    BMAEndpoint("localhost", "", "", port),
+                ],
+                hedge=True,
+                hedge_delay=0.1,
+                hedge_paths=["node/"],
+            )
+            start = time.monotonic()
+            response = await pool.get("node/summary")
+            self.assertLess(time.monotonic() - start, 1)
+            self.assertEqual(response["ucode"], 2)
+            self.assertEqual(pool.hedged_requests, 1)
+            self.assertEqual(len(requests), 2)
+            await pool.close()
+
+        self.loop.run_until_complete(go())
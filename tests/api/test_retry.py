@@ -0,0 +1,138 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+import unittest
+
+import aiohttp
+
+from duniterpy.api.client import Client
+from duniterpy.api.endpoint import BMAEndpoint
+from duniterpy.api.retry import RetryPolicy
+from tests.api.webserver import WebFunctionalSetupMixin, web
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        try:
+            self.loop.stop()
+            self.loop.close()
+        finally:
+            asyncio.set_event_loop(None)
+
+    def test_delay(self):
+        retry_policy = RetryPolicy(backoff=1, max_backoff=3)
+        for attempt in range(5):
+            delay = retry_policy.delay(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(3, 2 ** attempt))
+
+    def test_retries(self):
+        calls = []
+
+        async def request():
+            calls.append(1)
+            if len(calls) < 3:
+                raise aiohttp.ServerDisconnectedError()
+            return "ok"
+
+        async def failing_request():
+            calls.append(1)
+            raise ValueError("not retried")
+
+        async def go():
+            retry_policy = RetryPolicy(max_retries=2, backoff=0.01)
+            self.assertEqual(await retry_policy.call(request), "ok")
+            self.assertEqual(len(calls), 3)
+            self.assertEqual(retry_policy.retries, 2)
+
+            calls.clear()
+            with self.assertRaises(ValueError):
+                await retry_policy.call(failing_request)
+            self.assertEqual(len(calls), 1)
+
+        self.loop.run_until_complete(go())
+
+    def test_budget(self):
+        calls = []
+
+        async def request():
+            calls.append(1)
+            raise asyncio.TimeoutError()
+
+        async def go():
+            retry_policy = RetryPolicy(
+                max_retries=5, backoff=0.001, budget_ratio=0.5, budget_min=2
+            )
+            with self.assertRaises(asyncio.TimeoutError):
+                await retry_policy.call(request)
+            # the budget allows only 2 retries
+            self.assertEqual(len(calls), 3)
+
+            calls.clear()
+            with self.assertRaises(asyncio.TimeoutError):
+                await retry_policy.call(request)
+            # the request deposit is not a whole retry
+            self.assertEqual(len(calls), 1)
+
+            calls.clear()
+            with self.assertRaises(asyncio.TimeoutError):
+                await retry_policy.call(request)
+            self.assertEqual(len(calls), 2)
+
+        self.loop.run_until_complete(go())
+
+
+class TestClientRetry(WebFunctionalSetupMixin, unittest.TestCase):
+    def test_timeout_retry(self):
+        calls = []
+
+        async def handler(request):
+            await request.read()
+            calls.append(1)
+            if len(calls) == 1:
+                await asyncio.sleep(0.5)
+            return web.json_response({"ucode": 1, "message": "ok"})
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/node/summary", handler)
+            client = Client(
+                BMAEndpoint("127.0.0.1", "", "", port),
+                timeout=aiohttp.ClientTimeout(total=0.1),
+            )
+            with self.assertRaises(asyncio.TimeoutError):
+                await client.get("node/summary")
+
+            calls.clear()
+            response = await client.get(
+                "node/summary", retry_policy=RetryPolicy(backoff=0.01)
+            )
+            self.assertEqual(response["ucode"], 1)
+            self.assertEqual(len(calls), 2)
+
+            calls.clear()
+            response = await client.get(
+                "node/summary", timeout=aiohttp.ClientTimeout(total=1)
+            )
+            self.assertEqual(response["ucode"], 1)
+            self.assertEqual(len(calls), 1)
+            await client.close()
+
+        self.loop.run_until_complete(go())
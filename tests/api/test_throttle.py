@@ -0,0 +1,123 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import time
+import unittest
+
+from duniterpy.api.client import Client
+from duniterpy.api.endpoint import BMAEndpoint
+from duniterpy.api.errors import ThrottledError, HTTP_LIMITATION
+from duniterpy.api.throttle import RateLimiter, parse_retry_after
+from tests.api.webserver import WebFunctionalSetupMixin, web
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        try:
+            self.loop.stop()
+            self.loop.close()
+        finally:
+            asyncio.set_event_loop(None)
+
+    def test_rate(self):
+        async def go():
+            rate_limiter = RateLimiter(rate=20, burst=2)
+            start = time.monotonic()
+            for _ in range(6):
+                async with rate_limiter:
+                    pass
+            # 2 requests in burst, then 4 at 20 requests per second
+            self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+        self.loop.run_until_complete(go())
+
+    def test_max_in_flight(self):
+        in_flight = []
+
+        async def go():
+            rate_limiter = RateLimiter(max_in_flight=2)
+
+            async def request():
+                async with rate_limiter:
+                    in_flight.append(rate_limiter.in_flight)
+                    await asyncio.sleep(0.01)
+
+            tasks = [asyncio.ensure_future(request()) for _ in range(5)]
+            await asyncio.sleep(0)
+            self.assertEqual(rate_limiter.queue_depth, 3)
+            await asyncio.gather(*tasks)
+            self.assertEqual(max(in_flight), 2)
+            self.assertEqual(rate_limiter.queue_depth, 0)
+            self.assertEqual(rate_limiter.in_flight, 0)
+
+        self.loop.run_until_complete(go())
+
+    def test_backoff(self):
+        rate_limiter = RateLimiter(backoff=1, max_backoff=3)
+        self.assertEqual(rate_limiter.throttled(), 1)
+        self.assertEqual(rate_limiter.throttled(), 2)
+        self.assertEqual(rate_limiter.throttled(), 3)
+        self.assertEqual(rate_limiter.throttled(0.5), 0.5)
+        rate_limiter.success()
+        self.assertEqual(rate_limiter.throttled(), 1)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("2"), 2.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+
+
+class TestClientThrottling(WebFunctionalSetupMixin, unittest.TestCase):
+    def test_throttled_requests(self):
+        answers = []
+
+        async def handler(request):
+            await request.read()
+            if len(answers) == 0:
+                answers.append(429)
+                return web.Response(status=429, headers={"Retry-After": "0.1"})
+            if len(answers) == 1:
+                answers.append(400)
+                return web.json_response(
+                    {"ucode": HTTP_LIMITATION, "message": "quota"}, status=400
+                )
+            answers.append(200)
+            return web.json_response({"ucode": 1, "message": "ok"})
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/node/summary", handler)
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+            client.rate_limiter.backoff = client.rate_limiter.current_backoff = 0.1
+            start = time.monotonic()
+            response = await client.get("node/summary")
+            self.assertEqual(response["ucode"], 1)
+            self.assertEqual(answers, [429, 400, 200])
+            self.assertGreaterEqual(time.monotonic() - start, 0.2)
+            await client.close()
+
+            answers.clear()
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port), throttle_retries=0)
+            with self.assertRaises(ThrottledError):
+                await client.get("node/summary")
+            await client.close()
+
+        self.loop.run_until_complete(go())
@@ -19,6 +19,7 @@ import unittest
 
 from duniterpy.documents.block import Block
 from duniterpy.documents.block_uid import BlockUID, block_uid
+from duniterpy.documents.document import MalformedDocumentError
 
 raw_block = """Version: 11
 Type: Block
@@ -289,6 +290,56 @@ WnJvw204wccmSBQK9UE2rCFw0EG34zf+b58n2KTLwSIhTpgmGsnr5ohkSyYZYcLEKjisLXKNCmMl7D1Q
 """
 
 
+def bma_json(block):
+    """
+    Return the json data of the block, as served by BMA
+    """
+    return {
+        "version": block.version,
+        "currency": block.currency,
+        "nonce": block.nonce,
+        "number": block.number,
+        "powMin": block.powmin,
+        "time": block.time,
+        "medianTime": block.mediantime,
+        "dividend": block.ud,
+        "unitbase": block.unit_base,
+        "issuer": block.issuer,
+        "issuersFrame": block.issuers_frame,
+        "issuersFrameVar": block.issuers_frame_var,
+        "issuersCount": block.different_issuers_count,
+        "previousHash": block.prev_hash,
+        "previousIssuer": block.prev_issuer,
+        "parameters": ":".join(block.parameters) if block.parameters else "",
+        "membersCount": block.members_count,
+        "hash": block.proof_of_work(),
+        "inner_hash": block.inner_hash,
+        "identities": [identity.inline() for identity in block.identities],
+        "joiners": [joiner.inline() for joiner in block.joiners],
+        "actives": [active.inline() for active in block.actives],
+        "leavers": [leaver.inline() for leaver in block.leavers],
+        "revoked": [revocation.inline() for revocation in block.revoked],
+        "excluded": block.excluded,
+        "certifications": [cert.inline() for cert in block.certifications],
+        "transactions": [
+            {
+                "version": tx.version,
+                "currency": tx.currency,
+                "blockstamp": str(tx.blockstamp),
+                "locktime": tx.locktime,
+                "issuers": tx.issuers,
+                "inputs": [source.inline() for source in tx.inputs],
+                "unlocks": [unlock.inline() for unlock in tx.unlocks],
+                "outputs": [output.inline() for output in tx.outputs],
+                "comment": tx.comment,
+                "signatures": tx.signatures,
+            }
+            for tx in block.transactions
+        ],
+        "signature": block.signatures[0],
+    }
+
+
 class TestBlock(unittest.TestCase):
     def test_fromraw(self):
         block = Block.from_signed_raw(raw_block)
@@ -495,6 +546,44 @@ class TestBlock(unittest.TestCase):
         from_rendered_raw = block.from_signed_raw(rendered_raw)
         self.assertEqual(from_rendered_raw.signed_raw(), raw_block_with_excluded)
 
+    def test_parse_sections_order(self):
+        # missing Leavers section
+        raw = raw_block_with_excluded.replace("Leavers:\n", "")
+        with self.assertRaises(MalformedDocumentError):
+            Block.from_signed_raw(raw)
+        # block without sections
+        raw = raw_block.replace(
+            raw_block[raw_block.index("Identities:") : raw_block.index("InnerHash")],
+            "",
+        )
+        block = Block.from_signed_raw(raw)
+        self.assertEqual(block.transactions, [])
+        with self.assertRaises(MalformedDocumentError):
+            Block.from_signed_raw(
+                raw.replace("InnerHash", "Certifications:\nInnerHash")
+            )
+
+    def test_from_bma_json(self):
+        for raw in (
+            raw_block,
+            raw_block_with_tx,
+            raw_block_zero,
+            raw_block_with_leavers,
+            raw_block_with_excluded,
+            negative_issuers_frame_var,
+        ):
+            block = Block.from_signed_raw(raw)
+            from_json = Block.from_bma_json(bma_json(block))
+            self.assertEqual(from_json.signed_raw(), raw)
+            self.assertEqual(from_json, block)
+            self.assertEqual(from_json.parameters, block.parameters)
+            self.assertEqual(from_json.transactions, block.transactions)
+
+        data = bma_json(Block.from_signed_raw(raw_block))
+        del data["issuersCount"]
+        with self.assertRaises(MalformedDocumentError):
+            Block.from_bma_json(data)
+
     def test_parse_negative_issuers_frame_var(self):
         block = Block.from_signed_raw(negative_issuers_frame_var)
         rendered_raw = block.signed_raw()
@@ -17,7 +17,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import unittest
 import pypeg2
 from duniterpy.grammars import output
-from duniterpy.documents import BlockUID
+from duniterpy.documents import BlockUID, MalformedDocumentError
 from duniterpy.documents.transaction import (
     Transaction,
     reduce_base,
@@ -404,6 +404,67 @@ class TestTransaction(unittest.TestCase):
         o = OutputSource.from_inline(output_source_str)
         self.assertEqual(o.inline_condition(), output_source_str.split(":")[2])
 
+    def test_outputsource_condition_from_text(self):
+        condition = "SIG(HsLShAtzXTVxeUtQd7yi5Z5Zh4zNvbu8sTEZ53nfKcqY)"
+        parsed = pypeg2.parse(condition, output.Condition)
+        first = OutputSource.condition_from_text(condition)
+        second = OutputSource.condition_from_text(condition)
+        self.assertEqual(first, parsed)
+        self.assertEqual(vars(first.left), vars(parsed.left))
+        self.assertEqual(vars(first.left.pubkey), vars(parsed.left.pubkey))
+        self.assertEqual(pypeg2.compose(first, output.Condition), condition)
+        # cached conditions are returned as distinct copies
+        self.assertIsNot(first, second)
+        first.left.pubkey = "DSz4rgncXCytsUMW2JU2yhLquZECD2XpEkpP9gG5HyAx"
+        self.assertEqual(OutputSource.condition_from_text(condition), parsed)
+
+    def test_from_compact_lines(self):
+        lines = ["Transactions:\n"] + tx_compact.splitlines(True) + ["InnerHash: \n"]
+        transaction, end = Transaction.from_compact_lines("gtest", lines, 1)
+        self.assertEqual(end, len(lines) - 1)
+        self.assertEqual(transaction, Transaction.from_compact("gtest", tx_compact))
+        with self.assertRaises(MalformedDocumentError):
+            Transaction.from_compact_lines("gtest", lines[:-4], 1)
+
+    def test_from_bma_json(self):
+        tx_data = {
+            "version": 10,
+            "locktime": 0,
+            "blockstamp": "13410-000041DF0CCA173F09B5FBA48F619D4BC934F12ADF1D0B798639EB2149C4A8CC",
+            "blockstampTime": 1510043526,
+            "issuers": ["D8BsQZN9hangHVuqwD6McfxM1xvGJ8DPuPYrswwnSif3"],
+            "inputs": [
+                "1500:1:T:0D0264F324BC4A23C4B2C696CD1907BD6E70FD1F409BB1D42E84847AA4C1E87C:0"
+            ],
+            "outputs": [
+                "1500:1:(XHX(8AFC8DF633FC158F9DB4864ABED696C1AA0FE5D617A7B5F7AB8DE7CA2EFCD4CB) && \
+SIG(36j6pCNzKDPo92m7UXJLFpgDbcLFAZBgThD2TCwTwGrd)) || (SIG(D8BsQZN9hangHVuqwD6McfxM1xvGJ8DPuPYrswwnSif3) && \
+SIG(36j6pCNzKDPo92m7UXJLFpgDbcLFAZBgThD2TCwTwGrd))"
+            ],
+            "unlocks": ["0:SIG(0)"],
+            "signatures": [
+                "eNAZpJjhZaPKbx5pUvuDDM1j4XNWJ4ABK48ouTvimvg3ceIcoZUvgLHmXuSwk2bgxZaB5qSKP9H6T7qsBcLtBg=="
+            ],
+            "comment": "META tic to toc",
+            "hash": "80FE1E83DC4D0B722CA5F8363EFC6A3E29071032EBB71C1E0DF8D4FEA589C698",
+            "time": 1510045123,
+            "block_number": 13412,
+        }
+        tx = Transaction.from_bma_history("gtest", tx_data)
+        self.assertEqual(tx.signed_raw(), tx_from_compact_change)
+        self.assertEqual(tx.time, 1510045123)
+        # same type as when parsed from a signed raw document
+        self.assertEqual(tx.locktime, "0")
+
+        tx_data["currency"] = "gtest"
+        tx_json = Transaction.from_bma_json(tx_data)
+        self.assertEqual(tx_json.locktime, 0)
+        self.assertEqual(tx_json.signed_raw(), tx.signed_raw())
+
+        del tx_data["comment"]
+        with self.assertRaises(MalformedDocumentError):
+            Transaction.from_bma_json(tx_data)
+
     def test_transaction_equality(self):
         t1 = Transaction.from_signed_raw(tx_raw)
         t2 = Transaction.from_signed_raw(tx_raw)
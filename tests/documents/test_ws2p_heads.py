@@ -15,9 +15,19 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import base64
 import unittest
-
-from duniterpy.documents.ws2p.heads import HeadV0, HeadV1, HeadV2, BlockUID
+from concurrent.futures import ThreadPoolExecutor
+
+from duniterpy.documents.ws2p.heads import (
+    HeadV0,
+    HeadV1,
+    HeadV2,
+    BlockUID,
+    parse_head,
+    parse_heads,
+)
+from duniterpy.key import SigningKey
 
 headv1_clear = ""
 
@@ -88,3 +98,72 @@ class TestWS2PHeads(unittest.TestCase):
         new_inline = headv2.inline()
 
         assert inline == new_inline
+
+    def test_parse_head(self):
+        for head_class, inline in (
+            (
+                HeadV0,
+                "WS2P:HEAD:3dnbnYY9i2bHMQUGyFp5GVvJ2wBkVpus31cDJA5cfRpj:54813-00000A24802B33B71A91B6E990038C145A4815A45C71E57B2F2EF393183C7E2C",
+            ),
+            (
+                HeadV1,
+                "WS2P:HEAD:1:HbTqJ1Ts3RhJ8Rx4XkNyh1oSKmoZL1kY5U7t9mKTSjAB:102131-0000066028B991BDFE3FF6DBA84EF519F76B62EA3787BC29D9A05557675B1F16:1152e46e:duniter:1.6.21-beta:1",
+            ),
+            (
+                HeadV2,
+                "WS2POCAIC:HEAD:2:D3krfq6J9AmfpKnS3gQVYoy7NzGCc61vokteTS8LJ4YH:99393-0000017256006BFA979565F1280488D5831DD66054069E46A3EDEB1AECDBBF13:cb36b021:duniter:1.6.21:1:20:19",
+            ),
+        ):
+            head = parse_head(inline, "SIGNATURE")
+            self.assertIs(type(head), head_class)
+            self.assertEqual(head, head_class.from_inline(inline, "SIGNATURE")[0])
+
+    def test_parse_heads(self):
+        def signed_head(signing_key, ws2pid, number, forged=False):
+            inline = (
+                "WS2POCA:HEAD:2:{0}:{1}-{2:064X}:{3}:duniter:1.8.1:1:{4}:10".format(
+                    signing_key.pubkey, number, number, ws2pid, number % 100
+                )
+            )
+            signature = base64.b64encode(
+                signing_key.signature(inline.encode("ascii"))
+            ).decode("ascii")
+            if forged:
+                inline = inline[:-2] + "99"
+            return {
+                "message": "WS2P:HEAD:bad",
+                "sig": "bad",
+                "messageV2": inline,
+                "sigV2": signature,
+                "step": 0,
+            }
+
+        node_key = SigningKey.from_seedhex("00" * 32)
+        other_key = SigningKey.from_seedhex("01" * 32)
+        batch = [
+            signed_head(node_key, "aaaaaaaa", 10),
+            signed_head(node_key, "aaaaaaaa", 12),
+            signed_head(node_key, "aaaaaaaa", 11),
+            # same node, other ws2pid
+            signed_head(node_key, "bbbbbbbb", 5),
+            # newest head is forged, the previous one is kept
+            signed_head(other_key, "aaaaaaaa", 20),
+            signed_head(other_key, "aaaaaaaa", 21, forged=True),
+            {"message": "malformed", "sig": "bad"},
+        ]
+
+        for executor in (None, ThreadPoolExecutor(2)):
+            heads = parse_heads(batch, executor=executor, chunk_size=1)
+            self.assertEqual(
+                [(head.pubkey, head.ws2pid, head.blockstamp.number) for head in heads],
+                [
+                    (node_key.pubkey, "aaaaaaaa", 12),
+                    (node_key.pubkey, "bbbbbbbb", 5),
+                    (other_key.pubkey, "aaaaaaaa", 20),
+                ],
+            )
+            if executor is not None:
+                executor.shutdown()
+
+        heads = parse_heads(batch, verify=False)
+        self.assertEqual(heads[2].blockstamp.number, 21)
@@ -0,0 +1,111 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest
+
+from duniterpy.api.client import Client, VALIDATION_OFF
+from duniterpy.api.endpoint import BMAEndpoint
+from duniterpy.api.pool import ClientPool
+from duniterpy.helpers.blockchain import iter_blocks
+from tests.api.webserver import WebFunctionalSetupMixin, web
+
+
+class TestIterBlocks(WebFunctionalSetupMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.chain = [
+            {"number": number, "hash": "HASH%d" % number} for number in range(1000)
+        ]
+        self.requests = []
+        self.failures = set()
+
+    async def blocks_handler(self, request):
+        await request.read()
+        count = int(request.match_info["count"])
+        start = int(request.match_info["start"])
+        self.requests.append((request.host, start))
+        if start in self.failures:
+            self.failures.remove(start)
+            return web.Response(status=500, text="Internal error")
+        return web.json_response(self.chain[start : start + count])
+
+    def test_iter_blocks(self):
+        async def go():
+            _, port, _ = await self.create_server(
+                "GET", "/blockchain/blocks/{count}/{start}", self.blocks_handler
+            )
+            client = Client(
+                BMAEndpoint("127.0.0.1", "", "", port), validation=VALIDATION_OFF
+            )
+            # first chunk fails once
+            self.failures.add(10)
+            numbers = [
+                block["number"]
+                async for block in iter_blocks(
+                    client, 10, 994, chunk=100, concurrency=3
+                )
+            ]
+            self.assertEqual(numbers, list(range(10, 995)))
+            self.assertEqual(len(self.requests), 11)
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_iter_blocks_pool(self):
+        async def go():
+            _, port, _ = await self.create_server(
+                "GET", "/blockchain/blocks/{count}/{start}", self.blocks_handler
+            )
+            pool = ClientPool(
+                [
+                    BMAEndpoint("127.0.0.1", "", "", port),
+                    BMAEndpoint("localhost", "", "", port),
+                ],
+                validation=VALIDATION_OFF,
+            )
+            # first chunk fails once, the pool fails over without chunk retry
+            self.failures.add(0)
+            numbers = [
+                block["number"]
+                async for block in iter_blocks(pool, 0, 999, chunk=100, max_retries=0)
+            ]
+            self.assertEqual(numbers, list(range(1000)))
+            self.assertEqual(
+                len(set(host for host, start in self.requests if start == 0)), 2
+            )
+            # requests recorded in the pool stats
+            stats = pool.stats.values()
+            self.assertEqual(sum(stat.requests for stat in stats), len(self.requests))
+            self.assertEqual(sum(stat.errors for stat in stats), 1)
+            await pool.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_iter_blocks_incomplete(self):
+        async def go():
+            _, port, _ = await self.create_server(
+                "GET", "/blockchain/blocks/{count}/{start}", self.blocks_handler
+            )
+            client = Client(
+                BMAEndpoint("127.0.0.1", "", "", port), validation=VALIDATION_OFF
+            )
+            with self.assertRaises(ValueError):
+                async for _ in iter_blocks(client, 900, 1100, max_retries=0):
+                    pass
+            await client.close()
+
+        self.loop.run_until_complete(go())
@@ -0,0 +1,391 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+from duniterpy.api.client import VALIDATION_OFF
+from duniterpy.api.endpoint import BMAEndpoint
+from duniterpy.documents.block_uid import BlockUID
+from duniterpy.documents.document import MalformedDocumentError
+from duniterpy.documents.peer import Peer
+from duniterpy.api.client import Client
+from duniterpy.helpers.network import (
+    EndpointProbe,
+    PeerTable,
+    crawl,
+    rank_probes,
+    ranked_endpoints,
+    verify_peer,
+)
+from duniterpy.key import SigningKey
+from tests.api.webserver import WebFunctionalSetupMixin, web, find_unused_port
+
+CURRENCY = "g1-test"
+BLOCK_UID = "1-" + "%064X" % 1
+
+
+def peer_json(
+    signing_key, endpoints, pubkey=None, currency=CURRENCY, block_uid=BLOCK_UID
+):
+    """
+    Return the json data of a peer document signed by signing_key
+    """
+    peer = Peer(
+        10,
+        currency,
+        pubkey or signing_key.pubkey,
+        BlockUID.from_str(block_uid),
+        endpoints,
+        None,
+    )
+    peer.sign([signing_key])
+    return {
+        "version": 10,
+        "currency": currency,
+        "pubkey": peer.pubkey,
+        "block": block_uid,
+        "endpoints": [_endpoint.inline() for _endpoint in endpoints],
+        "signature": peer.signatures[0],
+    }
+
+
+class TestPeerJson(unittest.TestCase):
+    def test_from_bma_json(self):
+        key = SigningKey.from_seedhex("00" * 32)
+        data = peer_json(key, [BMAEndpoint("localhost", None, None, 80)])
+        peer = Peer.from_bma_json(data)
+        self.assertEqual(peer.pubkey, key.pubkey)
+        self.assertEqual(peer.endpoints, [BMAEndpoint("localhost", None, None, 80)])
+        self.assertTrue(verify_peer(peer))
+
+        with self.assertRaises(MalformedDocumentError):
+            Peer.from_bma_json({**data, "block": "invalid"})
+        with self.assertRaises(MalformedDocumentError):
+            Peer.from_bma_json({key: data[key] for key in data if key != "signature"})
+
+        data["pubkey"] = SigningKey.from_seedhex("01" * 32).pubkey
+        self.assertFalse(verify_peer(Peer.from_bma_json(data)))
+
+
+class TestRankProbes(unittest.TestCase):
+    def test_rank_probes(self):
+        probes = [
+            EndpointProbe(
+                BMAEndpoint("a", None, None, 80), latency=0.3, block_number=100
+            ),
+            EndpointProbe(
+                BMAEndpoint("b", None, None, 80), latency=0.1, block_number=101
+            ),
+            # lagging node
+            EndpointProbe(
+                BMAEndpoint("c", None, None, 80), latency=0.01, block_number=90
+            ),
+            # forked node ahead of the network
+            EndpointProbe(
+                BMAEndpoint("d", None, None, 80), latency=0.01, block_number=200
+            ),
+            EndpointProbe(BMAEndpoint("e", None, None, 80), error=OSError()),
+            EndpointProbe(
+                BMAEndpoint("f", None, None, 80), latency=0.2, block_number=99
+            ),
+        ]
+        self.assertEqual(
+            [probe.endpoint.server for probe in rank_probes(probes)], ["b", "f", "a"]
+        )
+        self.assertEqual(
+            [_endpoint.server for _endpoint in ranked_endpoints(probes, max_lag=0)],
+            ["a"],
+        )
+        self.assertEqual(rank_probes(probes[4:5]), [])
+
+
+class TestCrawl(WebFunctionalSetupMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.leaf_requests = []
+
+    def build_network(self, port):
+        """
+        Two nodes on the same server, told apart by the request host
+        """
+        key_a = SigningKey.from_seedhex("00" * 32)
+        key_b = SigningKey.from_seedhex("01" * 32)
+        key_c = SigningKey.from_seedhex("02" * 32)
+        key_d = SigningKey.from_seedhex("03" * 32)
+        self.endpoint_a = BMAEndpoint("127.0.0.1", None, None, port)
+        self.endpoint_b = BMAEndpoint("localhost", None, None, port)
+        self.endpoint_down = BMAEndpoint("127.0.0.1", None, None, find_unused_port())
+        self.leaves = {
+            "A": peer_json(key_a, [self.endpoint_a]),
+            "B": peer_json(key_b, [self.endpoint_b]),
+            # unreachable node
+            "C": peer_json(key_c, [self.endpoint_down]),
+            # forged document of the pubkey of C
+            "D": peer_json(
+                key_d, [BMAEndpoint("forged", None, None, 80)], pubkey=key_c.pubkey
+            ),
+            # node of another currency
+            "E": peer_json(
+                key_d, [BMAEndpoint("other", None, None, 80)], currency="other"
+            ),
+        }
+        self.nodes = {
+            "127.0.0.1": {"peer": "A", "number": 100, "leaves": ["A", "B", "D"]},
+            "localhost": {"peer": "B", "number": 101, "leaves": ["A", "C", "E"]},
+        }
+
+    def node(self, request):
+        return self.nodes[request.host.split(":")[0]]
+
+    async def peering_handler(self, request):
+        await request.read()
+        return web.json_response(self.leaves[self.node(request)["peer"]])
+
+    async def current_handler(self, request):
+        await request.read()
+        number = self.node(request)["number"]
+        if number is None:
+            return web.json_response(
+                {"ucode": 2010, "message": "No current block"}, status=404
+            )
+        return web.json_response({"number": number})
+
+    async def peers_handler(self, request):
+        await request.read()
+        node = self.node(request)
+        data = {
+            "depth": 1,
+            "nodesCount": 1,
+            "leavesCount": len(node["leaves"]),
+            "root": "ROOT",
+            "leaves": node["leaves"],
+        }
+        if "leaf" in request.query:
+            leaf = request.query["leaf"]
+            self.leaf_requests.append(leaf)
+            data["leaf"] = {"hash": leaf, "value": self.leaves[leaf]}
+        return web.json_response(data)
+
+    def test_crawl(self):
+        async def go():
+            self.app.router.add_route("GET", "/network/peering", self.peering_handler)
+            self.app.router.add_route(
+                "GET", "/blockchain/current", self.current_handler
+            )
+            _, port, _ = await self.create_server(
+                "GET", "/network/peering/peers", self.peers_handler
+            )
+            self.build_network(port)
+
+            probes = await crawl(
+                [self.endpoint_a.inline()], timeout=1, validation=VALIDATION_OFF
+            )
+            probed = {probe.endpoint: probe for probe in probes}
+            self.assertEqual(
+                set(probed), {self.endpoint_a, self.endpoint_b, self.endpoint_down}
+            )
+            self.assertEqual(probed[self.endpoint_a].block_number, 100)
+            self.assertEqual(probed[self.endpoint_b].block_number, 101)
+            self.assertFalse(probed[self.endpoint_down].reachable)
+            self.assertIsNotNone(probed[self.endpoint_down].error)
+            # the genuine document of C is kept, whatever the order
+            self.assertIsNotNone(probed[self.endpoint_down].peer)
+            # each leaf is requested once across the network
+            self.assertEqual(sorted(self.leaf_requests), ["A", "B", "C", "D", "E"])
+            self.assertEqual(
+                set(ranked_endpoints(probes)), {self.endpoint_a, self.endpoint_b}
+            )
+
+        self.loop.run_until_complete(go())
+
+    def test_crawl_duniter_error(self):
+        async def go():
+            self.app.router.add_route("GET", "/network/peering", self.peering_handler)
+            self.app.router.add_route(
+                "GET", "/blockchain/current", self.current_handler
+            )
+            _, port, _ = await self.create_server(
+                "GET", "/network/peering/peers", self.peers_handler
+            )
+            self.build_network(port)
+            # B is syncing and has no current block yet
+            self.nodes["localhost"]["number"] = None
+
+            probes = await crawl(
+                [self.endpoint_a], timeout=1, validation=VALIDATION_OFF
+            )
+            probed = {probe.endpoint: probe for probe in probes}
+            self.assertEqual(set(probed), {self.endpoint_a, self.endpoint_b})
+            self.assertFalse(probed[self.endpoint_b].reachable)
+            self.assertEqual(probed[self.endpoint_b].error.ucode, 2010)
+            self.assertEqual(ranked_endpoints(probes), [self.endpoint_a])
+
+        self.loop.run_until_complete(go())
+
+    def test_crawl_max_peers(self):
+        async def go():
+            self.app.router.add_route("GET", "/network/peering", self.peering_handler)
+            self.app.router.add_route(
+                "GET", "/blockchain/current", self.current_handler
+            )
+            _, port, _ = await self.create_server(
+                "GET", "/network/peering/peers", self.peers_handler
+            )
+            self.build_network(port)
+
+            probes = await crawl(
+                [self.endpoint_a, self.endpoint_down],
+                timeout=1,
+                max_peers=1,
+                validation=VALIDATION_OFF,
+            )
+            self.assertEqual(
+                {probe.endpoint for probe in probes},
+                {self.endpoint_a, self.endpoint_down},
+            )
+            self.assertEqual(ranked_endpoints(probes), [self.endpoint_a])
+            self.assertEqual(self.leaf_requests, [])
+
+        self.loop.run_until_complete(go())
+
+
+class TestPeerTable(WebFunctionalSetupMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.requests = []
+        self.keys = [SigningKey.from_seedhex("%02d" % seed * 32) for seed in range(4)]
+        self.tree = {
+            "A": peer_json(self.keys[0], [BMAEndpoint("a", None, None, 80)]),
+            "B": peer_json(self.keys[1], [BMAEndpoint("b", None, None, 80)]),
+            "C": peer_json(self.keys[2], [BMAEndpoint("c", None, None, 80)]),
+            # forged document
+            "X": peer_json(
+                self.keys[3],
+                [BMAEndpoint("x", None, None, 80)],
+                pubkey=self.keys[0].pubkey,
+            ),
+        }
+        # leaves answered with a node error
+        self.failing = set()
+
+    async def peers_handler(self, request):
+        await request.read()
+        self.requests.append(dict(request.query))
+        data = {
+            "depth": 2,
+            "nodesCount": 3,
+            "leavesCount": len(self.tree),
+            "root": "".join(sorted(self.tree)),
+        }
+        if "leaves" in request.query:
+            data["leaves"] = sorted(self.tree)
+        elif request.query.get("leaf"):
+            leaf = request.query["leaf"]
+            if leaf in self.failing:
+                return web.json_response(
+                    {"ucode": 2012, "message": "Peer not found"}, status=404
+                )
+            data["leaf"] = {"hash": leaf, "value": self.tree[leaf]}
+        return web.json_response(data)
+
+    def test_sync(self):
+        async def go():
+            _, port, _ = await self.create_server(
+                "GET", "/network/peering/peers", self.peers_handler
+            )
+            client = Client(BMAEndpoint("127.0.0.1", None, None, port))
+            table = PeerTable()
+
+            added, removed = await table.sync(client)
+            self.assertEqual(
+                sorted(peer.pubkey for peer in added),
+                sorted(key.pubkey for key in self.keys[:3]),
+            )
+            self.assertEqual(removed, [])
+            self.assertEqual(len(table), 3)
+            self.assertEqual(
+                table.get(self.keys[0].pubkey).endpoints,
+                [BMAEndpoint("a", None, None, 80)],
+            )
+            self.assertEqual(len(self.requests), 6)
+
+            # same merkle root, only the root is requested
+            self.requests = []
+            self.assertEqual(await table.sync(client), ([], []))
+            self.assertEqual(self.requests, [{"leaf": ""}])
+
+            # B moves, C leaves, D joins
+            del self.tree["B"]
+            del self.tree["C"]
+            self.tree["B2"] = peer_json(
+                self.keys[1],
+                [BMAEndpoint("b2", None, None, 80)],
+                block_uid="2-" + "%064X" % 2,
+            )
+            self.tree["D"] = peer_json(self.keys[3], [BMAEndpoint("d", None, None, 80)])
+            self.requests = []
+            added, removed = await table.sync(client)
+            self.assertEqual(
+                sorted(peer.pubkey for peer in added),
+                sorted([self.keys[1].pubkey, self.keys[3].pubkey]),
+            )
+            self.assertEqual([peer.pubkey for peer in removed], [self.keys[2].pubkey])
+            self.assertNotIn(self.keys[2].pubkey, table)
+            self.assertEqual(
+                table.get(self.keys[1].pubkey).endpoints,
+                [BMAEndpoint("b2", None, None, 80)],
+            )
+            # only the new leaves are fetched, the forged one is not fetched again
+            self.assertEqual(
+                sorted(query.get("leaf", "") for query in self.requests),
+                ["", "", "B2", "D"],
+            )
+            self.assertEqual(len(table.peers), 3)
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_sync_leaf_error(self):
+        async def go():
+            _, port, _ = await self.create_server(
+                "GET", "/network/peering/peers", self.peers_handler
+            )
+            client = Client(BMAEndpoint("127.0.0.1", None, None, port))
+            table = PeerTable()
+            self.failing.add("C")
+
+            added, removed = await table.sync(client)
+            self.assertEqual(
+                sorted(peer.pubkey for peer in added),
+                sorted(key.pubkey for key in self.keys[:2]),
+            )
+            self.assertNotIn(self.keys[2].pubkey, table)
+            self.assertNotIn("C", table.ignored)
+            self.assertIsNone(table.root)
+
+            # the failed leaf is fetched on next sync
+            self.failing.clear()
+            self.requests = []
+            added, removed = await table.sync(client)
+            self.assertEqual([peer.pubkey for peer in added], [self.keys[2].pubkey])
+            self.assertEqual(
+                sorted(query.get("leaf", "") for query in self.requests),
+                ["", "", "C"],
+            )
+            self.assertIsNotNone(table.root)
+            await client.close()
+
+        self.loop.run_until_complete(go())
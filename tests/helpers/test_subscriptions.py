@@ -0,0 +1,241 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+import unittest
+
+from duniterpy.api.client import Client, VALIDATION_OFF
+from duniterpy.api.endpoint import BMAEndpoint
+from duniterpy.helpers.subscriptions import (
+    POLICY_DROP,
+    Deduplicator,
+    SubscriptionHub,
+    iter_queue,
+    subscribe_blocks,
+    subscribe_peers,
+)
+from tests.api.webserver import WebFunctionalSetupMixin, web
+
+
+class TestDeduplicator(unittest.TestCase):
+    def test_seen(self):
+        deduplicator = Deduplicator(window=2)
+        self.assertFalse(deduplicator.seen(1))
+        self.assertTrue(deduplicator.seen(1))
+        self.assertFalse(deduplicator.seen(2))
+        self.assertFalse(deduplicator.seen(3))
+        # 1 is out of the window
+        self.assertFalse(deduplicator.seen(1))
+
+
+class TestSubscriptions(WebFunctionalSetupMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.chain = [
+            {"number": number, "hash": "%064X" % number} for number in range(10)
+        ]
+        self.connections = 0
+
+    async def block_ws_handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        if self.connections == 1:
+            # node restarts after block 2
+            for number in (1, 2, 2):
+                await ws.send_json(self.chain[number])
+            await ws.close()
+            return ws
+        await ws.send_str("not json")
+        for number in (4, 5):
+            await ws.send_json(self.chain[number])
+        # wait for the client to close
+        async for _ in ws:
+            pass
+        return ws
+
+    async def current_handler(self, request):
+        await request.read()
+        return web.json_response(self.chain[4])
+
+    async def blocks_handler(self, request):
+        await request.read()
+        count = int(request.match_info["count"])
+        start = int(request.match_info["start"])
+        return web.json_response(self.chain[start : start + count])
+
+    def test_subscribe_blocks(self):
+        async def go():
+            self.app.router.add_route(
+                "GET", "/blockchain/current", self.current_handler
+            )
+            self.app.router.add_route(
+                "GET", "/blockchain/blocks/{count}/{start}", self.blocks_handler
+            )
+            _, port, _ = await self.create_server(
+                "GET", "/ws/block", self.block_ws_handler
+            )
+            client = Client(
+                BMAEndpoint("127.0.0.1", "", "", port), validation=VALIDATION_OFF
+            )
+            blocks = subscribe_blocks(client, backoff=0.01, schema=None)
+            numbers = []
+            async for block in blocks:
+                numbers.append(block["number"])
+                if block["number"] == 5:
+                    break
+            await blocks.aclose()
+            # block 3 missed during reconnection is fetched, duplicates are dropped
+            self.assertEqual(numbers, [1, 2, 3, 4, 5])
+            self.assertEqual(self.connections, 2)
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_subscribe_peers(self):
+        peer = {
+            "version": 10,
+            "currency": "g1",
+            "pubkey": "PUBKEY",
+            "endpoints": ["BMAS g1.duniter.org 443"],
+            "signature": "SIGNATURE",
+        }
+
+        async def peer_ws_handler(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            self.connections += 1
+            await ws.send_json(peer)
+            if self.connections == 1:
+                await ws.close()
+                return ws
+            await ws.send_json(dict(peer, signature="SIGNATURE2"))
+            async for _ in ws:
+                pass
+            return ws
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/ws/peer", peer_ws_handler)
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+            peers = subscribe_peers(client, backoff=0.01)
+            signatures = []
+            async for data in peers:
+                signatures.append(data["signature"])
+                if len(signatures) == 2:
+                    break
+            await peers.aclose()
+            self.assertEqual(signatures, ["SIGNATURE", "SIGNATURE2"])
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_producer_error(self):
+        async def produce(put):
+            await put(1)
+            raise RuntimeError("unexpected")
+
+        async def go():
+            items = []
+            # unexpected errors are raised to the consumer
+            with self.assertRaises(RuntimeError):
+                async for item in iter_queue(produce):
+                    items.append(item)
+            self.assertEqual(items, [1])
+
+        self.loop.run_until_complete(go())
+
+
+class TestSubscriptionHub(WebFunctionalSetupMixin, unittest.TestCase):
+    def test_fan_out(self):
+        connections = []
+        closed = asyncio.Event()
+
+        async def ws_handler(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            connections.append(ws)
+            # wait for the subscribers
+            await asyncio.sleep(0.1)
+            for number in range(5):
+                await ws.send_json({"number": number})
+            async for _ in ws:
+                pass
+            closed.set()
+            return ws
+
+        async def consume(subscriber, count):
+            messages = []
+            async for message in subscriber:
+                messages.append(message)
+                if len(messages) == count:
+                    break
+            return messages
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/ws/block", ws_handler)
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+            other_client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+            hub = SubscriptionHub(backoff=0.01)
+            subscriber = hub.subscribe(client, queue_size=2)
+            other_subscriber = hub.subscribe(other_client, queue_size=2)
+            drop_subscriber = hub.subscribe(client, queue_size=1, policy=POLICY_DROP)
+
+            messages, other_messages = await asyncio.gather(
+                consume(subscriber, 5), consume(other_subscriber, 5)
+            )
+            # one websocket, messages decoded once
+            self.assertEqual(len(connections), 1)
+            self.assertEqual(
+                [message["number"] for message in messages], [0, 1, 2, 3, 4]
+            )
+            for message, other_message in zip(messages, other_messages):
+                self.assertIs(message, other_message)
+            self.assertEqual(drop_subscriber.dropped, 4)
+            self.assertEqual(await consume(drop_subscriber, 1), [messages[0]])
+
+            subscriber.close()
+            other_subscriber.close()
+            self.assertEqual(len(hub.upstreams), 1)
+            async with drop_subscriber:
+                pass
+            # the last subscriber closes the upstream websocket
+            self.assertEqual(hub.upstreams, {})
+            await asyncio.wait_for(closed.wait(), 5)
+            self.assertEqual([message async for message in subscriber], [])
+
+            await hub.close()
+            await client.close()
+            await other_client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_upstream_error(self):
+        class FailingClient:
+            async def connect_ws(self, path):
+                raise RuntimeError("unexpected")
+
+        async def go():
+            hub = SubscriptionHub()
+            subscriber = hub.subscribe(FailingClient())
+            # unexpected errors are raised to the subscribers
+            with self.assertRaises(RuntimeError):
+                async for _ in subscriber:
+                    pass
+            self.assertEqual([message async for message in subscriber], [])
+            self.assertEqual(hub.upstreams, {})
+            self.assertEqual(hub.subscribers, {})
+
+        self.loop.run_until_complete(go())
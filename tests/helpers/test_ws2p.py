@@ -0,0 +1,245 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+import json
+import unittest
+
+import aiohttp
+
+from duniterpy.api.client import Client
+from duniterpy.api.endpoint import BMAEndpoint
+from duniterpy.api.errors import WS2PError
+from duniterpy.documents.ws2p.messages import Ack, Connect, Ok
+from duniterpy.helpers.ws2p import WS2PSession, connect_sessions, handshake
+from duniterpy.key import SigningKey
+from tests.api.webserver import WebFunctionalSetupMixin, web
+
+CURRENCY = "g1-test"
+
+
+def ws2p_node_handler(node_key, currency, signing_key=None, connections=None):
+    """
+    Return a web socket handler of a WS2P node answering the handshake
+
+    :param node_key: SigningKey of the node
+    :param currency: Currency name
+    :param signing_key: SigningKey signing the messages, to forge bad signatures
+    :param connections: List to append the path of each connection
+    """
+    if signing_key is None:
+        signing_key = node_key
+
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        if connections is not None:
+            connections.append(request.path)
+        connect = json.loads(
+            Connect(currency, node_key.pubkey).get_signed_json(signing_key)
+        )
+        connect["currency"] = currency
+        await ws.send_json(connect)
+        async for message in ws:
+            data = json.loads(message.data)
+            if data.get("auth") == "CONNECT":
+                await ws.send_str(
+                    Ack(currency, node_key.pubkey, data["challenge"]).get_signed_json(
+                        signing_key
+                    )
+                )
+                await ws.send_str(
+                    Ok(currency, node_key.pubkey, data["challenge"]).get_signed_json(
+                        signing_key
+                    )
+                )
+        return ws
+
+    return handler
+
+
+class TestWS2PSession(WebFunctionalSetupMixin, unittest.TestCase):
+    async def ws_handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_json({"name": "HEAD", "body": {"heads": []}})
+        requests = []
+        async for message in ws:
+            data = json.loads(message.data)
+            requests.append(data)
+            if len(requests) < 4:
+                continue
+            # answer in reverse order, the CURRENT request is never answered
+            for data in reversed(requests):
+                name = data["body"]["name"]
+                if name == "BLOCKS_CHUNK":
+                    params = data["body"]["params"]
+                    body = [
+                        {"number": number}
+                        for number in range(
+                            params["fromNumber"], params["fromNumber"] + params["count"]
+                        )
+                    ]
+                    await ws.send_json({"resId": data["reqId"], "body": body})
+                elif name == "BLOCK_BY_NUMBER":
+                    await ws.send_json({"resId": data["reqId"], "err": "Not found"})
+            await ws.send_json({"name": "PEER", "body": {}})
+            await ws.close()
+        return ws
+
+    def test_session(self):
+        async def go():
+            _, port, _ = await self.create_server("GET", "/", self.ws_handler)
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+            session = WS2PSession(await client.connect_ws(), validation=False)
+
+            results = await asyncio.gather(
+                session.get_blocks(0, 2),
+                session.get_blocks(2, 3),
+                session.get_block(10),
+                session.get_current(timeout=5),
+                return_exceptions=True,
+            )
+            self.assertEqual(results[0], [{"number": 0}, {"number": 1}])
+            self.assertEqual(results[1], [{"number": 2}, {"number": 3}, {"number": 4}])
+            self.assertIsInstance(results[2], WS2PError)
+            self.assertEqual(results[2].err, "Not found")
+            # pending requests fail when the connection is lost
+            self.assertIsInstance(results[3], aiohttp.ClientConnectionError)
+            self.assertEqual(session.pending, {})
+
+            pushed = [message["name"] async for message in session.pushed()]
+            self.assertEqual(pushed, ["HEAD", "PEER"])
+            self.assertTrue(session.closed)
+            with self.assertRaises(aiohttp.ClientConnectionError):
+                await session.get_current()
+
+            await session.close()
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_timeout(self):
+        async def ws_handler(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            async for _ in ws:
+                pass
+            return ws
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/", ws_handler)
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+            async with WS2PSession(await client.connect_ws(), timeout=0.1) as session:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await session.get_current()
+                self.assertEqual(session.pending, {})
+                self.assertEqual(session.new_request_id(), "00000001")
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+
+class TestHandshake(WebFunctionalSetupMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node_key = SigningKey.from_seedhex("00" * 32)
+        self.signing_key = SigningKey.from_seedhex("01" * 32)
+
+    async def silent_handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for _ in ws:
+            pass
+        return ws
+
+    async def chatty_handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        while not ws.closed:
+            await ws.send_json({"name": "HEAD", "body": {"heads": []}})
+            await asyncio.sleep(0.05)
+        return ws
+
+    def test_handshake(self):
+        async def go():
+            self.app.router.add_route(
+                "GET",
+                "/forged",
+                ws2p_node_handler(self.node_key, CURRENCY, self.signing_key),
+            )
+            self.app.router.add_route("GET", "/silent", self.silent_handler)
+            self.app.router.add_route("GET", "/chatty", self.chatty_handler)
+            _, port, _ = await self.create_server(
+                "GET", "/node", ws2p_node_handler(self.node_key, CURRENCY)
+            )
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+
+            ws = await client.connect_ws("node")
+            await handshake(ws, self.signing_key, CURRENCY, timeout=1)
+            await ws.close()
+
+            ws = await client.connect_ws("forged")
+            with self.assertRaises(ValueError):
+                await handshake(ws, self.signing_key, CURRENCY, timeout=1)
+            await ws.close()
+
+            ws = await client.connect_ws("silent")
+            with self.assertRaises(asyncio.TimeoutError):
+                await handshake(ws, self.signing_key, CURRENCY, timeout=0.1)
+            await ws.close()
+
+            # messages of the peer which are not part of the handshake
+            ws = await client.connect_ws("chatty")
+            with self.assertRaises(asyncio.TimeoutError):
+                await handshake(ws, self.signing_key, CURRENCY, timeout=0.2)
+            await ws.close()
+
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_connect_sessions(self):
+        async def go():
+            self.app.router.add_route("GET", "/silent", self.silent_handler)
+            _, port, _ = await self.create_server(
+                "GET", "/node", ws2p_node_handler(self.node_key, CURRENCY)
+            )
+
+            class PathClient(Client):
+                def __init__(self, path):
+                    super().__init__(BMAEndpoint("127.0.0.1", "", "", port))
+                    self.path = path
+
+                async def connect_ws(self, path=""):
+                    return await super().connect_ws(self.path)
+
+            clients = [PathClient("node"), PathClient("silent"), PathClient("node")]
+            sessions = await connect_sessions(
+                clients,
+                self.signing_key,
+                CURRENCY,
+                concurrency=2,
+                handshake_timeout=0.2,
+            )
+            self.assertEqual(len(sessions), 2)
+            for session in sessions:
+                self.assertFalse(session.closed)
+                await session.close()
+            for client in clients:
+                await client.close()
+
+        self.loop.run_until_complete(go())
@@ -0,0 +1,211 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from duniterpy.api.endpoint import WS2PEndpoint
+from duniterpy.documents.block_uid import BlockUID
+from duniterpy.documents.ws2p.heads import API, Head, HeadV2
+from duniterpy.helpers.ws2p_mesh import WS2PMesh
+from duniterpy.key import SigningKey
+from tests.api.webserver import WebFunctionalSetupMixin, find_unused_port
+from tests.helpers.test_ws2p import CURRENCY, ws2p_node_handler
+
+
+def make_head(ws2pid, free_mirror_room):
+    return HeadV2(
+        2,
+        "SIGNATURE",
+        API("", ""),
+        Head(2),
+        "PUBKEY",
+        BlockUID(1, "%064X" % 1),
+        ws2pid,
+        "duniter",
+        "1.8.1",
+        1,
+        0,
+        free_mirror_room,
+    )
+
+
+class FakeSession:
+    """
+    WS2P session with requests in flight
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(1)
+        self.calls = 0
+
+    def submit(self, *args, **kwargs):
+        self.calls += 1
+        return super().submit(*args, **kwargs)
+
+
+class TestWS2PMesh(WebFunctionalSetupMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.node_key = SigningKey.from_seedhex("00" * 32)
+        self.signing_key = SigningKey.from_seedhex("01" * 32)
+        self.connections = []
+        self.node_handler = ws2p_node_handler(
+            self.node_key, CURRENCY, connections=self.connections
+        )
+
+    def test_mesh(self):
+        async def go():
+            self.app.router.add_route("GET", "/b", self.node_handler)
+            self.app.router.add_route("GET", "/c", self.node_handler)
+            _, port, _ = await self.create_server("GET", "/a", self.node_handler)
+            endpoints = [
+                WS2PEndpoint("aaaaaaaa", "127.0.0.1", port, "a"),
+                WS2PEndpoint("bbbbbbbb", "127.0.0.1", port, "b"),
+                WS2PEndpoint("cccccccc", "127.0.0.1", port, "c"),
+                # unreachable peer
+                WS2PEndpoint("dddddddd", "127.0.0.1", find_unused_port(), "d"),
+            ]
+            mesh = WS2PMesh(
+                endpoints,
+                self.signing_key,
+                CURRENCY,
+                size=2,
+                rotate_margin=2,
+                check_interval=0.05,
+                reconnect_delay=10,
+                validation=False,
+            )
+            mesh.update_heads(
+                [
+                    make_head("aaaaaaaa", 5),
+                    make_head("bbbbbbbb", 1),
+                    make_head("cccccccc", 3),
+                    make_head("dddddddd", 10),
+                ]
+            )
+            self.assertEqual(
+                mesh.ranked_endpoints(),
+                endpoints[3:] + endpoints[0:1] + endpoints[2:3] + endpoints[1:2],
+            )
+
+            async with mesh:
+                session = await mesh.acquire(timeout=5)
+                self.assertFalse(session.closed)
+                while len(mesh.sessions) < 2:
+                    await asyncio.sleep(0.01)
+                # the unreachable peer is retried later
+                self.assertIn(endpoints[3], mesh.retry_at)
+                self.assertEqual(set(mesh.sessions), {endpoints[0], endpoints[2]})
+
+                # b has more free rooms than c, c is rotated out
+                mesh.update_heads([make_head("bbbbbbbb", 6)])
+                while endpoints[1] not in mesh.sessions:
+                    await asyncio.sleep(0.01)
+                self.assertEqual(set(mesh.sessions), {endpoints[0], endpoints[1]})
+                self.assertEqual(self.connections, ["/a", "/c", "/b"])
+
+                # a lost connection is replaced, without reconnecting at once to its peer
+                await mesh.sessions[endpoints[0]].close()
+                # c reconnect delay is over
+                mesh.retry_at.pop(endpoints[2])
+                while endpoints[2] not in mesh.sessions:
+                    await asyncio.sleep(0.01)
+                self.assertNotIn(endpoints[0], mesh.sessions)
+
+            self.assertEqual(mesh.sessions, {})
+            self.assertTrue(mesh.session.closed)
+
+        self.loop.run_until_complete(go())
+
+    def test_rotate_drain(self):
+        async def go():
+            endpoints = [
+                WS2PEndpoint("aaaaaaaa", "127.0.0.1", 80, "a"),
+                WS2PEndpoint("bbbbbbbb", "127.0.0.1", 80, "b"),
+                WS2PEndpoint("cccccccc", "127.0.0.1", 80, "c"),
+            ]
+            mesh = WS2PMesh(
+                endpoints,
+                self.signing_key,
+                CURRENCY,
+                size=1,
+                drain_timeout=0.1,
+                validation=False,
+            )
+            busy = FakeSession()
+            request = asyncio.get_event_loop().create_future()
+            busy.pending["1"] = request
+            mesh.sessions[endpoints[0]] = busy
+            mesh.update_heads([make_head("aaaaaaaa", 0), make_head("bbbbbbbb", 5)])
+
+            # the rotated session is no longer lent, but its request is answered
+            self.assertEqual(mesh.sessions, {})
+            self.assertIs(mesh.draining[endpoints[0]], busy)
+            self.assertNotIn(endpoints[0], mesh.ranked_endpoints())
+            await asyncio.sleep(0.01)
+            self.assertFalse(busy.closed)
+            request.set_result({"body": {}})
+            busy.pending.clear()
+            await asyncio.sleep(0.01)
+            self.assertTrue(busy.closed)
+            self.assertEqual(mesh.draining, {})
+
+            # a request never answered does not keep the session open
+            stuck = FakeSession()
+            stuck.pending["2"] = asyncio.get_event_loop().create_future()
+            mesh.sessions[endpoints[1]] = stuck
+            mesh.update_heads([make_head("cccccccc", 10)])
+            self.assertIn(endpoints[1], mesh.draining)
+            while not stuck.closed:
+                await asyncio.sleep(0.01)
+            await mesh.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_heads_executor(self):
+        class HeadsClient:
+            async def get(self, *args, **kwargs):
+                heads = [{"message": "malformed", "sig": "SIG"}] * 100
+                return {"heads": heads}
+
+        async def go():
+            executor = CountingExecutor()
+            mesh = WS2PMesh(
+                [],
+                self.signing_key,
+                CURRENCY,
+                heads_client=HeadsClient(),
+                executor=executor,
+                validation=False,
+            )
+            await mesh.start()
+            while executor.calls == 0:
+                await asyncio.sleep(0.01)
+            await mesh.close()
+            executor.shutdown()
+
+        self.loop.run_until_complete(go())
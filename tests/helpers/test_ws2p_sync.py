@@ -0,0 +1,211 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+import json
+import unittest
+
+from duniterpy.api.client import Client
+from duniterpy.api.endpoint import BMAEndpoint, WS2PEndpoint
+from duniterpy.helpers.ws2p import WS2PSession
+from duniterpy.helpers.ws2p_sync import (
+    check_chunk,
+    discover_ws2p_endpoints,
+    sync_blocks,
+)
+from tests.api.webserver import WebFunctionalSetupMixin, web
+
+
+def make_chain(count):
+    return [
+        {
+            "number": number,
+            "hash": "%064X" % number,
+            "previousHash": "%064X" % (number - 1) if number > 0 else None,
+        }
+        for number in range(count)
+    ]
+
+
+class TestCheckChunk(unittest.TestCase):
+    def test_check_chunk(self):
+        chain = make_chain(10)
+        check_chunk(chain[2:5], 2, 3)
+        with self.assertRaises(ValueError):
+            check_chunk(chain[2:4], 2, 3)
+        with self.assertRaises(ValueError):
+            check_chunk([chain[2], chain[4]], 2, 2)
+
+
+class TestSyncBlocks(WebFunctionalSetupMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.chain = make_chain(1000)
+        self.connections = 0
+        self.requests = []
+
+    async def ws_handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        connection = self.connections
+        self.connections += 1
+        async for message in ws:
+            data = json.loads(message.data)
+            params = data["body"]["params"]
+            start, count = params["fromNumber"], params["count"]
+            self.requests.append((connection, start))
+            blocks = self.chain[start : start + count]
+            if connection == 1 and start == 100:
+                # invalid chunk
+                blocks = blocks[1:]
+            if connection == 2:
+                # slow peer
+                await asyncio.sleep(0.3)
+            await ws.send_json({"resId": data["reqId"], "body": blocks})
+        return ws
+
+    def test_sync_blocks(self):
+        async def go():
+            _, port, _ = await self.create_server("GET", "/", self.ws_handler)
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+            sessions = [
+                WS2PSession(await client.connect_ws(), validation=False)
+                for _ in range(3)
+            ]
+            numbers = [
+                block["number"]
+                async for block in sync_blocks(
+                    sessions, 10, 999, chunk=50, window=4, timeout=0.2
+                )
+            ]
+            self.assertEqual(numbers, list(range(10, 1000)))
+            # the fast peers did most of the work
+            self.assertGreater(
+                len([request for request in self.requests if request[0] != 2]),
+                len(self.requests) // 2,
+            )
+            # the invalid chunk was fetched from another peer
+            self.assertIn((1, 110), self.requests)
+
+            for session in sessions:
+                await session.close()
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_sync_blocks_failed_chunk_session_closed(self):
+        async def ws_handler(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            connection = self.connections
+            self.connections += 1
+            async for message in ws:
+                data = json.loads(message.data)
+                params = data["body"]["params"]
+                start, count = params["fromNumber"], params["count"]
+                self.requests.append((connection, start))
+                blocks = self.chain[start : start + count]
+                if connection == 1:
+                    # peer leaving without serving its chunk
+                    await asyncio.sleep(0.1)
+                    await ws.close()
+                    break
+                if start == 0 and (0, 0) not in self.requests[:-1]:
+                    # invalid chunk, while the other peer is still connected
+                    blocks = blocks[1:]
+                await ws.send_json({"resId": data["reqId"], "body": blocks})
+            return ws
+
+        async def go():
+            _, port, _ = await self.create_server("GET", "/", ws_handler)
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+            sessions = [
+                WS2PSession(await client.connect_ws(), validation=False)
+                for _ in range(2)
+            ]
+
+            async def sync():
+                return [
+                    block["number"]
+                    async for block in sync_blocks(
+                        sessions, 0, 99, chunk=50, requests_per_session=1
+                    )
+                ]
+
+            try:
+                # the chunk failed by the last live session is tried again on it
+                numbers = await asyncio.wait_for(sync(), 5)
+                self.assertEqual(numbers, list(range(100)))
+                self.assertEqual(self.requests.count((0, 0)), 2)
+            finally:
+                for session in sessions:
+                    await session.close()
+                await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_sync_blocks_sessions_lost(self):
+        async def go():
+            _, port, _ = await self.create_server("GET", "/", self.ws_handler)
+            client = Client(BMAEndpoint("127.0.0.1", "", "", port))
+            session = WS2PSession(await client.connect_ws(), validation=False)
+            await session.close()
+            with self.assertRaises(Exception):
+                async for _ in sync_blocks([session], 0, 99, chunk=50):
+                    pass
+            with self.assertRaises(ValueError):
+                async for _ in sync_blocks([], 0, 99):
+                    pass
+            await client.close()
+
+        self.loop.run_until_complete(go())
+
+    def test_discover_ws2p_endpoints(self):
+        async def peering_handler(request):
+            await request.read()
+            return web.json_response(
+                {
+                    "version": 10,
+                    "currency": "g1",
+                    "pubkey": "PUBKEY",
+                    "block": "0-E3B0C44298FC1C149AFBF4C8996FB92427AE41E4649B934CA495991B7852B855",
+                    "endpoints": [
+                        "BMAS g1.duniter.org 443",
+                        "WS2P 3eaab4c7 g1.duniter.org 443 /ws2p",
+                        "WS2PTOR 3eaab4c7 xyz.onion 20901",
+                    ],
+                    "signature": "SIGNATURE",
+                }
+            )
+
+        async def go():
+            _, port, _ = await self.create_server(
+                "GET", "/network/peering", peering_handler
+            )
+            clients = [
+                Client(BMAEndpoint("127.0.0.1", "", "", port)),
+                Client(BMAEndpoint("localhost", "", "", port)),
+                Client(BMAEndpoint("127.0.0.1", "", "", port + 1)),
+            ]
+            endpoints = await discover_ws2p_endpoints(clients)
+            self.assertEqual(
+                endpoints,
+                [WS2PEndpoint.from_inline("WS2P 3eaab4c7 g1.duniter.org 443 /ws2p")],
+            )
+            for client in clients:
+                await client.close()
+
+        self.loop.run_until_complete(go())
@@ -0,0 +1,44 @@
+"""
+Copyright  2014-2020 Vincent Texier <vit@free.fr>
+
+DuniterPy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+DuniterPy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest
+
+from duniterpy import tools
+
+
+class TestJSONBackend(unittest.TestCase):
+    def tearDown(self):
+        tools.set_json_backend()
+
+    def test_stdlib_backend(self):
+        self.assertEqual(tools.set_json_backend("json"), "json")
+        self.assertEqual(tools.get_json_backend(), "json")
+        self.assertEqual(tools.json_loads('{"a": [1, 2]}'), {"a": [1, 2]})
+        self.assertEqual(tools.json_loads(b'{"a": 1}'), {"a": 1})
+        self.assertEqual(tools.json_dumps({"a": 1}), '{"a": 1}')
+
+    def test_auto_backend(self):
+        backend = tools.set_json_backend()
+        self.assertIn(backend, tools.JSON_BACKENDS)
+        data = {"reqId": "a1b2c3d4", "body": {"name": "CURRENT", "params": {}}}
+        encoded = tools.json_dumps(data)
+        self.assertIsInstance(encoded, str)
+        self.assertEqual(tools.json_loads(encoded), data)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            tools.set_json_backend("pickle")